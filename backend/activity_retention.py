@@ -0,0 +1,195 @@
+"""
+Activity Retention
+
+Raw ``sessions`` and ``page_visits`` of an activity record are kept only for
+the most recent entries; older entries are rolled into per-day aggregates
+under ``activity['archived']``:
+
+    {
+        'sessions': 412,                  # raw sessions rolled up so far
+        'page_visits': 3050,              # raw page visits rolled up so far
+        'daily': {
+            '2026-03-01': {'sessions': 3, 'time_seconds': 5400, 'active_seconds': 4100,
+                           'page_visits': 41, 'pages': {'/tasks': {'visits': 12, 'seconds': 900}}},
+        },
+    }
+
+Totals stay exact: total_session_time / total_active_time and the page
+analytics counters are maintained as events arrive and never re-derived from
+the raw lists, and ``session_count()`` adds the archived sessions back.
+
+``ActivityCompactor`` runs the compaction in a background thread, once when
+started and then every ``interval`` seconds. It only visits shards this
+process already has loaded (records only grow while their shard is in use,
+so shards nobody touched are left on disk); a shard opened later is
+compacted as soon as it loads rather than at the next interval. Each shard is compacted under
+its cross-process write lock, the same lock the activity routes hold for
+their read-modify-writes, and every compacted record is marked dirty with
+the compaction as its rebase function, so a concurrent change from another
+worker is kept. The same pass backfills the page analytics counters of
+records written before they existed.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from page_analytics import UNKNOWN_PAGE, page_stats
+
+logger = logging.getLogger(__name__)
+
+
+def day_of(timestamp):
+    """The YYYY-MM-DD day of an ISO timestamp, or 'unknown'"""
+    if isinstance(timestamp, str) and len(timestamp) >= 10 and timestamp[4] == '-' and timestamp[7] == '-':
+        return timestamp[:10]
+    return 'unknown'
+
+
+def session_count(activity):
+    """Sessions ever ended: kept raw plus rolled up"""
+    return len(activity.get('sessions') or []) + (activity.get('archived') or {}).get('sessions', 0)
+
+
+def _day(archived, day):
+    daily = archived['daily'].get(day)
+    if daily is None:
+        daily = archived['daily'][day] = {
+            'sessions': 0, 'time_seconds': 0, 'active_seconds': 0, 'page_visits': 0, 'pages': {}
+        }
+    return daily
+
+
+def _count_page(daily, path, seconds):
+    path = UNKNOWN_PAGE if path is None else path
+    page = daily['pages'].get(path)
+    if page is None:
+        page = daily['pages'][path] = {'visits': 0, 'seconds': 0}
+    page['visits'] += 1
+    page['seconds'] += seconds
+    daily['page_visits'] += 1
+
+
+def compact_activity(activity, keep_sessions, keep_page_visits):
+    """Roll all but the newest raw sessions / page visits into daily aggregates; returns how many were rolled up"""
+    sessions = activity.get('sessions') or []
+    visits = activity.get('page_visits') or []
+    excess_sessions = max(len(sessions) - keep_sessions, 0)
+    excess_visits = max(len(visits) - keep_page_visits, 0)
+    if not excess_sessions and not excess_visits:
+        return 0
+
+    # The page counters of older records are derived from the raw lists: build them first
+    page_stats(activity)
+    archived = activity.setdefault('archived', {'sessions': 0, 'page_visits': 0, 'daily': {}})
+
+    for session in sessions[:excess_sessions]:
+        daily = _day(archived, day_of(session.get('started_at') or session.get('ended_at')))
+        daily['sessions'] += 1
+        daily['time_seconds'] += session.get('duration_seconds') or 0
+        daily['active_seconds'] += session.get('active_time_seconds') or 0
+        for page in session.get('pages_visited') or []:
+            _count_page(daily, page.get('page_path'), 0)
+    for visit in visits[:excess_visits]:
+        day = day_of(visit.get('started_at') or visit.get('ended_at') or visit.get('visited_at'))
+        _count_page(_day(archived, day), visit.get('page_path'), visit.get('duration_seconds') or 0)
+
+    del sessions[:excess_sessions]
+    del visits[:excess_visits]
+    archived['sessions'] += excess_sessions
+    archived['page_visits'] += excess_visits
+    return excess_sessions + excess_visits
+
+
+def daily_rollups(activity):
+    """Archived per-day aggregates, newest day first"""
+    daily = (activity.get('archived') or {}).get('daily') or {}
+    return [{'day': day, **daily[day]} for day in sorted(daily, reverse=True)]
+
+
+class ActivityCompactor:
+    """Periodically compacts every record of a sharded activity store"""
+
+    def __init__(self, store, keep_sessions=50, keep_page_visits=200, interval=3600.0):
+        self.store = store
+        self.keep_sessions = keep_sessions
+        self.keep_page_visits = keep_page_visits
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._opened = []
+        self._stats = {'runs': 0, 'records_compacted': 0, 'entries_rolled_up': 0,
+                       'last_run_at': None, 'last_run_ms': None, 'last_error': None}
+
+    def start(self):
+        """Start the background thread if not running yet (first run happens immediately)"""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name='activity-compactor', daemon=True)
+            self._thread.start()
+        self.store.on_load(self._shard_opened)
+        return self
+
+    def _shard_opened(self, shard):
+        with self._lock:
+            self._opened.append(shard)
+        self._wakeup.set()
+
+    def _run(self):
+        next_run = time.monotonic()
+        while True:
+            self._wakeup.wait(max(next_run - time.monotonic(), 0))
+            self._wakeup.clear()
+            with self._lock:
+                opened, self._opened = self._opened, []
+            try:
+                if time.monotonic() >= next_run:
+                    next_run = time.monotonic() + self.interval
+                    self.run_once()
+                elif opened:
+                    self.run_once(opened)
+            except Exception as e:
+                logger.error(f"Activity compaction failed: {e}")
+                with self._lock:
+                    self._stats['last_error'] = f"{type(e).__name__}: {e}"
+
+    def run_once(self, shards=None):
+        """Compact the given shards (default: every loaded shard) now; returns the keys of the records that changed"""
+        started = time.monotonic()
+        changed, rolled_up = [], 0
+        for shard in self.store.loaded_shards() if shards is None else shards:
+            with shard.exclusive():
+                for key, activity in list(shard.data.items()):
+                    backfill = 'page_stats' not in activity
+                    count = self._compact(activity)
+                    if count or backfill:
+                        shard.mark_dirty(key, rebase=self._compact)
+                        changed.append(key)
+                        rolled_up += count
+        with self._lock:
+            self._stats['runs'] += 1
+            self._stats['records_compacted'] += len(changed)
+            self._stats['entries_rolled_up'] += rolled_up
+            self._stats['last_run_at'] = datetime.now(timezone.utc).isoformat()
+            self._stats['last_run_ms'] = round((time.monotonic() - started) * 1000, 2)
+        if changed:
+            logger.info(f"Rolled up {rolled_up} activity entries of {len(changed)} users")
+        return changed
+
+    def _compact(self, activity):
+        count = compact_activity(activity, self.keep_sessions, self.keep_page_visits)
+        # Backfill the page counters of records written before they existed
+        page_stats(activity)
+        return count
+
+    def stats(self):
+        with self._lock:
+            return {
+                'keep_sessions': self.keep_sessions,
+                'keep_page_visits': self.keep_page_visits,
+                'interval_seconds': self.interval,
+                **self._stats,
+            }
@@ -0,0 +1,303 @@
+"""
+Activity Summary Repository
+
+One small summary row per user, kept current as activity is ingested, so
+the admin users overview never walks every user's sessions and history:
+
+    totals             total_time_seconds / total_active_time_seconds
+    counts             total_sessions (raw plus rolled up) / submissions_count
+    recency            first_seen / last_seen, last_heartbeat as epoch seconds
+    current session    current_page and the session's own is_active flag
+
+``update(user_id)`` re-derives one user's row (O(1): list lengths and
+maintained totals, one timestamp parse) and is called for every saved
+activity change. Online status depends on the clock, so it is computed when
+read from the stored heartbeat epoch. ``page()`` sorts and pages on the
+server, using a bounded heap when only the first pages are requested.
+
+``recent_submissions()`` serves the admin submissions feed as a lazy k-way
+merge of the users' newest-first submission lists (only users whose summary
+counts submissions take part), so a page of k costs O(users + k log users)
+and nothing is copied or sorted as a whole.
+
+The table is built on first use (the summary of a user is derived entirely
+from their activity record) and users changed by other worker processes are
+re-derived on ``refresh()``.
+"""
+
+import heapq
+import threading
+import time
+from datetime import datetime
+from itertools import islice
+
+from activity_retention import session_count
+
+# A session counts as online if its last heartbeat is this recent
+ONLINE_WINDOW_SECONDS = 120
+
+SORT_KEYS = {
+    'last_seen': lambda s: s['last_seen'] or '',
+    'first_seen': lambda s: s['first_seen'] or '',
+    'total_sessions': lambda s: s['total_sessions'],
+    'total_time_seconds': lambda s: s['total_time_seconds'],
+    'total_active_time_seconds': lambda s: s['total_active_time_seconds'],
+    'submissions_count': lambda s: s['submissions_count'],
+    'user_name': lambda s: (s['user_name'] or '').lower(),
+    'user_email': lambda s: (s['user_email'] or '').lower(),
+}
+
+
+def parse_epoch(timestamp):
+    """Epoch seconds of an ISO timestamp (naive = local time), or None"""
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def summarize(user_id, activity):
+    """The summary row for one user's activity record"""
+    session = activity.get('current_session') or {}
+    total_time = activity.get('total_session_time', 0) or 0
+    total_active_time = activity.get('total_active_time', 0) or 0
+    if session:
+        total_time += session.get('duration_seconds', 0) or 0
+        total_active_time += session.get('active_time_seconds', 0) or 0
+    return {
+        'user_id': user_id,
+        'user_email': activity.get('user_email', 'Unknown'),
+        'user_name': activity.get('user_name', 'Unknown'),
+        'first_seen': activity.get('first_seen'),
+        'last_seen': activity.get('last_seen'),
+        'total_sessions': session_count(activity),
+        'total_time_seconds': total_time,
+        'total_active_time_seconds': total_active_time,
+        'submissions_count': len(activity.get('submissions', [])),
+        'current_page': session.get('current_page') if session else None,
+        'has_session': bool(session),
+        'session_is_active': bool(session.get('is_active', False)),
+        'last_heartbeat': parse_epoch(session.get('last_heartbeat')) if session else None,
+    }
+
+
+def is_online(summary, now):
+    """Same rule as before: an open session whose last heartbeat is recent (or, without one, its flag)"""
+    if not summary['has_session']:
+        return False
+    if summary['last_heartbeat'] is not None:
+        return now - summary['last_heartbeat'] < ONLINE_WINDOW_SECONDS
+    return summary['session_is_active']
+
+
+def public_row(summary, now):
+    """Response shape of /admin/all-users/activity"""
+    return {
+        'user_id': summary['user_id'],
+        'user_email': summary['user_email'],
+        'user_name': summary['user_name'],
+        'first_seen': summary['first_seen'],
+        'last_seen': summary['last_seen'],
+        'total_sessions': summary['total_sessions'],
+        'total_time_seconds': summary['total_time_seconds'],
+        'total_active_time_seconds': summary['total_active_time_seconds'],
+        'is_currently_active': is_online(summary, now),
+        'current_page': summary['current_page'],
+        'submissions_count': summary['submissions_count'],
+    }
+
+
+def encode_cursor(key):
+    """Opaque pagination cursor for a submission sort key (timestamp, user_id, seq)"""
+    timestamp, user_id, seq = key
+    return f"{timestamp}|{seq}|{user_id}"
+
+
+def decode_cursor(cursor):
+    """Sort key from encode_cursor(); a bare timestamp means everything strictly older"""
+    parts = cursor.split('|', 2)
+    if len(parts) == 3 and parts[1].isdigit():
+        return (parts[0], parts[2], int(parts[1]))
+    return (cursor, '', -1)
+
+
+def _newest_below(submissions, user_id, cursor):
+    """Index of the first entry of a newest-first list whose key sorts below cursor (binary search)"""
+    count = len(submissions)
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        key = (submissions[middle].get('timestamp') or '', user_id, count - 1 - middle)
+        if key < cursor:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+class ActivitySummaryRepository:
+    """Per-user activity summaries over a dict-backed (or sharded) activity store"""
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        self._summaries = {}
+        self._total_time = 0
+        self._total_submissions = 0
+        self._built = False
+        self._stale = set()
+        self._generation = None
+        store.on_change(self._stale.add)
+
+    # ----- maintenance -----
+
+    def _put(self, user_id):
+        activity = self.store.data.get(user_id)
+        old = self._summaries.pop(user_id, None)
+        if old is not None:
+            self._total_time -= old['total_time_seconds']
+            self._total_submissions -= old['submissions_count']
+        if activity is not None:
+            self._add(user_id, summarize(user_id, activity))
+
+    def _add(self, user_id, summary):
+        self._summaries[user_id] = summary
+        self._total_time += summary['total_time_seconds']
+        self._total_submissions += summary['submissions_count']
+
+    def rebuild(self):
+        """Recompute every summary from the activity store"""
+        with self._lock:
+            self._summaries.clear()
+            self._total_time = 0
+            self._total_submissions = 0
+            self._stale.clear()
+            for user_id, activity in self.store.items():
+                self._add(user_id, summarize(user_id, activity))
+            self._generation = self.store.generation
+            self._built = True
+
+    def _ensure_built(self):
+        if not self._built:
+            self.rebuild()
+
+    def update(self, user_id):
+        """Re-derive one user's summary after their activity changed"""
+        with self._lock:
+            if self._built:
+                self._put(user_id)
+
+    def refresh(self):
+        """Re-derive users other processes changed; cheap when nothing changed"""
+        with self._lock:
+            if not self._built:
+                return
+            if self._generation != self.store.generation:
+                self.rebuild()
+                return
+            while self._stale:
+                self._put(self._stale.pop())
+
+    # ----- reads -----
+
+    def stats(self, now=None):
+        """total_users, active_users and total_time_all_users"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._ensure_built()
+            return {
+                'total_users': len(self._summaries),
+                'active_users': sum(1 for s in self._summaries.values() if is_online(s, now)),
+                'total_time_all_users': self._total_time,
+            }
+
+    def page(self, sort='last_seen', descending=True, offset=0, limit=None, status=None, search=None, now=None):
+        """
+        (rows, total): summaries matching ``status`` ('online'/'offline') and
+        ``search`` (substring of name, email or id), sorted by ``sort``, from
+        ``offset`` up to ``limit`` rows (all remaining rows when limit is None).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._ensure_built()
+            rows = list(self._summaries.values())
+
+        if status in ('online', 'offline'):
+            wanted = status == 'online'
+            rows = [s for s in rows if is_online(s, now) == wanted]
+        if search:
+            needle = search.lower()
+            rows = [
+                s for s in rows
+                if needle in (s['user_name'] or '').lower()
+                or needle in (s['user_email'] or '').lower()
+                or needle in str(s['user_id']).lower()
+            ]
+        total = len(rows)
+
+        if sort == 'is_currently_active':
+            key = lambda s: is_online(s, now)
+        else:
+            key = SORT_KEYS.get(sort, SORT_KEYS['last_seen'])
+
+        if limit is None:
+            ordered = sorted(rows, key=key, reverse=descending)[offset:]
+        else:
+            # Only the first offset + limit rows are ever needed: a heap is O(n log k)
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            ordered = pick(offset + limit, rows, key=key)[offset:]
+        return [public_row(s, now) for s in ordered], total
+
+    def total_submissions(self):
+        """Submissions across all users, from the maintained counts"""
+        with self._lock:
+            self._ensure_built()
+            return self._total_submissions
+
+    def recent_submissions(self, limit=200, cursor=None, submission_type=None, simulation_id=None):
+        """
+        (rows, next_cursor): the newest ``limit`` submissions across all users,
+        older than ``cursor`` (from a previous page, or a bare timestamp) and
+        matching the optional type / simulation filters. next_cursor is None
+        on the last page.
+        """
+        with self._lock:
+            self._ensure_built()
+            user_ids = [user_id for user_id, s in self._summaries.items() if s['submissions_count']]
+        bound = decode_cursor(cursor) if cursor else None
+        simulation_id = None if simulation_id is None else str(simulation_id)
+
+        def stream(user_id, activity):
+            submissions = activity.get('submissions') or []
+            count = len(submissions)
+            start = _newest_below(submissions, user_id, bound) if bound else 0
+            for index in range(start, count):
+                submission = submissions[index]
+                if submission_type and submission.get('type') != submission_type:
+                    continue
+                if simulation_id is not None and str(submission.get('simulation_id')) != simulation_id:
+                    continue
+                key = (submission.get('timestamp') or '', user_id, count - 1 - index)
+                yield key, submission, activity
+
+        streams = []
+        for user_id in user_ids:
+            activity = self.store.data.get(user_id)
+            if activity:
+                streams.append(stream(user_id, activity))
+
+        merged = heapq.merge(*streams, key=lambda item: item[0], reverse=True)
+        page = list(islice(merged, limit + 1))
+        rows = [
+            {
+                **submission,
+                'user_id': key[1],
+                'user_email': activity.get('user_email'),
+                'user_name': activity.get('user_name'),
+            }
+            for key, submission, activity in page[:limit]
+        ]
+        next_cursor = encode_cursor(page[limit - 1][0]) if len(page) > limit and limit > 0 else None
+        return rows, next_cursor
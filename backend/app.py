@@ -2,17 +2,34 @@ from flask import Flask, request, jsonify, send_file, make_response
 import uuid
 import os
 import json
+import time
 import re
 import traceback
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from collections import deque
+from itertools import islice
 from resume_parser import extract_text_from_pdf
 from match_gemini import match_skills
 from werkzeug.utils import secure_filename 
 import secrets
 from flask_cors import CORS
-from supabase import create_client
-from internship_api import internship_bp
+from supabase_client import create_supabase_client, InstrumentedClient, SupabaseMetrics, pool_config
+from internship_api import internship_bp, catalog_cache, get_local_catalog, fetch_simulation_tasks, invalidate_catalog
+from storage import ShardedStore, open_store, sync_all
+from enrollment_store import EnrollmentRepository
+from quiz_attempt_store import QuizAttemptRepository
+from notification_store import NotificationRepository
+from activity_summary_store import ActivitySummaryRepository
+from page_analytics import record_page_time, record_session_pages, top_pages
+from activity_retention import ActivityCompactor, daily_rollups, session_count
+from activity_rollups import ActivityRollups, GRANULARITIES
+from supabase_batch import fetch_in, group_by
+from circuit_breaker import CircuitBreaker, GuardedClient
+from outbox import Outbox
+from fanout import fan_out, start_request_deadline
+import fanout
+from health_probe import HealthProbe
 # Lazy import utils only when needed to avoid heavy dependencies on startup
 # from utils import generate_latex, compile_latex_to_pdf
 import io
@@ -100,12 +117,13 @@ print(type(SUPABASE_ANON_KEY), len(SUPABASE_ANON_KEY or ""))
 try:
     # Create two clients:
     # 1. Anon client for reads (respects RLS)
-    supabase = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+    # Both clients share one pooled HTTP transport (limits and timeouts in supabase_client.py)
+    supabase = create_supabase_client(SUPABASE_URL, SUPABASE_ANON_KEY)
     print("✓ Supabase anon client created successfully")
     
     # 2. Service role client for writes (bypasses RLS) - only if key is available
     if SUPABASE_SERVICE_ROLE_KEY:
-        supabase_admin = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+        supabase_admin = create_supabase_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
         print("✓ Supabase admin client created successfully")
     else:
         supabase_admin = supabase  # Fallback to anon client
@@ -117,9 +135,40 @@ except Exception as e:
     supabase = None
     supabase_admin = None
 
+# Shared circuit breaker: after SUPABASE_BREAKER_FAILURES consecutive connection
+# failures, Supabase queries fail fast (and callers use their local fallbacks)
+# until a probe succeeds, at most every SUPABASE_BREAKER_RESET seconds.
+supabase_breaker = CircuitBreaker(
+    'supabase',
+    failure_threshold=int(os.getenv('SUPABASE_BREAKER_FAILURES', '5')),
+    reset_timeout=float(os.getenv('SUPABASE_BREAKER_RESET', '30'))
+)
+# Per-table/per-operation latency histograms and error counts of the queries that reach Supabase
+supabase_metrics = SupabaseMetrics()
+if supabase:
+    admin_is_anon = supabase_admin is supabase
+    supabase = GuardedClient(InstrumentedClient(supabase, supabase_metrics), supabase_breaker)
+    supabase_admin = supabase if admin_is_anon else GuardedClient(
+        InstrumentedClient(supabase_admin, supabase_metrics), supabase_breaker
+    )
+
+# Supabase inserts made while handling requests are queued in a local outbox and
+# delivered in background batches with retries (see outbox.py)
+supabase_outbox = Outbox(
+    open_store('supabase_outbox', Path('supabase_outbox.json'), default=dict),
+    client=supabase_admin
+)
+
+def _invalidate_delivered_tasks(rows):
+    for simulation_id in {row.get('simulation_id') for row in rows}:
+        invalidate_catalog(simulation_id)
+
+supabase_outbox.on_delivered('tasks', _invalidate_delivered_tasks)
+
 # Store both in app config for access in blueprints
 app.config['supabase'] = supabase
 app.config['supabase_admin'] = supabase_admin
+app.config['supabase_outbox'] = supabase_outbox
 
 # Register Blueprints
 app.register_blueprint(internship_bp)
@@ -192,29 +241,12 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # ==================== QUIZ ENDPOINTS ====================
 
-# File-based storage for quiz attempts
+# Local storage for quiz attempts (JSON journal or SQLite, see storage.py)
 QUIZ_ATTEMPTS_FILE = Path('quiz_attempts.json')
+quiz_attempts_store = open_store('quiz_attempts', QUIZ_ATTEMPTS_FILE, default=dict)
 
-def load_quiz_attempts():
-    """Load quiz attempts from JSON file"""
-    if QUIZ_ATTEMPTS_FILE.exists():
-        try:
-            with open(QUIZ_ATTEMPTS_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading quiz attempts: {e}")
-            return {}
-    return {}
-
-def save_quiz_attempts(attempts):
-    """Save quiz attempts to JSON file"""
-    try:
-        with open(QUIZ_ATTEMPTS_FILE, 'w') as f:
-            json.dump(attempts, f, indent=2)
-        return True
-    except Exception as e:
-        print(f"Error saving quiz attempts: {e}")
-        return False
+# Lookups by (user, task) and (user, simulation) go through the indexed repository
+quiz_repo = QuizAttemptRepository(quiz_attempts_store)
 
 @app.route('/api/quiz/submit', methods=['POST'])
 def submit_quiz():
@@ -249,67 +281,70 @@ def submit_quiz():
         if not all([user_id, task_id, quiz_result]):
             return jsonify({'error': 'Missing required fields'}), 400
         
-        # Load existing attempts
-        attempts = load_quiz_attempts()
-        
-        # Create key for this user+task combination
-        attempt_key = f"{user_id}_{task_id}"
+        # Read, update and persist the record under the store lock so concurrent submissions all count
+        with quiz_repo.exclusive():
+            # Existing record for this user+task combination
+            record = quiz_repo.get(user_id, task_id)
+
+            if record is None:
+                record = {
+                    'user_id': user_id,
+                    'task_id': task_id,
+                    'simulation_id': simulation_id,
+                    'attempts': [],
+                    'best_score': 0,
+                    'passed': False,
+                    'first_attempt_at': quiz_result.get('completedAt'),
+                    'last_attempt_at': quiz_result.get('completedAt')
+                }
+
+            # Add this attempt
+            attempt_record = {
+                'attempt_number': quiz_result.get('attemptNumber', len(record['attempts']) + 1),
+                'score': quiz_result.get('totalScore', 0),
+                'total_marks': quiz_result.get('totalMarks', 0),
+                'percentage': quiz_result.get('percentage', 0),
+                'passed': quiz_result.get('passed', False),
+                'completed_at': quiz_result.get('completedAt'),
+                'correct_count': quiz_result.get('correctCount', 0),
+                'total_questions': quiz_result.get('totalQuestions', 0)
+            }
+            record['attempts'].append(attempt_record)
+            record['last_attempt_at'] = quiz_result.get('completedAt')
+
+            # Update best score and passed status
+            if quiz_result.get('percentage', 0) > record.get('best_score', 0):
+                record['best_score'] = quiz_result.get('percentage', 0)
+
+            if quiz_result.get('passed', False):
+                record['passed'] = True
+
+            # Persist only this user+task record
+            quiz_repo.save(record)
+            # Assigned under the lock; the client's attemptNumber can be stale or repeated
+            attempt_position = len(record['attempts'])
         
-        if attempt_key not in attempts:
-            attempts[attempt_key] = {
+        # Queue the Supabase copy; the outbox delivers it in the background with retries
+        if supabase:
+            supabase_data = {
                 'user_id': user_id,
                 'task_id': task_id,
                 'simulation_id': simulation_id,
-                'attempts': [],
-                'best_score': 0,
-                'passed': False,
-                'first_attempt_at': quiz_result.get('completedAt'),
-                'last_attempt_at': quiz_result.get('completedAt')
+                'score': quiz_result.get('totalScore', 0),
+                'total_marks': quiz_result.get('totalMarks', 0),
+                'percentage': quiz_result.get('percentage', 0),
+                'passed': quiz_result.get('passed', False),
+                'attempt_number': attempt_record['attempt_number'],
+                'completed_at': quiz_result.get('completedAt')
             }
-        
-        # Add this attempt
-        attempt_record = {
-            'attempt_number': quiz_result.get('attemptNumber', len(attempts[attempt_key]['attempts']) + 1),
-            'score': quiz_result.get('totalScore', 0),
-            'total_marks': quiz_result.get('totalMarks', 0),
-            'percentage': quiz_result.get('percentage', 0),
-            'passed': quiz_result.get('passed', False),
-            'completed_at': quiz_result.get('completedAt'),
-            'correct_count': quiz_result.get('correctCount', 0),
-            'total_questions': quiz_result.get('totalQuestions', 0)
-        }
-        attempts[attempt_key]['attempts'].append(attempt_record)
-        attempts[attempt_key]['last_attempt_at'] = quiz_result.get('completedAt')
-        
-        # Update best score and passed status
-        if quiz_result.get('percentage', 0) > attempts[attempt_key].get('best_score', 0):
-            attempts[attempt_key]['best_score'] = quiz_result.get('percentage', 0)
-        
-        if quiz_result.get('passed', False):
-            attempts[attempt_key]['passed'] = True
-        
-        # Save attempts
-        save_quiz_attempts(attempts)
-        
-        # Also try to update in Supabase if available
-        if supabase:
             try:
-                # Try to insert quiz result in Supabase
-                supabase_data = {
-                    'user_id': user_id,
-                    'task_id': task_id,
-                    'simulation_id': simulation_id,
-                    'score': quiz_result.get('totalScore', 0),
-                    'total_marks': quiz_result.get('totalMarks', 0),
-                    'percentage': quiz_result.get('percentage', 0),
-                    'passed': quiz_result.get('passed', False),
-                    'attempt_number': attempt_record['attempt_number'],
-                    'completed_at': quiz_result.get('completedAt')
-                }
-                # This will fail silently if the table doesn't exist
-                supabase.table('quiz_attempts').insert(supabase_data).execute()
+                supabase_outbox.enqueue(
+                    'quiz_attempts',
+                    supabase_data,
+                    key=f"quiz_attempt:{user_id}:{task_id}:{attempt_position}"
+                )
             except Exception as e:
-                print(f"Supabase quiz insert skipped: {e}")
+                print(f"Error queueing Supabase quiz insert: {e}")
         
         # Create notification for quiz result
         if quiz_result.get('passed', False):
@@ -338,38 +373,36 @@ def submit_quiz():
             )
         
         # Track submission in user activity (for admin viewing)
-        if user_id in user_activity_data:
-            if 'submissions' not in user_activity_data[user_id]:
-                user_activity_data[user_id]['submissions'] = []
-            
-            submission_record = {
-                'type': 'quiz',
-                'task_id': task_id,
-                'simulation_id': simulation_id,
-                'score': quiz_result.get('totalScore', 0),
-                'total_marks': quiz_result.get('totalMarks', 0),
-                'percentage': quiz_result.get('percentage', 0),
-                'passed': quiz_result.get('passed', False),
-                'attempt_number': attempt_record['attempt_number'],
-                'timestamp': quiz_result.get('completedAt') or datetime.now().isoformat()
-            }
-            user_activity_data[user_id]['submissions'].insert(0, submission_record)
-            
+        submission_record = {
+            'type': 'quiz',
+            'task_id': task_id,
+            'simulation_id': simulation_id,
+            'score': quiz_result.get('totalScore', 0),
+            'total_marks': quiz_result.get('totalMarks', 0),
+            'percentage': quiz_result.get('percentage', 0),
+            'passed': quiz_result.get('passed', False),
+            'attempt_number': attempt_record['attempt_number'],
+            'timestamp': quiz_result.get('completedAt') or datetime.now().isoformat()
+        }
+        submission_event = activity_event('quiz_submission', {
+            'task_id': task_id,
+            'passed': quiz_result.get('passed', False),
+            'percentage': quiz_result.get('percentage', 0)
+        })
+        
+        def add_submission(activity):
+            activity.setdefault('submissions', []).insert(0, dict(submission_record))
             # Add to activity history
-            add_activity_event(user_id, 'quiz_submission', {
-                'task_id': task_id,
-                'passed': quiz_result.get('passed', False),
-                'percentage': quiz_result.get('percentage', 0)
-            })
-            
-            save_activity_data(user_activity_data)
+            append_activity_event(activity, submission_event)
+        
+        update_activity(user_id, add_submission)
         
         return jsonify({
             'success': True,
             'message': 'Quiz result recorded',
             'passed': quiz_result.get('passed', False),
-            'best_score': attempts[attempt_key]['best_score'],
-            'total_attempts': len(attempts[attempt_key]['attempts'])
+            'best_score': record['best_score'],
+            'total_attempts': len(record['attempts'])
         }), 200
         
     except Exception as e:
@@ -380,11 +413,10 @@ def submit_quiz():
 def get_quiz_attempts(user_id, task_id):
     """Get all quiz attempts for a user on a specific task"""
     try:
-        attempts = load_quiz_attempts()
-        attempt_key = f"{user_id}_{task_id}"
+        record = quiz_repo.get(user_id, task_id)
         
-        if attempt_key in attempts:
-            return jsonify(attempts[attempt_key]), 200
+        if record is not None:
+            return jsonify(record), 200
         else:
             return jsonify({
                 'user_id': user_id,
@@ -402,18 +434,15 @@ def get_quiz_attempts(user_id, task_id):
 def get_quiz_status(user_id, simulation_id):
     """Get quiz completion status for all tasks in a simulation"""
     try:
-        attempts = load_quiz_attempts()
-        
-        # Filter attempts for this user and simulation
+        # Only this user's records within the simulation, via the (user, simulation) index
         task_statuses = {}
-        for key, attempt_data in attempts.items():
-            if attempt_data.get('user_id') == user_id and str(attempt_data.get('simulation_id')) == str(simulation_id):
-                task_id = attempt_data.get('task_id')
-                task_statuses[task_id] = {
-                    'passed': attempt_data.get('passed', False),
-                    'best_score': attempt_data.get('best_score', 0),
-                    'total_attempts': len(attempt_data.get('attempts', []))
-                }
+        for attempt_data in quiz_repo.for_simulation(user_id, simulation_id):
+            task_id = attempt_data.get('task_id')
+            task_statuses[task_id] = {
+                'passed': attempt_data.get('passed', False),
+                'best_score': attempt_data.get('best_score', 0),
+                'total_attempts': len(attempt_data.get('attempts', []))
+            }
         
         return jsonify({
             'user_id': user_id,
@@ -428,26 +457,28 @@ def get_quiz_status(user_id, simulation_id):
 
 # ==================== ENROLLMENT ENDPOINTS ====================
 
-# File-based storage for course enrollments
+# Local storage for course enrollments (JSON journal or SQLite, see storage.py)
 ENROLLMENTS_FILE = Path('enrollments.json')
-
-def load_enrollments():
-    """Load enrollments from JSON file"""
-    if ENROLLMENTS_FILE.exists():
-        try:
-            with open(ENROLLMENTS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return []
-    return []
-
-def save_enrollments(enrollments):
-    """Save enrollments to JSON file"""
-    with open(ENROLLMENTS_FILE, 'w') as f:
-        json.dump(enrollments, f, indent=2)
-
-# Load enrollments on startup
-course_enrollments = load_enrollments()
+enrollments_store = open_store('enrollments', ENROLLMENTS_FILE, default=list)
+
+# Load enrollments on startup; lookups go through the indexed repository
+enrollment_repo = EnrollmentRepository(enrollments_store)
+course_enrollments = enrollment_repo.enrollments
+
+@app.before_request
+def start_activity_compactor():
+    """Start the activity compactor with the first request, not at import (tests and scripts import the app)"""
+    activity_compactor.start()
+
+@app.before_request
+def sync_local_stores():
+    """Pull writes made by other worker processes into this worker's stores before each request"""
+    start_request_deadline()
+    sync_all()
+    enrollment_repo.refresh()
+    quiz_repo.refresh()
+    notification_repo.refresh()
+    activity_summaries.refresh()
 
 @app.route('/enroll', methods=['POST'])
 def enroll_user():
@@ -468,11 +499,7 @@ def enroll_user():
             return jsonify({'error': 'Missing required fields'}), 400
 
         # Check if already enrolled
-        existing = next(
-            (e for e in course_enrollments 
-             if e['user_id'] == user_id and e['internship_id'] == str(internship_id)),
-            None
-        )
+        existing = enrollment_repo.get(user_id, internship_id)
         
         if existing:
             return jsonify({'message': 'Already enrolled', 'is_enrolled': True}), 200
@@ -527,8 +554,7 @@ def enroll_user():
         }
 
         
-        course_enrollments.append(enrollment)
-        save_enrollments(course_enrollments)
+        enrollment_repo.add(enrollment)
         
         # Create notification for successful enrollment
         create_notification(
@@ -544,11 +570,10 @@ def enroll_user():
         )
         
         # Track enrollment in user activity (for admin viewing)
-        if user_id in user_activity_data:
-            add_activity_event(user_id, 'enrollment', {
-                'internship_id': str(internship_id),
-                'internship_name': internship_name
-            })
+        add_activity_event(user_id, 'enrollment', {
+            'internship_id': str(internship_id),
+            'internship_name': internship_name
+        })
         
         return jsonify({
             'message': 'Enrollment successful',
@@ -573,10 +598,7 @@ def check_enrollment_status():
             return jsonify({'error': 'Missing user_id or internship_id'}), 400
 
         # Check enrollment
-        is_enrolled = any(
-            e['user_id'] == user_id and e['internship_id'] == str(internship_id)
-            for e in course_enrollments
-        )
+        is_enrolled = enrollment_repo.is_enrolled(user_id, internship_id)
         
         print(f"[DEBUG] Is enrolled: {is_enrolled}, Total enrollments: {len(course_enrollments)}")
 
@@ -601,31 +623,46 @@ def get_internship_candidates(internship_id):
         print(f"[DEBUG] Total enrollments in system: {len(course_enrollments)}")
         
         # Filter enrollments for this internship
-        candidates = [
-            e for e in course_enrollments 
-            if e['internship_id'] == str(internship_id)
-        ]
+        candidates = enrollment_repo.for_internship(internship_id)
         
         print(f"[DEBUG] Found {len(candidates)} candidates for this internship")
         
         # Sort by enrollment date (latest first)
         candidates.sort(key=lambda x: x['enrolled_at'], reverse=True)
         
-        # Get total number of tasks for this simulation from Supabase tasks table
+        # Task count and candidate progress are independent queries: run them concurrently
         total_tasks_for_sim = 0
+        progress_by_user = {}
         if supabase:
-            try:
-                tasks_response = supabase.table('tasks').select(
-                    'id'
-                ).eq('simulation_id', str(internship_id)).execute()
-                
-                if tasks_response.data:
-                    total_tasks_for_sim = len(tasks_response.data)
-                    print(f"[DEBUG] Found {total_tasks_for_sim} total tasks for this simulation in Supabase")
-            except Exception as e:
-                print(f"[WARNING] Failed to get total tasks count: {str(e)}")
+            results = fan_out({
+                # Shared with GET /admin/internships/<id>/tasks through the catalog cache
+                'tasks': lambda: fetch_simulation_tasks(supabase, str(internship_id)),
+                # A few chunked in_() queries instead of one per candidate
+                'progress': lambda: fetch_in(
+                    supabase,
+                    'user_task_progress',
+                    'user_id, task_id, status',
+                    'user_id',
+                    [e.get('user_id') for e in candidates],
+                    filters={'simulation_id': str(internship_id)}
+                ),
+            })
+            
+            tasks_result = results['tasks']
+            if tasks_result.ok and tasks_result.value:
+                total_tasks_for_sim = len(tasks_result.value)
+                print(f"[DEBUG] Found {total_tasks_for_sim} total tasks for this simulation in Supabase")
+            elif not tasks_result.ok:
+                print(f"[WARNING] Failed to get total tasks count: {str(tasks_result.error)}")
+            
+            progress_result = results['progress']
+            if progress_result.ok:
+                rows, failed = progress_result.value
+                progress_by_user = group_by(rows, 'user_id')
+                print(f"[DEBUG] Supabase progress rows for {len(progress_by_user)} candidates ({len(failed)} lookups failed)")
+            else:
+                print(f"[WARNING] Failed to get candidate progress: {str(progress_result.error)}")
         
-        # Calculate progress for each candidate from Supabase
         for e in candidates:
             user_id = e.get('user_id')
             tasks = e.get('tasks', [])
@@ -633,34 +670,15 @@ def get_internship_candidates(internship_id):
             # Use Supabase total tasks count if available, else use local count
             total_tasks = total_tasks_for_sim if total_tasks_for_sim > 0 else len(tasks)
             
-            # Try to fetch real completion status from Supabase
-            completed_tasks = 0
-            if supabase and user_id:
-                try:
-                    # Query Supabase for completed tasks by this user in this simulation
-                    response = supabase.table('user_task_progress').select(
-                        'task_id, status'
-                    ).eq('user_id', user_id).eq('simulation_id', str(internship_id)).execute()
-                    
-                    if response.data:
-                        # Count only COMPLETED tasks from Supabase
-                        completed_tasks = len([
-                            row for row in response.data 
-                            if row.get('status') == 'completed'
-                        ])
-                        
-                        print(f"[DEBUG] {e.get('user_name')}: {completed_tasks}/{total_tasks} completed (from Supabase)")
-                    else:
-                        # No data in Supabase, use local JSON status
-                        completed_tasks = len([t for t in tasks if t.get('completed') is True])
-                        print(f"[DEBUG] {e.get('user_name')}: No Supabase data, using local JSON - {completed_tasks}/{total_tasks}")
-                        
-                except Exception as supabase_error:
-                    print(f"[WARNING] Supabase query failed for user {user_id}: {str(supabase_error)}")
-                    # Fallback to local JSON
-                    completed_tasks = len([t for t in tasks if t.get('completed') is True])
+            progress_rows = progress_by_user.get(user_id)
+            if progress_rows:
+                # Count only COMPLETED tasks from Supabase
+                completed_tasks = len({
+                    row.get('task_id') for row in progress_rows
+                    if row.get('status') == 'completed'
+                })
             else:
-                # Fallback to local JSON if no Supabase or user_id
+                # No Supabase rows (or no Supabase): use local JSON status
                 completed_tasks = len([t for t in tasks if t.get('completed') is True])
             
             e['total_tasks'] = total_tasks
@@ -691,20 +709,9 @@ def get_internship_candidates(internship_id):
 @app.route('/enrollments/<internship_id>/<user_id>/tasks/<task_id>', methods=['PATCH'])
 def update_task_status(internship_id, user_id, task_id):
     try:
-        updated = False
-
-        for e in course_enrollments:
-            if (
-                e['internship_id'] == internship_id and
-                e['user_id'] == user_id
-            ):
-                for task in e.get('tasks', []):
-                    if task['task_id'] == task_id:
-                        task['completed'] = True
-                        updated = True
+        updated = enrollment_repo.complete_task(user_id, internship_id, task_id)
 
         if updated:
-            save_enrollments(course_enrollments)  # Save updated enrollments to JSON
             return jsonify({'message': 'Task marked as completed'}), 200
 
         return jsonify({'error': 'Task not found'}), 404
@@ -714,22 +721,35 @@ def update_task_status(internship_id, user_id, task_id):
 
 
 
+# Supabase connectivity is probed in the background every HEALTH_PROBE_INTERVAL
+# seconds; /health answers from the last result (add ?deep=1 to probe synchronously)
+HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', '15'))
+
+def _probe_supabase():
+    # Bypass the circuit breaker: while it is open a guarded query never reaches Supabase,
+    # so the probe could not see it recover (the breaker state is reported separately)
+    supabase.unguarded.table('simulations').select('id').limit(1).execute()
+
+supabase_probe = HealthProbe('supabase', _probe_supabase, interval=HEALTH_PROBE_INTERVAL)
+if supabase:
+    supabase_probe.start()
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Check backend health and Supabase connection"""
+    """Check backend health and Supabase connection (cached; ?deep=1 probes now)"""
     try:
         is_supabase_ok = False
         if supabase:
-            try:
-                # Try a simple health check
-                supabase.table('simulations').select('*').limit(1).execute()
-                is_supabase_ok = True
-            except Exception as db_err:
-                print(f"Supabase health check failed: {str(db_err)}")
+            if request.args.get('deep', '').lower() in ('1', 'true', 'yes'):
+                is_supabase_ok = supabase_probe.probe_now()
+            else:
+                is_supabase_ok = supabase_probe.ok
         
         return jsonify({
             'status': 'ok',
             'supabase_connected': is_supabase_ok,
+            'supabase_probe': supabase_probe.snapshot() if supabase else None,
+            'supabase_circuit': supabase_breaker.snapshot(),
             'message': 'Backend is running'
         }), 200
     except Exception as e:
@@ -741,23 +761,19 @@ def health_check():
 
 # Category Management Endpoints
 CATEGORIES_FILE = 'categories.json'
+categories_store = open_store('categories', CATEGORIES_FILE, default=list, ensure_ascii=False)
 
 def load_categories():
-    """Load categories from JSON file"""
-    try:
-        if os.path.exists(CATEGORIES_FILE):
-            with open(CATEGORIES_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
-    except Exception as e:
-        print(f"Error loading categories: {e}")
-        return []
+    """Return the in-memory categories list"""
+    return categories_store.data
 
-def save_categories(categories):
-    """Save categories to JSON file"""
+def save_categories(categories, index=None):
+    """Persist the change to one category (or the whole list if no index is given)"""
     try:
-        with open(CATEGORIES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(categories, f, indent=2, ensure_ascii=False)
+        if index is None:
+            categories_store.replace(categories)
+        else:
+            categories_store.set(index, categories[index])
         return True
     except Exception as e:
         print(f"Error saving categories: {e}")
@@ -810,7 +826,7 @@ def add_category():
         
         # All validations passed - save category
         categories.append(category)
-        if save_categories(categories):
+        if save_categories(categories, len(categories) - 1):
             return jsonify({'message': 'Category added successfully', 'category': category}), 201
         else:
             return jsonify({'error': 'Failed to save category'}), 500
@@ -859,6 +875,33 @@ def search_categories():
 
 # ===== USER PROFILE API ENDPOINTS =====
 
+def summarize_enrollment(enrollment):
+    """Shape one enrollment for the admin profile views"""
+    # Use data directly from enrollment (already has all needed fields)
+    internship_name = enrollment.get('internship_name', 'Unknown Internship')
+    total_tasks = enrollment.get('total_tasks', 0)
+    
+    # Handle completed_tasks - could be a number or array
+    completed_tasks_data = enrollment.get('completed_tasks', 0)
+    if isinstance(completed_tasks_data, list):
+        completed_tasks = len(completed_tasks_data)
+    else:
+        completed_tasks = int(completed_tasks_data) if completed_tasks_data else 0
+    
+    # Use progress from enrollment or calculate it
+    progress = enrollment.get('progress', 0)
+    if total_tasks > 0 and progress == 0:
+        progress = round((completed_tasks / total_tasks * 100))
+    
+    return {
+        'internship_id': enrollment.get('internship_id'),
+        'internship_name': internship_name,
+        'enrolled_at': enrollment.get('enrolled_at'),
+        'completed_tasks': completed_tasks,
+        'total_tasks': total_tasks,
+        'progress': progress
+    }
+
 @app.route('/admin/user/<user_id>', methods=['GET'])
 def get_user_profile(user_id):
     """
@@ -866,59 +909,23 @@ def get_user_profile(user_id):
     Used by admin to view student profiles from enrolled candidates list.
     """
     try:
-        user_data = None
-        enrollments_data = []
+        # Served from the indexed in-memory view (synced with other workers before each request)
+        user_enrollments = enrollment_repo.for_user(user_id)
+        enrollments_data = [summarize_enrollment(e) for e in user_enrollments]
         
-        # Try to get user info from enrollments first
-        try:
-            with open('enrollments.json', 'r') as f:
-                all_enrollments = json.load(f)
-        except FileNotFoundError:
-            all_enrollments = []
-        except json.JSONDecodeError:
-            all_enrollments = []
-        
-        # Find all enrollments for this user
-        for enrollment in all_enrollments:
-            if enrollment.get('user_id') == user_id:
-                # Use data directly from enrollment (already has all needed fields)
-                internship_name = enrollment.get('internship_name', 'Unknown Internship')
-                total_tasks = enrollment.get('total_tasks', 0)
-                
-                # Handle completed_tasks - could be a number or array
-                completed_tasks_data = enrollment.get('completed_tasks', 0)
-                if isinstance(completed_tasks_data, list):
-                    completed_tasks = len(completed_tasks_data)
-                else:
-                    completed_tasks = int(completed_tasks_data) if completed_tasks_data else 0
-                
-                # Use progress from enrollment or calculate it
-                progress = enrollment.get('progress', 0)
-                if total_tasks > 0 and progress == 0:
-                    progress = round((completed_tasks / total_tasks * 100))
-                
-                enrollments_data.append({
-                    'internship_id': enrollment.get('internship_id'),
-                    'internship_name': internship_name,
-                    'enrolled_at': enrollment.get('enrolled_at'),
-                    'completed_tasks': completed_tasks,
-                    'total_tasks': total_tasks,
-                    'progress': progress
-                })
-                
-                # Extract user info from first matching enrollment
-                if not user_data:
-                    user_data = {
-                        'id': user_id,
-                        'user_name': enrollment.get('user_name', 'Unknown User'),
-                        'user_email': enrollment.get('user_email', 'No email'),
-                        'email': enrollment.get('user_email', 'No email'),
-                        'display_name': enrollment.get('user_name', 'Unknown User'),
-                        'created_at': enrollment.get('enrolled_at')
-                    }
-        
-        # If no user data found, return basic info
-        if not user_data:
+        # Extract user info from first matching enrollment
+        if user_enrollments:
+            first = user_enrollments[0]
+            user_data = {
+                'id': user_id,
+                'user_name': first.get('user_name', 'Unknown User'),
+                'user_email': first.get('user_email', 'No email'),
+                'email': first.get('user_email', 'No email'),
+                'display_name': first.get('user_name', 'Unknown User'),
+                'created_at': first.get('enrolled_at')
+            }
+        else:
+            # If no user data found, return basic info
             user_data = {
                 'id': user_id,
                 'user_name': 'Unknown User',
@@ -944,42 +951,7 @@ def get_user_enrollments(user_id):
     Get all enrollments for a specific user.
     """
     try:
-        enrollments_data = []
-        
-        try:
-            with open('enrollments.json', 'r') as f:
-                all_enrollments = json.load(f)
-        except FileNotFoundError:
-            all_enrollments = []
-        except json.JSONDecodeError:
-            all_enrollments = []
-        
-        for enrollment in all_enrollments:
-            if enrollment.get('user_id') == user_id:
-                # Use data directly from enrollment
-                internship_name = enrollment.get('internship_name', 'Unknown Internship')
-                total_tasks = enrollment.get('total_tasks', 0)
-                
-                # Handle completed_tasks - could be a number or array
-                completed_tasks_data = enrollment.get('completed_tasks', 0)
-                if isinstance(completed_tasks_data, list):
-                    completed_tasks = len(completed_tasks_data)
-                else:
-                    completed_tasks = int(completed_tasks_data) if completed_tasks_data else 0
-                
-                # Use progress from enrollment or calculate it
-                progress = enrollment.get('progress', 0)
-                if total_tasks > 0 and progress == 0:
-                    progress = round((completed_tasks / total_tasks * 100))
-                
-                enrollments_data.append({
-                    'internship_id': enrollment.get('internship_id'),
-                    'internship_name': internship_name,
-                    'enrolled_at': enrollment.get('enrolled_at'),
-                    'completed_tasks': completed_tasks,
-                    'total_tasks': total_tasks,
-                    'progress': progress
-                })
+        enrollments_data = [summarize_enrollment(e) for e in enrollment_repo.for_user(user_id)]
         
         return jsonify({'enrollments': enrollments_data}), 200
         
@@ -992,52 +964,138 @@ def get_user_enrollments(user_id):
 
 # ==================== ACTIVITY TRACKING ENDPOINTS ====================
 
-# File-based storage for user activity
+# Local storage for user activity (JSON journal or SQLite, see storage.py).
+# Users are spread over ACTIVITY_SHARDS shards (user_activity/ directory) so an
+# event only rewrites the shard holding that user; the old single file is
+# split into shards on first start.
 ACTIVITY_FILE = Path('user_activity.json')
+ACTIVITY_SHARDS = int(os.getenv('ACTIVITY_SHARDS', '16'))
+
+# Write-behind: heartbeats only mark the user dirty; dirty users are persisted at most
+# once per ACTIVITY_FLUSH_INTERVAL seconds or after ACTIVITY_FLUSH_MAX_EVENTS events.
+# Set ACTIVITY_FLUSH_INTERVAL=0 to write through on every event.
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', '5'))
+ACTIVITY_FLUSH_MAX_EVENTS = int(os.getenv('ACTIVITY_FLUSH_MAX_EVENTS', '500'))
+
+activity_store = ShardedStore(
+    'user_activity',
+    ACTIVITY_FILE,
+    shard_count=ACTIVITY_SHARDS,
+    flush_interval=ACTIVITY_FLUSH_INTERVAL,
+    flush_max_events=ACTIVITY_FLUSH_MAX_EVENTS
+)
+
+# Per-user summary rows for the admin overview, updated on every saved activity change
+activity_summaries = ActivitySummaryRepository(activity_store)
+
+# Only the newest ACTIVITY_KEEP_SESSIONS sessions and ACTIVITY_KEEP_PAGE_VISITS page
+# visits per user are kept raw; older ones are rolled into daily aggregates as each
+# shard loads and every ACTIVITY_COMPACT_INTERVAL seconds (see activity_retention.py)
+ACTIVITY_KEEP_SESSIONS = int(os.getenv('ACTIVITY_KEEP_SESSIONS', '50'))
+ACTIVITY_KEEP_PAGE_VISITS = int(os.getenv('ACTIVITY_KEEP_PAGE_VISITS', '200'))
+ACTIVITY_COMPACT_INTERVAL = float(os.getenv('ACTIVITY_COMPACT_INTERVAL', '3600'))
+activity_compactor = ActivityCompactor(
+    activity_store,
+    keep_sessions=ACTIVITY_KEEP_SESSIONS,
+    keep_page_visits=ACTIVITY_KEEP_PAGE_VISITS,
+    interval=ACTIVITY_COMPACT_INTERVAL
+)
+
+# Platform-wide hourly/daily counters for /admin/analytics/timeseries, fed by the
+# activity routes and merged into the store every ACTIVITY_ROLLUP_FLUSH_INTERVAL seconds;
+# hourly buckets older than ACTIVITY_ROLLUP_HOURLY_RETENTION_DAYS are pruned
+ACTIVITY_ROLLUPS_FILE = Path('activity_rollups.json')
+ACTIVITY_ROLLUP_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_ROLLUP_FLUSH_INTERVAL', '5'))
+ACTIVITY_ROLLUP_HOURLY_RETENTION_DAYS = float(os.getenv('ACTIVITY_ROLLUP_HOURLY_RETENTION_DAYS', '30'))
+activity_rollups_store = open_store('activity_rollups', ACTIVITY_ROLLUPS_FILE, default=dict)
+activity_rollups = ActivityRollups(
+    activity_rollups_store,
+    flush_interval=ACTIVITY_ROLLUP_FLUSH_INTERVAL,
+    hourly_retention_days=ACTIVITY_ROLLUP_HOURLY_RETENTION_DAYS
+).start()
+
+# Default ranges and bucket limit of /admin/analytics/timeseries
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_DEFAULT_HOURS = 48
+ANALYTICS_MAX_BUCKETS = 2000
 
 def load_activity_data():
-    """Load activity data from JSON file"""
-    if ACTIVITY_FILE.exists():
-        try:
-            with open(ACTIVITY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading activity data: {e}")
-            return {}
-    return {}
+    """Return the activity map (shards are loaded on first access)"""
+    return activity_store.data
+
+# Keep only the last ACTIVITY_HISTORY_LIMIT events per user (newest first)
+ACTIVITY_HISTORY_LIMIT = 500
+
+# Pages listed in a user's page analytics (most time first)
+PAGE_ANALYTICS_TOP = 15
 
-def save_activity_data(data):
-    """Save activity data to JSON file"""
+# Page size defaults for /admin/all-users/activity
+ACTIVITY_PAGE_SIZE = 50
+ACTIVITY_PAGE_MAX = 500
+
+# Page size defaults for /admin/activity/submissions
+SUBMISSIONS_PAGE_SIZE = 200
+SUBMISSIONS_PAGE_MAX = 1000
+
+def save_activity_data(data, user_id=None, rebase=None):
+    """
+    Persist one user's activity change (on the next write-behind flush).
+    ``rebase(record)`` re-applies the change should another worker write the
+    record before the flush. Without a user_id the whole map is persisted.
+    """
     try:
-        with open(ACTIVITY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        if user_id is None:
+            activity_store.replace(data)
+            activity_summaries.rebuild()
+            return
+        activity_store.mark_dirty(user_id, rebase)
+        activity_summaries.update(user_id)
     except Exception as e:
         print(f"Error saving activity data: {e}")
 
+def update_activity(user_id, change, create=None):
+    """
+    Apply ``change(record)`` to a user's activity record and save it.
+
+    The read-modify-write runs under the record's cross-process write lock,
+    so it starts from other workers' latest flushed state, and ``change`` is
+    kept to be re-applied if another worker writes the record before ours is
+    flushed. ``change`` must only depend on its argument and values computed
+    beforehand. ``create()`` builds the record of a new user; without it
+    unknown users are skipped. Returns what ``change`` returned (None if skipped).
+    """
+    with activity_store.exclusive(user_id):
+        if user_id not in user_activity_data:
+            if create is None:
+                return None
+            user_activity_data[user_id] = create()
+        result = change(user_activity_data[user_id])
+        save_activity_data(user_activity_data, user_id, rebase=change)
+        return result
+
 # Load activity data on startup
 user_activity_data = load_activity_data()
 
-def add_activity_event(user_id, event_type, details=None):
-    """Helper function to add an activity event to a user's history"""
-    if user_id not in user_activity_data:
-        return
-    
-    event = {
+def activity_event(event_type, details=None, timestamp=None):
+    """An activity history entry, stamped with the current time unless a timestamp is given"""
+    return {
         'event_type': event_type,
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': timestamp or datetime.now().isoformat(),
         'details': details or {}
     }
-    
-    if 'activity_history' not in user_activity_data[user_id]:
-        user_activity_data[user_id]['activity_history'] = []
-    
-    # Add to beginning (newest first)
-    user_activity_data[user_id]['activity_history'].insert(0, event)
-    
-    # Keep only last 500 events per user
-    user_activity_data[user_id]['activity_history'] = user_activity_data[user_id]['activity_history'][:500]
-    
-    save_activity_data(user_activity_data)
+
+def append_activity_event(activity, event):
+    """Add an event to a record's history (bounded deque, newest first: the oldest falls off past ACTIVITY_HISTORY_LIMIT)"""
+    history = activity.get('activity_history')
+    if not isinstance(history, deque):
+        history = deque(history or [], maxlen=ACTIVITY_HISTORY_LIMIT)
+        activity['activity_history'] = history
+    history.appendleft(event)
+
+def add_activity_event(user_id, event_type, details=None):
+    """Helper function to add an activity event to a user's history"""
+    event = activity_event(event_type, details)
+    update_activity(user_id, lambda activity: append_activity_event(activity, event))
 
 @app.route('/activity/track', methods=['POST', 'OPTIONS'])
 def track_activity():
@@ -1054,9 +1112,13 @@ def track_activity():
         if not user_id:
             return jsonify({'error': 'Missing user_id'}), 400
         
+        # Computed once: track() may be re-applied (see update_activity)
+        now = datetime.now().isoformat()
+        new_session_id = (session_id or str(uuid.uuid4())) if event_type == 'session_start' else None
+        
         # Initialize user activity record if not exists
-        if user_id not in user_activity_data:
-            user_activity_data[user_id] = {
+        def new_record():
+            return {
                 'user_id': user_id,
                 'user_email': data.get('user_email'),
                 'user_name': data.get('user_name'),
@@ -1071,110 +1133,121 @@ def track_activity():
                 'submissions': []
             }
         
-        user_data = user_activity_data[user_id]
-        user_data['last_seen'] = timestamp
-        
-        # Update user info if provided
-        if data.get('user_email'):
-            user_data['user_email'] = data.get('user_email')
-        if data.get('user_name'):
-            user_data['user_name'] = data.get('user_name')
-        
-        if event_type == 'session_start':
-            # Start a new session
-            session_data = {
-                'session_id': session_id or data.get('session_id') or str(uuid.uuid4()),
-                'started_at': timestamp,
-                'ended_at': None,
-                'duration_seconds': 0,
-                'active_time_seconds': 0,
-                'pages_visited': [],
-                'is_active': True,
-                'user_agent': data.get('user_agent'),
-                'screen_resolution': data.get('screen_resolution'),
-                'timezone': data.get('timezone')
-            }
-            user_data['current_session'] = session_data
+        def track(user_data):
+            user_data['last_seen'] = timestamp
+            rollup = {}
+        
+            # Update user info if provided
+            if data.get('user_email'):
+                user_data['user_email'] = data.get('user_email')
+            if data.get('user_name'):
+                user_data['user_name'] = data.get('user_name')
+        
+            if event_type == 'session_start':
+                # Start a new session
+                session_data = {
+                    'session_id': new_session_id,
+                    'started_at': timestamp,
+                    'ended_at': None,
+                    'duration_seconds': 0,
+                    'active_time_seconds': 0,
+                    'pages_visited': [],
+                    'is_active': True,
+                    'user_agent': data.get('user_agent'),
+                    'screen_resolution': data.get('screen_resolution'),
+                    'timezone': data.get('timezone')
+                }
+                user_data['current_session'] = session_data
+                rollup['sessions_started'] = 1
             
-            # Add to activity history
-            add_activity_event(user_id, 'session_start', {'session_id': session_data['session_id']})
+                # Add to activity history
+                append_activity_event(user_data, activity_event('session_start', {'session_id': session_data['session_id']}, now))
             
-        elif event_type == 'heartbeat':
-            # Update current session duration
-            if user_data.get('current_session'):
-                session_duration = data.get('session_duration', 0)
-                active_time = data.get('active_time', 0)
-                user_data['current_session']['duration_seconds'] = session_duration
-                user_data['current_session']['active_time_seconds'] = active_time
-                user_data['current_session']['last_heartbeat'] = timestamp
-                user_data['current_session']['current_page'] = data.get('current_page')
-                user_data['current_session']['is_active'] = True
+            elif event_type == 'heartbeat':
+                # Update current session duration
+                if user_data.get('current_session'):
+                    session_duration = data.get('session_duration', 0)
+                    active_time = data.get('active_time', 0)
+                    user_data['current_session']['duration_seconds'] = session_duration
+                    user_data['current_session']['active_time_seconds'] = active_time
+                    user_data['current_session']['last_heartbeat'] = timestamp
+                    user_data['current_session']['current_page'] = data.get('current_page')
+                    user_data['current_session']['is_active'] = True
                 
-        elif event_type == 'user_idle':
-            # User became idle
-            if user_data.get('current_session'):
-                user_data['current_session']['is_active'] = False
-                user_data['current_session']['idle_started_at'] = data.get('idle_started_at')
-                user_data['current_session']['duration_seconds'] = data.get('session_duration', 0)
-                user_data['current_session']['active_time_seconds'] = data.get('active_time', 0)
+            elif event_type == 'user_idle':
+                # User became idle
+                if user_data.get('current_session'):
+                    user_data['current_session']['is_active'] = False
+                    user_data['current_session']['idle_started_at'] = data.get('idle_started_at')
+                    user_data['current_session']['duration_seconds'] = data.get('session_duration', 0)
+                    user_data['current_session']['active_time_seconds'] = data.get('active_time', 0)
                 
-        elif event_type == 'user_returned':
-            # User returned from idle/tab switch
-            if user_data.get('current_session'):
-                user_data['current_session']['is_active'] = True
-                user_data['current_session']['duration_seconds'] = data.get('session_duration', 0)
+            elif event_type == 'user_returned':
+                # User returned from idle/tab switch
+                if user_data.get('current_session'):
+                    user_data['current_session']['is_active'] = True
+                    user_data['current_session']['duration_seconds'] = data.get('session_duration', 0)
                 
-        elif event_type == 'activity_resume':
-            # User resumed activity after being idle
-            if user_data.get('current_session'):
-                user_data['current_session']['is_active'] = True
-                user_data['current_session']['resumed_at'] = data.get('resumed_at')
+            elif event_type == 'activity_resume':
+                # User resumed activity after being idle
+                if user_data.get('current_session'):
+                    user_data['current_session']['is_active'] = True
+                    user_data['current_session']['resumed_at'] = data.get('resumed_at')
                 
-        elif event_type == 'session_end':
-            # End current session
-            if user_data.get('current_session'):
-                session = user_data['current_session']
-                session['ended_at'] = timestamp
-                session['duration_seconds'] = data.get('session_duration', 0)
-                session['active_time_seconds'] = data.get('active_time', 0)
-                session['is_active'] = False
-                session['ended_reason'] = data.get('ended_reason', 'unknown')
-                user_data['sessions'].append(session)
-                user_data['total_session_time'] += session['duration_seconds']
-                user_data['total_active_time'] += session.get('active_time_seconds', 0)
-                user_data['current_session'] = None
+            elif event_type == 'session_end':
+                # End current session
+                if user_data.get('current_session'):
+                    session = user_data['current_session']
+                    session['ended_at'] = timestamp
+                    session['duration_seconds'] = data.get('session_duration', 0)
+                    session['active_time_seconds'] = data.get('active_time', 0)
+                    session['is_active'] = False
+                    session['ended_reason'] = data.get('ended_reason', 'unknown')
+                    record_session_pages(user_data, session)
+                    user_data['sessions'].append(session)
+                    user_data['total_session_time'] += session['duration_seconds']
+                    user_data['total_active_time'] += session.get('active_time_seconds', 0)
+                    user_data['current_session'] = None
+                    rollup.update(
+                        sessions_ended=1,
+                        session_seconds=session['duration_seconds'],
+                        active_seconds=session.get('active_time_seconds', 0)
+                    )
                 
-                # Add to activity history
-                add_activity_event(user_id, 'session_end', {
-                    'session_id': session['session_id'],
-                    'duration_seconds': session['duration_seconds'],
-                    'active_time_seconds': session.get('active_time_seconds', 0),
-                    'ended_reason': session.get('ended_reason')
-                })
+                    # Add to activity history
+                    append_activity_event(user_data, activity_event('session_end', {
+                        'session_id': session['session_id'],
+                        'duration_seconds': session['duration_seconds'],
+                        'active_time_seconds': session.get('active_time_seconds', 0),
+                        'ended_reason': session.get('ended_reason')
+                    }, now))
                 
-        elif event_type == 'page_view':
-            # Track page view
-            page_visit = {
-                'page_path': data.get('page_path'),
-                'page_title': data.get('page_title'),
-                'visited_at': timestamp,
-                'previous_page': data.get('previous_page'),
-                'session_id': session_id
-            }
-            if user_data.get('current_session'):
-                user_data['current_session']['pages_visited'].append(page_visit)
+            elif event_type == 'page_view':
+                # Track page view
+                page_visit = {
+                    'page_path': data.get('page_path'),
+                    'page_title': data.get('page_title'),
+                    'visited_at': timestamp,
+                    'previous_page': data.get('previous_page'),
+                    'session_id': session_id
+                }
+                rollup['page_views'] = 1
+                if user_data.get('current_session'):
+                    user_data['current_session']['pages_visited'].append(page_visit)
                 
-        elif event_type == 'visibility_change':
-            # Track when user switches tabs/minimizes
-            if user_data.get('current_session'):
-                user_data['current_session']['last_visibility_state'] = data.get('visibility_state')
-                user_data['current_session']['duration_seconds'] = data.get('session_duration', 0)
-                if data.get('visibility_state') == 'hidden':
-                    user_data['current_session']['hidden_at'] = timestamp
-                else:
-                    user_data['current_session']['visible_at'] = timestamp
-        
-        save_activity_data(user_activity_data)
+            elif event_type == 'visibility_change':
+                # Track when user switches tabs/minimizes
+                if user_data.get('current_session'):
+                    user_data['current_session']['last_visibility_state'] = data.get('visibility_state')
+                    user_data['current_session']['duration_seconds'] = data.get('session_duration', 0)
+                    if data.get('visibility_state') == 'hidden':
+                        user_data['current_session']['hidden_at'] = timestamp
+                    else:
+                        user_data['current_session']['visible_at'] = timestamp
+            return rollup
+        
+        rollup = update_activity(user_id, track, create=new_record)
+        activity_rollups.record(user_id, **rollup)
         return jsonify({'status': 'success'}), 200
         
     except Exception as e:
@@ -1200,24 +1273,26 @@ def track_page_duration():
         if not user_id:
             return jsonify({'error': 'Missing user_id'}), 400
         
-        if user_id not in user_activity_data:
-            user_activity_data[user_id] = {
+        def new_record():
+            return {
                 'user_id': user_id,
                 'page_visits': [],
                 'sessions': [],
                 'total_session_time': 0
             }
         
-        # Add page visit with duration
-        page_visit = {
-            'page_path': page_path,
-            'duration_seconds': duration_seconds,
-            'started_at': started_at,
-            'ended_at': ended_at
-        }
+        def add_visit(user_data):
+            # Add page visit with duration
+            page_visit = {
+                'page_path': page_path,
+                'duration_seconds': duration_seconds,
+                'started_at': started_at,
+                'ended_at': ended_at
+            }
+            record_page_time(user_data, page_path, duration_seconds)
+            user_data['page_visits'].append(page_visit)
         
-        user_activity_data[user_id]['page_visits'].append(page_visit)
-        save_activity_data(user_activity_data)
+        update_activity(user_id, add_visit, create=new_record)
         
         return jsonify({'status': 'success'}), 200
         
@@ -1239,9 +1314,12 @@ def handle_session_end():
         if not user_id:
             return jsonify({'status': 'ok'}), 200
         
+        # Computed once: end_session() may be re-applied (see update_activity)
+        now = datetime.now().isoformat()
+        
         # Initialize user data if not exists
-        if user_id not in user_activity_data:
-            user_activity_data[user_id] = {
+        def new_record():
+            return {
                 'user_id': user_id,
                 'user_email': data.get('user_email'),
                 'user_name': data.get('user_name'),
@@ -1256,48 +1334,59 @@ def handle_session_end():
                 'submissions': []
             }
         
-        user_data = user_activity_data[user_id]
-        user_data['last_seen'] = data.get('timestamp')
-        
-        # Update user info if provided
-        if data.get('user_email'):
-            user_data['user_email'] = data.get('user_email')
-        if data.get('user_name'):
-            user_data['user_name'] = data.get('user_name')
-        
-        # End current session
-        if user_data.get('current_session'):
-            session = user_data['current_session']
-            session['ended_at'] = data.get('timestamp')
-            session['duration_seconds'] = data.get('session_duration', 0)
-            session['active_time_seconds'] = data.get('active_time', 0)
-            session['ended_reason'] = data.get('ended_reason', 'page_unload')
-            session['is_active'] = False
-            user_data['sessions'].append(session)
-            user_data['total_session_time'] += session['duration_seconds']
-            user_data['total_active_time'] += session.get('active_time_seconds', 0)
-            user_data['current_session'] = None
+        def end_session(user_data):
+            user_data['last_seen'] = data.get('timestamp')
+            rollup = {}
+        
+            # Update user info if provided
+            if data.get('user_email'):
+                user_data['user_email'] = data.get('user_email')
+            if data.get('user_name'):
+                user_data['user_name'] = data.get('user_name')
+        
+            # End current session
+            if user_data.get('current_session'):
+                session = user_data['current_session']
+                session['ended_at'] = data.get('timestamp')
+                session['duration_seconds'] = data.get('session_duration', 0)
+                session['active_time_seconds'] = data.get('active_time', 0)
+                session['ended_reason'] = data.get('ended_reason', 'page_unload')
+                session['is_active'] = False
+                record_session_pages(user_data, session)
+                user_data['sessions'].append(session)
+                user_data['total_session_time'] += session['duration_seconds']
+                user_data['total_active_time'] += session.get('active_time_seconds', 0)
+                user_data['current_session'] = None
+                rollup.update(
+                    sessions_ended=1,
+                    session_seconds=session['duration_seconds'],
+                    active_seconds=session.get('active_time_seconds', 0)
+                )
             
-            # Add to activity history
-            add_activity_event(user_id, 'session_end', {
-                'session_id': session.get('session_id'),
-                'duration_seconds': session['duration_seconds'],
-                'active_time_seconds': session.get('active_time_seconds', 0),
-                'ended_reason': session.get('ended_reason')
-            })
+                # Add to activity history
+                append_activity_event(user_data, activity_event('session_end', {
+                    'session_id': session.get('session_id'),
+                    'duration_seconds': session['duration_seconds'],
+                    'active_time_seconds': session.get('active_time_seconds', 0),
+                    'ended_reason': session.get('ended_reason')
+                }, now))
+        
+            # Track last page duration
+            if data.get('last_page') and data.get('last_page_duration'):
+                page_visit = {
+                    'page_path': data.get('last_page'),
+                    'duration_seconds': data.get('last_page_duration'),
+                    'ended_at': data.get('timestamp'),
+                    'session_id': data.get('session_id')
+                }
+                record_page_time(user_data, page_visit['page_path'], page_visit['duration_seconds'])
+                user_data['page_visits'].append(page_visit)
         
-        # Track last page duration
-        if data.get('last_page') and data.get('last_page_duration'):
-            page_visit = {
-                'page_path': data.get('last_page'),
-                'duration_seconds': data.get('last_page_duration'),
-                'ended_at': data.get('timestamp'),
-                'session_id': data.get('session_id')
-            }
-            user_data['page_visits'].append(page_visit)
+            user_data['last_seen'] = data.get('timestamp')
+            return rollup
         
-        user_data['last_seen'] = data.get('timestamp')
-        save_activity_data(user_activity_data)
+        rollup = update_activity(user_id, end_session, create=new_record)
+        activity_rollups.record(user_id, **rollup)
         
         return jsonify({'status': 'success'}), 200
         
@@ -1313,7 +1402,7 @@ def get_user_activity(user_id):
         activity = user_activity_data.get(user_id, {})
         
         # Calculate aggregated stats
-        total_sessions = len(activity.get('sessions', []))
+        total_sessions = session_count(activity)
         total_time = activity.get('total_session_time', 0)
         total_active_time = activity.get('total_active_time', 0)
         
@@ -1324,42 +1413,15 @@ def get_user_activity(user_id):
             total_time += current_duration
             total_active_time += current_active_time
         
-        # Group page visits by path and calculate total time per page
-        page_time_map = {}
-        for visit in activity.get('page_visits', []):
-            path = visit.get('page_path', 'Unknown')
-            duration = visit.get('duration_seconds', 0)
-            if path in page_time_map:
-                page_time_map[path]['total_seconds'] += duration
-                page_time_map[path]['visit_count'] += 1
-            else:
-                page_time_map[path] = {
-                    'page_path': path,
-                    'total_seconds': duration,
-                    'visit_count': 1
-                }
-        
-        # Also include pages from sessions
-        for session in activity.get('sessions', []):
-            for page in session.get('pages_visited', []):
-                path = page.get('page_path', 'Unknown')
-                if path not in page_time_map:
-                    page_time_map[path] = {
-                        'page_path': path,
-                        'total_seconds': 0,
-                        'visit_count': 0
-                    }
-                page_time_map[path]['visit_count'] += 1
-        
-        page_analytics = list(page_time_map.values())
-        page_analytics.sort(key=lambda x: x['total_seconds'], reverse=True)
+        # Per-path counters are maintained as page events arrive
+        page_analytics = top_pages(activity, PAGE_ANALYTICS_TOP) if activity else []
         
         # Get recent sessions (last 20)
         recent_sessions = activity.get('sessions', [])[-20:]
         recent_sessions.reverse()
         
         # Get activity history (submissions, quiz attempts, etc.)
-        activity_history = activity.get('activity_history', [])[:100]
+        activity_history = list(islice(activity.get('activity_history', []), 100))
         
         # Get submissions
         submissions = activity.get('submissions', [])
@@ -1394,7 +1456,8 @@ def get_user_activity(user_id):
             'is_currently_active': is_currently_active,
             'current_session_duration': current_session_duration,
             'current_page': activity.get('current_session', {}).get('current_page') if activity.get('current_session') else None,
-            'page_analytics': page_analytics[:15],  # Top 15 pages
+            'page_analytics': page_analytics,
+            'daily_rollups': daily_rollups(activity),
             'recent_sessions': recent_sessions,
             'activity_history': activity_history,
             'submissions': submissions
@@ -1409,68 +1472,54 @@ def get_user_activity(user_id):
 
 @app.route('/admin/all-users/activity', methods=['GET'])
 def get_all_users_activity():
-    """Get activity summary for all users - Admin only"""
+    """
+    Get activity summary for all users - Admin only
+    
+    Served from the maintained per-user summaries. Optional query parameters:
+        sort      last_seen (default), first_seen, total_sessions, total_time_seconds,
+                  total_active_time_seconds, submissions_count, is_currently_active,
+                  user_name, user_email
+        order     desc (default) or asc
+        status    online / offline
+        q         search in name, email and user id
+        page, per_page
+                  server-side pagination (per_page up to ACTIVITY_PAGE_MAX);
+                  without them every matching user is returned
+    """
     try:
-        users_summary = []
+        sort = request.args.get('sort', 'last_seen')
+        descending = request.args.get('order', 'desc').lower() != 'asc'
+        status = request.args.get('status')
+        search = request.args.get('q', '').strip() or None
         
-        for user_id, activity in user_activity_data.items():
-            # Calculate total time
-            total_time = activity.get('total_session_time', 0)
-            total_active_time = activity.get('total_active_time', 0)
-            
-            if activity.get('current_session'):
-                total_time += activity['current_session'].get('duration_seconds', 0)
-                total_active_time += activity['current_session'].get('active_time_seconds', 0)
-            
-            # Count submissions
-            submissions_count = len(activity.get('submissions', []))
-            
-            # Check if user is currently online
-            is_currently_active = False
-            if activity.get('current_session'):
-                is_currently_active = activity['current_session'].get('is_active', False)
-                
-                # Check last heartbeat time
-                last_heartbeat = activity['current_session'].get('last_heartbeat')
-                if last_heartbeat:
-                    try:
-                        heartbeat_time = datetime.fromisoformat(last_heartbeat.replace('Z', '+00:00'))
-                        now = datetime.now(heartbeat_time.tzinfo) if heartbeat_time.tzinfo else datetime.now()
-                        time_since_heartbeat = (now - heartbeat_time).total_seconds()
-                        is_currently_active = time_since_heartbeat < 120  # 2 minutes
-                    except:
-                        pass
-            
-            users_summary.append({
-                'user_id': user_id,
-                'user_email': activity.get('user_email', 'Unknown'),
-                'user_name': activity.get('user_name', 'Unknown'),
-                'first_seen': activity.get('first_seen'),
-                'last_seen': activity.get('last_seen'),
-                'total_sessions': len(activity.get('sessions', [])),
-                'total_time_seconds': total_time,
-                'total_active_time_seconds': total_active_time,
-                'is_currently_active': is_currently_active,
-                'current_page': activity.get('current_session', {}).get('current_page') if activity.get('current_session') else None,
-                'submissions_count': submissions_count
-            })
-        
-        # Sort by last_seen (most recent first)
-        users_summary.sort(key=lambda x: x.get('last_seen') or '', reverse=True)
-        
-        # Calculate overall stats
-        total_users = len(users_summary)
-        active_users = sum(1 for u in users_summary if u['is_currently_active'])
-        total_time_all = sum(u['total_time_seconds'] for u in users_summary)
+        paginated = 'page' in request.args or 'per_page' in request.args
+        try:
+            page = max(int(request.args.get('page', 1)), 1)
+            per_page = min(max(int(request.args.get('per_page', ACTIVITY_PAGE_SIZE)), 1), ACTIVITY_PAGE_MAX)
+        except ValueError:
+            return jsonify({'error': 'page and per_page must be integers'}), 400
+        
+        now = time.time()
+        if paginated:
+            users_summary, total = activity_summaries.page(
+                sort, descending, offset=(page - 1) * per_page, limit=per_page,
+                status=status, search=search, now=now
+            )
+        else:
+            users_summary, total = activity_summaries.page(sort, descending, status=status, search=search, now=now)
         
-        return jsonify({
+        response = {
             'users': users_summary,
-            'stats': {
-                'total_users': total_users,
-                'active_users': active_users,
-                'total_time_all_users': total_time_all
+            'stats': activity_summaries.stats(now)
+        }
+        if paginated:
+            response['pagination'] = {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
             }
-        }), 200
+        return jsonify(response), 200
         
     except Exception as e:
         print(f"Error getting all users activity: {e}")
@@ -1479,28 +1528,72 @@ def get_all_users_activity():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/admin/supabase/metrics', methods=['GET'])
+def get_supabase_metrics():
+    """Supabase query latency histograms and error counts per table and operation, plus pool settings - Admin only"""
+    try:
+        return jsonify({
+            'tables': supabase_metrics.snapshot(),
+            'pool': pool_config(),
+            'circuit': supabase_breaker.snapshot()
+        }), 200
+    except Exception as e:
+        print(f"Error getting Supabase metrics: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/admin/storage/metrics', methods=['GET'])
+def get_storage_metrics():
+    """Journal size, write-behind staleness and flush cost for each local store, plus catalog cache hit rates - Admin only"""
+    try:
+        return jsonify({
+            'activity': activity_store.metrics(),
+            'enrollments': enrollments_store.metrics(),
+            'quiz_attempts': quiz_attempts_store.metrics(),
+            'notifications': notifications_store.metrics(),
+            'categories': categories_store.metrics(),
+            'catalog_cache': catalog_cache.stats(),
+            'fanout': fanout.stats(),
+            'local_catalog': get_local_catalog().stats(),
+            'activity_rollups': activity_rollups.stats(),
+            'activity_retention': activity_compactor.stats(),
+            'supabase_outbox': supabase_outbox.metrics()
+        }), 200
+    except Exception as e:
+        print(f"Error getting storage metrics: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/admin/activity/submissions', methods=['GET'])
 def get_all_submissions():
-    """Get all submission history across all users - Admin only"""
+    """
+    Most recent submissions across all users - Admin only
+    
+    Merged lazily from each user's newest-first submission list, so only the
+    requested page is materialized. Optional query parameters:
+        limit          page size (default SUBMISSIONS_PAGE_SIZE, up to SUBMISSIONS_PAGE_MAX)
+        cursor         next_cursor of the previous page
+        before         ISO timestamp: only submissions strictly older
+        type           submission type (e.g. quiz)
+        simulation_id  only submissions for this simulation
+    """
     try:
-        all_submissions = []
-        
-        for user_id, activity in user_activity_data.items():
-            user_submissions = activity.get('submissions', [])
-            for submission in user_submissions:
-                all_submissions.append({
-                    **submission,
-                    'user_id': user_id,
-                    'user_email': activity.get('user_email'),
-                    'user_name': activity.get('user_name')
-                })
-        
-        # Sort by timestamp (most recent first)
-        all_submissions.sort(key=lambda x: x.get('timestamp') or '', reverse=True)
+        try:
+            limit = min(max(int(request.args.get('limit', SUBMISSIONS_PAGE_SIZE)), 1), SUBMISSIONS_PAGE_MAX)
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        submissions, next_cursor = activity_summaries.recent_submissions(
+            limit=limit,
+            cursor=request.args.get('cursor') or request.args.get('before'),
+            submission_type=request.args.get('type'),
+            simulation_id=request.args.get('simulation_id')
+        )
         
         return jsonify({
-            'submissions': all_submissions[:200],  # Last 200 submissions
-            'total': len(all_submissions)
+            'submissions': submissions,
+            'total': activity_summaries.total_submissions(),
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -1508,39 +1601,78 @@ def get_all_submissions():
         return jsonify({'error': str(e)}), 500
 
 
-# ==================== NOTIFICATIONS API ====================
+def parse_range_bound(value):
+    """Aware UTC datetime from an ISO date or timestamp query parameter (naive = UTC)"""
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
 
-# Notifications JSON file path
-NOTIFICATIONS_FILE = Path(__file__).parent / 'notifications.json'
 
-def load_notifications():
-    """Load notifications from JSON file"""
-    if NOTIFICATIONS_FILE.exists():
+@app.route('/admin/analytics/timeseries', methods=['GET'])
+def get_activity_timeseries():
+    """
+    Platform activity over time from the hourly/daily rollups - Admin only
+    
+    Query parameters:
+        granularity   day (default) or hour
+        start, end    ISO dates or timestamps, UTC (default: the last
+                      ANALYTICS_DEFAULT_DAYS days / ANALYTICS_DEFAULT_HOURS hours)
+    
+    Per bucket: active_users, sessions_started, sessions_ended, session_seconds,
+    active_seconds, avg_session_seconds, page_views and events; plus totals
+    (with unique_users over the whole range) and the peak bucket.
+    """
+    try:
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return jsonify({'error': f"granularity must be one of: {', '.join(GRANULARITIES)}"}), 400
+        
+        try:
+            end = parse_range_bound(request.args['end']) if request.args.get('end') else datetime.now(timezone.utc)
+            if request.args.get('start'):
+                start = parse_range_bound(request.args['start'])
+            elif granularity == 'day':
+                start = end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+            else:
+                start = end - timedelta(hours=ANALYTICS_DEFAULT_HOURS - 1)
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO dates or timestamps'}), 400
+        
+        if start > end:
+            return jsonify({'error': 'start must not be after end'}), 400
+        bucket_seconds = 86400 if granularity == 'day' else 3600
+        if (end - start).total_seconds() / bucket_seconds >= ANALYTICS_MAX_BUCKETS:
+            return jsonify({'error': f'At most {ANALYTICS_MAX_BUCKETS} buckets per request'}), 400
+        
+        # Include this process's events not merged into the store yet
         try:
-            with open(NOTIFICATIONS_FILE, 'r') as f:
-                return json.load(f)
+            activity_rollups.flush()
         except Exception as e:
-            print(f"Error loading notifications: {e}")
-            return {}
-    return {}
-
-def save_notifications(notifications):
-    """Save notifications to JSON file"""
-    try:
-        with open(NOTIFICATIONS_FILE, 'w') as f:
-            json.dump(notifications, f, indent=2)
-        return True
+            print(f"Error flushing activity rollups: {e}")
+        
+        return jsonify({
+            'granularity': granularity,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            **activity_rollups.series(granularity, start, end)
+        }), 200
+        
     except Exception as e:
-        print(f"Error saving notifications: {e}")
-        return False
+        print(f"Error getting activity timeseries: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# ==================== NOTIFICATIONS API ====================
+
+# Notifications JSON file path (JSON journal or SQLite, see storage.py)
+NOTIFICATIONS_FILE = Path(__file__).parent / 'notifications.json'
+notifications_store = open_store('notifications', NOTIFICATIONS_FILE, default=dict)
+
+# Keep only the last NOTIFICATIONS_PER_USER notifications per user
+NOTIFICATIONS_PER_USER = 100
+notification_repo = NotificationRepository(notifications_store, limit=NOTIFICATIONS_PER_USER)
 
 def create_notification(user_id, notification_type, title, message, metadata=None):
     """Create a new notification for a user"""
-    notifications = load_notifications()
-    
-    if user_id not in notifications:
-        notifications[user_id] = []
-    
     notification = {
         'id': str(uuid.uuid4()),
         'type': notification_type,  # 'enrollment', 'task_completion', 'quiz_result', 'badge', 'announcement', etc.
@@ -1551,13 +1683,11 @@ def create_notification(user_id, notification_type, title, message, metadata=Non
         'created_at': datetime.now().isoformat()
     }
     
-    # Add to beginning of list (newest first)
-    notifications[user_id].insert(0, notification)
-    
-    # Keep only last 100 notifications per user
-    notifications[user_id] = notifications[user_id][:100]
-    
-    save_notifications(notifications)
+    # Newest first; the oldest is evicted past NOTIFICATIONS_PER_USER
+    try:
+        notification_repo.add(user_id, notification)
+    except Exception as e:
+        print(f"Error saving notifications: {e}")
     return notification
 
 
@@ -1565,15 +1695,11 @@ def create_notification(user_id, notification_type, title, message, metadata=Non
 def get_notifications(user_id):
     """Get all notifications for a user"""
     try:
-        notifications = load_notifications()
-        user_notifications = notifications.get(user_id, [])
-        
-        # Calculate unread count
-        unread_count = sum(1 for n in user_notifications if not n.get('read', False))
+        user_notifications = notification_repo.list(user_id)
         
         return jsonify({
             'notifications': user_notifications,
-            'unread_count': unread_count,
+            'unread_count': notification_repo.unread_count(user_id),
             'total': len(user_notifications)
         }), 200
         
@@ -1590,15 +1716,7 @@ def mark_notifications_read(user_id):
         notification_ids = data.get('notification_ids', [])
         mark_all = data.get('mark_all', False)
         
-        notifications = load_notifications()
-        user_notifications = notifications.get(user_id, [])
-        
-        for notification in user_notifications:
-            if mark_all or notification.get('id') in notification_ids:
-                notification['read'] = True
-        
-        notifications[user_id] = user_notifications
-        save_notifications(notifications)
+        notification_repo.mark_read(user_id, notification_ids, mark_all=mark_all)
         
         return jsonify({'status': 'success', 'message': 'Notifications marked as read'}), 200
         
@@ -1611,9 +1729,7 @@ def mark_notifications_read(user_id):
 def clear_notifications(user_id):
     """Clear all notifications for a user"""
     try:
-        notifications = load_notifications()
-        notifications[user_id] = []
-        save_notifications(notifications)
+        notification_repo.clear(user_id)
         
         return jsonify({'status': 'success', 'message': 'All notifications cleared'}), 200
         
@@ -1626,11 +1742,7 @@ def clear_notifications(user_id):
 def delete_notification(user_id, notification_id):
     """Delete a specific notification"""
     try:
-        notifications = load_notifications()
-        user_notifications = notifications.get(user_id, [])
-        
-        notifications[user_id] = [n for n in user_notifications if n.get('id') != notification_id]
-        save_notifications(notifications)
+        notification_repo.delete(user_id, notification_id)
         
         return jsonify({'status': 'success', 'message': 'Notification deleted'}), 200
         
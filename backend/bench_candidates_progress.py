@@ -0,0 +1,123 @@
+"""
+Benchmark: per-candidate user_task_progress queries (N+1) vs. chunked in_() queries
+
+Uses an in-memory fake Supabase client that sleeps for a fixed latency on
+every execute(), so the numbers reflect round-trips rather than the network.
+
+Run from the backend directory:
+    python bench_candidates_progress.py [num_candidates] [latency_ms]
+"""
+
+import sys
+import time
+
+from supabase_batch import fetch_in, group_by
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+        self.offset = 0
+        self.limit = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.rows = [r for r in self.rows if str(r.get(column)) == str(value)]
+        return self
+
+    def in_(self, column, values):
+        wanted = set(values)
+        self.rows = [r for r in self.rows if r.get(column) in wanted]
+        return self
+
+    def order(self, column):
+        self.rows = sorted(self.rows, key=lambda r: r.get(column))
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit = start, end - start + 1
+        return self
+
+    def execute(self):
+        self.client.round_trips += 1
+        time.sleep(self.client.latency)
+        end = None if self.limit is None else self.offset + self.limit
+        return FakeResponse(self.rows[self.offset:end])
+
+
+class FakeSupabase:
+    """Just enough of the supabase-py query builder for user_task_progress reads"""
+
+    def __init__(self, tables, latency):
+        self.tables = tables
+        self.latency = latency
+        self.round_trips = 0
+
+    def table(self, name):
+        return FakeQuery(self, self.tables.get(name, []))
+
+
+def build_progress(num_candidates, simulation_id, tasks_per_user=5):
+    user_ids = [f'user-{i}' for i in range(num_candidates)]
+    rows = [
+        {'user_id': user_id, 'simulation_id': simulation_id, 'task_id': t,
+         'status': 'completed' if (i + t) % 3 else 'in_progress'}
+        for i, user_id in enumerate(user_ids)
+        # every tenth candidate has no Supabase rows and falls back to local JSON
+        if i % 10
+        for t in range(tasks_per_user)
+    ]
+    return user_ids, rows
+
+
+def per_candidate(client, user_ids, simulation_id):
+    completed = {}
+    for user_id in user_ids:
+        response = client.table('user_task_progress').select(
+            'task_id, status'
+        ).eq('user_id', user_id).eq('simulation_id', simulation_id).execute()
+        if response.data:
+            completed[user_id] = len([r for r in response.data if r.get('status') == 'completed'])
+    return completed
+
+
+def batched(client, user_ids, simulation_id):
+    rows, _ = fetch_in(
+        client, 'user_task_progress', 'user_id, task_id, status', 'user_id', user_ids,
+        filters={'simulation_id': simulation_id}
+    )
+    return {
+        user_id: len({r.get('task_id') for r in user_rows if r.get('status') == 'completed'})
+        for user_id, user_rows in group_by(rows, 'user_id').items()
+    }
+
+
+def main(num_candidates=2000, latency_ms=2.0):
+    simulation_id = '42'
+    user_ids, rows = build_progress(num_candidates, simulation_id)
+    print(f"{num_candidates} candidates, {len(rows)} progress rows, {latency_ms} ms per round-trip\n")
+
+    results = {}
+    for label, fn in (('per-candidate (N+1)', per_candidate), ('chunked in_()', batched)):
+        client = FakeSupabase({'user_task_progress': rows}, latency_ms / 1000)
+        start = time.perf_counter()
+        results[label] = fn(client, user_ids, simulation_id)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<22} {client.round_trips:>6} round-trips  {elapsed * 1000:>10.1f} ms")
+
+    assert results['per-candidate (N+1)'] == results['chunked in_()']
+    print("\nBoth strategies report identical completed-task counts.")
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    main(count, latency)
@@ -0,0 +1,70 @@
+"""
+Benchmark: indexed enrollment lookups vs. linear scans of course_enrollments
+
+Run from the backend directory:
+    python bench_enrollments.py [num_enrollments]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from storage import JournaledStore
+from enrollment_store import EnrollmentRepository
+
+
+def build_enrollments(count, num_internships=200):
+    return [
+        {
+            'user_id': f'user-{i}',
+            'internship_id': str(i % num_internships),
+            'enrolled_at': f'2026-01-01T00:00:{i % 60:02d}',
+            'tasks': [{'task_id': f't{n}', 'completed': False} for n in range(4)]
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6  # microseconds per call
+
+
+def main(count=100_000, repeat=200):
+    enrollments = build_enrollments(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JournaledStore(Path(tmp) / 'enrollments.json', default=list)
+        try:
+            store.data.extend(enrollments)
+            repo = EnrollmentRepository(store)
+
+            user_id, internship_id = f'user-{count - 1}', str((count - 1) % 200)
+
+            cases = [
+                ('enrollment-status',
+                 lambda: any(e['user_id'] == user_id and e['internship_id'] == internship_id for e in enrollments),
+                 lambda: repo.is_enrolled(user_id, internship_id)),
+                ('candidates filter',
+                 lambda: [e for e in enrollments if e['internship_id'] == internship_id],
+                 lambda: repo.for_internship(internship_id)),
+                ('user enrollments',
+                 lambda: [e for e in enrollments if e['user_id'] == user_id],
+                 lambda: repo.for_user(user_id)),
+            ]
+
+            print(f"{count:,} enrollments, {repeat} iterations per case")
+            print(f"{'lookup':<20}{'scan (us)':>14}{'indexed (us)':>16}{'speedup':>10}")
+            for name, scan, indexed in cases:
+                scan_us = timed(scan, max(1, repeat // 20))
+                index_us = timed(indexed, repeat)
+                print(f"{name:<20}{scan_us:>14.1f}{index_us:>16.2f}{scan_us / index_us:>9.0f}x")
+        finally:
+            # Close before the directory is removed (otherwise the exit hook fails to flush it)
+            store.close()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,156 @@
+"""
+Local Catalog Repository
+
+Indexed view of the local simulations and tasks stores, the fallback the
+internship routes use while Supabase is unavailable:
+
+    simulations by id           -> get_simulation
+    tasks by simulation id      -> tasks_for (kept sorted by sequence)
+
+Ids come from a persistent allocator instead of ``len(store) + 1``. The
+high-water mark per kind lives in its own small store and is advanced under
+that store's cross-process lock, so ids are never reused, even after
+deletions or when several worker processes write at once.
+
+The stores already load lazily, write atomically and catch up with other
+processes in ``sync()``. ``refresh()`` syncs them and rebuilds the indexes
+only when something changed.
+"""
+
+import threading
+from collections import defaultdict
+
+
+class LocalCatalog:
+    """Indexed simulations/tasks fallback with a monotonic id allocator"""
+
+    def __init__(self, simulations_store, tasks_store, ids_store):
+        self.simulations_store = simulations_store
+        self.tasks_store = tasks_store
+        self.ids_store = ids_store
+        self._lock = threading.RLock()
+        self._simulations_by_id = {}
+        self._tasks_by_simulation = defaultdict(list)
+        self._seen = None
+        self._stale = False
+        self._change_listeners = []
+        self._stats = {'rebuilds': 0}
+        simulations_store.on_change(self._mark_stale)
+        tasks_store.on_change(self._mark_stale)
+        self.rebuild()
+
+    # ----- indexing -----
+
+    def _mark_stale(self, key):
+        self._stale = True
+
+    def _state(self):
+        return (self.simulations_store.generation, len(self.simulations_store.data),
+                self.tasks_store.generation, len(self.tasks_store.data))
+
+    def _index_simulation(self, simulation):
+        self._simulations_by_id[str(simulation.get('id'))] = simulation
+
+    def _index_task(self, task):
+        tasks = self._tasks_by_simulation[str(task.get('simulation_id'))]
+        tasks.append(task)
+        if len(tasks) > 1 and tasks[-2].get('sequence', 0) > task.get('sequence', 0):
+            tasks.sort(key=lambda t: t.get('sequence', 0))
+
+    def rebuild(self):
+        """Recompute the indexes from both stores"""
+        with self._lock:
+            self._simulations_by_id.clear()
+            self._tasks_by_simulation.clear()
+            for simulation in self.simulations_store.data:
+                self._index_simulation(simulation)
+            for task in self.tasks_store.data:
+                self._index_task(task)
+            self._seen = self._state()
+            self._stale = False
+            self._stats['rebuilds'] += 1
+        self._changed()
+
+    def refresh(self):
+        """Pick up changes other processes made to the stores; cheap when nothing changed"""
+        self.simulations_store.sync()
+        self.tasks_store.sync()
+        if self._stale or self._seen != self._state():
+            self.rebuild()
+
+    def on_change(self, listener):
+        """Call listener() whenever the catalog contents change"""
+        self._change_listeners.append(listener)
+
+    def _changed(self):
+        for listener in self._change_listeners:
+            listener()
+
+    # ----- lookups -----
+
+    def simulations(self):
+        """Snapshot of all local simulations in insertion order"""
+        return list(self.simulations_store.data)
+
+    def get_simulation(self, simulation_id):
+        return self._simulations_by_id.get(str(simulation_id))
+
+    def tasks_for(self, simulation_id):
+        """Snapshot of a simulation's tasks ordered by sequence"""
+        return list(self._tasks_by_simulation.get(str(simulation_id), []))
+
+    # ----- writes -----
+
+    def _max_id(self, store):
+        return max((row.get('id') for row in store.data if isinstance(row.get('id'), int)), default=0)
+
+    def allocate_ids(self, kind, count=1):
+        """Reserve ``count`` new ids for ``kind`` ('simulations' or 'tasks')"""
+        store = self.simulations_store if kind == 'simulations' else self.tasks_store
+        with self.ids_store.exclusive():
+            last = self.ids_store.data.get(kind)
+            if last is None:
+                # First allocation: start above the ids already in the data
+                last = self._max_id(store)
+            self.ids_store.set(kind, last + count)
+        return list(range(last + 1, last + count + 1))
+
+    def add_simulations(self, simulations):
+        """Assign ids to and persist new simulations"""
+        return self._add('simulations', self.simulations_store, simulations, self._index_simulation)
+
+    def add_tasks(self, tasks):
+        """Assign ids to and persist new tasks"""
+        return self._add('tasks', self.tasks_store, tasks, self._index_task)
+
+    def _add(self, kind, store, rows, index):
+        if not rows:
+            return rows
+        with self._lock:
+            for row, row_id in zip(rows, self.allocate_ids(kind, len(rows))):
+                row['id'] = row_id
+            with store.exclusive():
+                for row in rows:
+                    store.append(row)
+            # The appends may have pulled in other processes' rows first
+            if self._stale or self._seen[0::2] != self._state()[0::2]:
+                self.rebuild()
+                return rows
+            for row in rows:
+                index(row)
+            self._seen = self._state()
+        self._changed()
+        return rows
+
+    def close(self):
+        """Flush and close the underlying stores"""
+        for store in (self.simulations_store, self.tasks_store, self.ids_store):
+            store.close()
+
+    def stats(self):
+        return {
+            'simulations': len(self._simulations_by_id),
+            'tasks': len(self.tasks_store.data),
+            'last_ids': dict(self.ids_store.data),
+            **self._stats,
+        }
@@ -0,0 +1,186 @@
+"""
+Circuit Breaker for Supabase
+
+When Supabase is down or timing out, every request used to wait for its own
+client timeout before falling back to the local stores. The breaker wraps
+the Supabase clients so that after ``failure_threshold`` consecutive
+failures it *opens*: queries fail immediately with ``CircuitOpenError`` and
+the callers' existing ``except Exception`` fallbacks run at once.
+
+States:
+    closed     queries pass through; consecutive failures are counted
+    open       queries are rejected until ``reset_timeout`` seconds have passed
+    half_open  up to ``half_open_max_calls`` probe queries are let through;
+               a success closes the circuit, a failure re-opens it
+
+Only transport failures (connection errors, timeouts) count. An error
+answer from PostgREST (bad filter, RLS violation) shows the service is up.
+
+Usage:
+    breaker = CircuitBreaker('supabase')
+    supabase = GuardedClient(create_client(url, key), breaker)
+    supabase.table('simulations').select('*').execute()   # guarded
+"""
+
+import logging
+import threading
+import time
+
+try:
+    from postgrest.exceptions import APIError
+except ImportError:  # supabase not installed
+    APIError = ()
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Supabase while the circuit is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker shared by every guarded client"""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probes = 0
+        self._stats = {'calls': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+        self._last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def _open(self):
+        if self._state != OPEN:
+            self._stats['opened'] += 1
+            logger.warning(f"Circuit {self.name} opened after {self._failures} consecutive failures")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+
+    def allow(self):
+        """Reserve a call; False means short-circuit to the fallback"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self, error):
+        with self._lock:
+            self._failures += 1
+            self._stats['failures'] += 1
+            self._last_error = f"{type(error).__name__}: {error}"
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        with self._lock:
+            self._stats['calls'] += 1
+        try:
+            result = fn(*args, **kwargs)
+        except APIError:
+            # The service answered - the request itself was rejected
+            self.record_success()
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        """State and counters for /health"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == OPEN:
+                retry_in = round(max(self.reset_timeout - (time.monotonic() - self._opened_at), 0), 1)
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout_seconds': self.reset_timeout,
+                'retry_in_seconds': retry_in,
+                'last_error': self._last_error,
+                **self._stats,
+            }
+
+
+class _GuardedQuery:
+    """Proxies a postgrest query builder; execute() goes through the breaker"""
+
+    def __init__(self, query, breaker):
+        self._query = query
+        self._breaker = breaker
+
+    def execute(self):
+        return self._breaker.call(self._query.execute)
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return _GuardedQuery(result, self._breaker) if hasattr(result, 'execute') else result
+        return chained
+
+
+class GuardedClient:
+    """Supabase client whose table()/rpc() queries are guarded by a CircuitBreaker"""
+
+    def __init__(self, client, breaker):
+        self._client = client
+        self.breaker = breaker
+
+    def table(self, name):
+        return _GuardedQuery(self._client.table(name), self.breaker)
+
+    def rpc(self, fn, params=None):
+        return _GuardedQuery(self._client.rpc(fn, params or {}), self.breaker)
+
+    @property
+    def unguarded(self):
+        """The wrapped client, for checks that must reach Supabase even while the circuit is open"""
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def __bool__(self):
+        return True
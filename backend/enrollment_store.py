@@ -0,0 +1,130 @@
+"""
+Enrollment Repository
+
+Wraps the local enrollments store with secondary hash indexes so the hot
+enrollment routes stop scanning every enrollment on each request:
+
+    by (user_id, internship_id)  -> enrollment-status, enroll dedupe, task updates
+    by internship_id             -> candidates list
+    by user_id                   -> admin profile views
+
+Indexes hold list positions. Enrollments are never removed, so positions stay
+valid; ``rebuild()`` recomputes everything if the underlying list is replaced.
+
+The repository is the single cached view of enrollments: in-process writes
+keep the indexes current, and ``refresh()`` pulls enrollments written by other
+worker processes, indexing only the new tail unless the store was reloaded
+wholesale.
+"""
+
+import threading
+from collections import defaultdict
+
+
+class EnrollmentRepository:
+    """Indexed access to the enrollments stored in a list-backed local store"""
+
+    def __init__(self, store):
+        self.store = store
+        self.enrollments = store.data
+        self._lock = threading.RLock()
+        self._by_pair = defaultdict(list)
+        self._by_internship = defaultdict(list)
+        self._by_user = defaultdict(list)
+        self._generation = None
+        self._indexed_count = 0
+        self.rebuild()
+
+    # ----- indexing -----
+
+    @staticmethod
+    def _pair(user_id, internship_id):
+        return (user_id, str(internship_id))
+
+    def _index(self, position, enrollment):
+        user_id = enrollment.get('user_id')
+        internship_id = str(enrollment.get('internship_id'))
+        self._by_pair[(user_id, internship_id)].append(position)
+        self._by_internship[internship_id].append(position)
+        self._by_user[user_id].append(position)
+
+    def rebuild(self):
+        """Recompute all indexes from the enrollments list"""
+        with self._lock:
+            self._by_pair.clear()
+            self._by_internship.clear()
+            self._by_user.clear()
+            for position, enrollment in enumerate(self.enrollments):
+                self._index(position, enrollment)
+            self._indexed_count = len(self.enrollments)
+            self._generation = self.store.generation
+
+    def _index_tail(self):
+        """Index enrollments appended to the list since the last call"""
+        for position in range(self._indexed_count, len(self.enrollments)):
+            self._index(position, self.enrollments[position])
+        self._indexed_count = len(self.enrollments)
+
+    def _catch_up_indexes(self):
+        if self._generation != self.store.generation:
+            self.rebuild()
+        else:
+            self._index_tail()
+
+    def refresh(self):
+        """Pick up enrollments written by other processes; cheap when nothing changed"""
+        self.store.sync()
+        with self._lock:
+            self._catch_up_indexes()
+
+    # ----- lookups -----
+
+    def _resolve(self, positions):
+        return [self.enrollments[p] for p in positions]
+
+    def get(self, user_id, internship_id):
+        """Return the enrollment of user_id in internship_id, or None"""
+        positions = self._by_pair.get(self._pair(user_id, internship_id))
+        return self.enrollments[positions[0]] if positions else None
+
+    def is_enrolled(self, user_id, internship_id):
+        return self._pair(user_id, internship_id) in self._by_pair
+
+    def for_internship(self, internship_id):
+        """All enrollments in an internship, in enrollment order"""
+        return self._resolve(self._by_internship.get(str(internship_id), []))
+
+    def for_user(self, user_id):
+        """All enrollments of a user, in enrollment order"""
+        return self._resolve(self._by_user.get(user_id, []))
+
+    def __len__(self):
+        return len(self.enrollments)
+
+    # ----- writes -----
+
+    def add(self, enrollment):
+        """Append and persist a new enrollment, indexing it immediately"""
+        with self._lock:
+            position = self.store.append(enrollment)
+            # The append may have pulled in other processes' enrollments first
+            self._catch_up_indexes()
+            return position
+
+    def complete_task(self, user_id, internship_id, task_id):
+        """Mark task_id completed in the user's enrollment(s); returns True if any task matched"""
+        with self._lock, self.store.exclusive():
+            # Work on the records as other processes left them, not on our possibly stale copies
+            self._catch_up_indexes()
+            updated = False
+            for position in self._by_pair.get(self._pair(user_id, internship_id), []):
+                enrollment = self.enrollments[position]
+                touched = False
+                for task in enrollment.get('tasks', []):
+                    if task['task_id'] == task_id:
+                        task['completed'] = True
+                        touched = True
+                if touched:
+                    self.store.set(position, enrollment)
+                    updated = True
+            return updated
@@ -0,0 +1,132 @@
+"""
+Parallel Fan-Out
+
+Runs independent calls (typically Supabase queries) of one request
+concurrently on a shared thread pool, so the request waits roughly for the
+slowest call instead of the sum of all of them:
+
+    results = fan_out({
+        'tasks': lambda: fetch_simulation_tasks(supabase, simulation_id),
+        'progress': lambda: fetch_in(supabase, 'user_task_progress', ...),
+    })
+    if results['tasks'].ok:
+        tasks = results['tasks'].value
+
+Each call's outcome is reported separately, so one failure leaves the others
+usable and callers keep their per-query fallbacks. Calls share the request's
+deadline (REQUEST_DEADLINE seconds after the request started). A call still
+running at the deadline is reported as FanOutTimeout. Its thread cannot be
+interrupted and finishes in the background.
+
+Calls run in a copy of the caller's context, so ``current_app`` and ``g``
+work inside them. They must not call ``fan_out`` themselves: a worker
+waiting for the pool it runs on can starve it.
+"""
+
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', '16'))
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', '10'))
+
+
+class FanOutTimeout(TimeoutError):
+    """The call did not finish before the request deadline"""
+
+
+class Outcome(namedtuple('Outcome', 'value error elapsed_ms')):
+    """Result of one fanned-out call: value, or the exception it raised"""
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_stats = {'fan_outs': 0, 'calls': 0, 'errors': 0, 'timeouts': 0}
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='fanout')
+        return _pool
+
+
+def start_request_deadline(seconds=REQUEST_DEADLINE):
+    """Start the current request's deadline clock (call from a before_request hook)"""
+    g.request_deadline = time.monotonic() + seconds
+
+
+def request_deadline():
+    """Monotonic time by which the current request's fanned-out calls must finish"""
+    if has_request_context() and 'request_deadline' in g:
+        return g.request_deadline
+    return time.monotonic() + REQUEST_DEADLINE
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    try:
+        return Outcome(fn(), None, (time.perf_counter() - started) * 1000)
+    except Exception as e:
+        return Outcome(None, e, (time.perf_counter() - started) * 1000)
+
+
+def fan_out(calls, deadline=None):
+    """
+    Run ``calls`` ({name: zero-argument callable}) concurrently and return
+    {name: Outcome}. Waits until every call finished or ``deadline``
+    (monotonic seconds; default: the request deadline, ``float('inf')``
+    to wait for all) passed.
+    """
+    if not calls:
+        return {}
+    deadline = request_deadline() if deadline is None else deadline
+    if len(calls) == 1:
+        # Nothing to overlap: run inline (the deadline cannot interrupt it either way)
+        [(name, fn)] = calls.items()
+        outcomes = {name: _timed(fn)}
+    else:
+        pool = _executor()
+        futures = {
+            name: pool.submit(contextvars.copy_context().run, _timed, fn)
+            for name, fn in calls.items()
+        }
+        timeout = None if math.isinf(deadline) else max(deadline - time.monotonic(), 0)
+        wait(futures.values(), timeout=timeout)
+        outcomes = {}
+        for name, future in futures.items():
+            if future.done():
+                outcomes[name] = future.result()
+            else:
+                future.cancel()
+                outcomes[name] = Outcome(None, FanOutTimeout(f'{name} missed the request deadline'), None)
+
+    with _pool_lock:
+        _stats['fan_outs'] += 1
+        _stats['calls'] += len(calls)
+        for name, outcome in outcomes.items():
+            if isinstance(outcome.error, FanOutTimeout):
+                _stats['timeouts'] += 1
+                logger.warning(f"Fan-out call {name} timed out")
+            elif outcome.error is not None:
+                _stats['errors'] += 1
+    return outcomes
+
+
+def stats():
+    with _pool_lock:
+        return {'workers': FANOUT_WORKERS, 'request_deadline_seconds': REQUEST_DEADLINE, **_stats}
@@ -0,0 +1,109 @@
+"""
+Background Health Probe
+
+Uptime monitors and load balancers hit /health every few seconds. Instead of
+a database round-trip per hit, a background thread runs the check every
+``interval`` seconds and /health answers from the last result. A synchronous
+check is still available (``probe_now()``, used by ``/health?deep=1``).
+
+Latencies of the last ``window`` probes are kept for p50/p90/p99 reporting.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class HealthProbe:
+    """Runs ``check()`` periodically and caches whether it succeeded and how long it took"""
+
+    def __init__(self, name, check, interval=15.0, window=100):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._ok = None
+        self._error = None
+        self._checked_at = None
+        self._checked_monotonic = None
+        self._stats = {'probes': 0, 'failures': 0}
+        self._thread = None
+
+    def start(self):
+        """Start the background thread (first probe runs immediately)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f'health-probe-{self.name}', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.probe_now()
+            time.sleep(self.interval)
+
+    def probe_now(self):
+        """Run the check synchronously, record the result and return True if it passed"""
+        started = time.monotonic()
+        try:
+            self.check()
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {e}"
+            logger.warning(f"{self.name} health probe failed: {error}")
+        elapsed_ms = (time.monotonic() - started) * 1000
+
+        with self._lock:
+            self._ok = ok
+            self._error = error
+            self._checked_at = datetime.now(timezone.utc).isoformat()
+            self._checked_monotonic = time.monotonic()
+            self._latencies.append(elapsed_ms)
+            self._stats['probes'] += 1
+            if not ok:
+                self._stats['failures'] += 1
+        return ok
+
+    @property
+    def ok(self):
+        return bool(self._ok)
+
+    def snapshot(self):
+        """Last result, its age, and latency percentiles over the recent probes"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            age = None if self._checked_monotonic is None else time.monotonic() - self._checked_monotonic
+            return {
+                'ok': self._ok,
+                'error': self._error,
+                'checked_at': self._checked_at,
+                'age_seconds': None if age is None else round(age, 3),
+                # No result for three intervals means the probe thread is stuck (e.g. a hung request)
+                'stale': age is None or age > 3 * self.interval,
+                'interval_seconds': self.interval,
+                'latency_ms': {
+                    'last': round(self._latencies[-1], 2) if self._latencies else None,
+                    'p50': _round(percentile(latencies, 50)),
+                    'p90': _round(percentile(latencies, 90)),
+                    'p99': _round(percentile(latencies, 99)),
+                    'samples': len(latencies),
+                },
+                **self._stats,
+            }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
@@ -17,16 +17,236 @@ Date: December 26, 2025
 
 from flask import Blueprint, request, jsonify, current_app
 from sanitizer import HtmlSanitizer
+from internship_validation import InternshipValidationError, prepare_internship, prepare_internship_result
+from storage import open_store
+from catalog_store import LocalCatalog
+from fanout import fan_out
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import hashlib
 import logging
+import os
+import threading
+import time
 import json as json_module
 from pathlib import Path
 
+try:
+    from postgrest.exceptions import APIError
+except ImportError:  # supabase not installed
+    APIError = ()
+
 # Create blueprint for internship endpoints
 internship_bp = Blueprint('internships', __name__, url_prefix='/admin/internships')
 
 # Logger
 logger = logging.getLogger(__name__)
 
+# Directory of the local fallback stores used when Supabase is unavailable (JSON
+# journal or SQLite, see storage.py); defaults to this module's directory
+CATALOG_DATA_DIR = Path(os.getenv('CATALOG_DATA_DIR') or Path(__file__).resolve().parent)
+
+_local_catalog = None
+_local_catalog_lock = threading.Lock()
+
+# Seconds a cached Supabase catalog read stays fresh. Writes through this blueprint
+# invalidate immediately; the TTL bounds staleness for changes made elsewhere
+# (other worker processes, the Supabase dashboard).
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', '60'))
+
+
+class CatalogCache:
+    """
+    Read-through TTL cache for Supabase catalog reads (simulations, tasks).
+
+    ``get_or_load(key, loader)`` returns the cached value while it is fresh,
+    otherwise calls ``loader()`` once (concurrent callers for the same key
+    wait for that load) and caches the result unless it is None. Loader
+    exceptions propagate and nothing is cached.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loading = {}
+        self._rendered = {}
+        self._stats = {}
+
+    def _count(self, key, outcome):
+        stats = self._stats.setdefault(key, {'hits': 0, 'misses': 0, 'loads': 0, 'invalidations': 0})
+        stats[outcome] += 1
+
+    def get_or_load(self, key, loader):
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[0] > time.monotonic():
+                    self._count(key, 'hits')
+                    return entry[1]
+                pending = self._loading.get(key)
+                if pending is None:
+                    self._count(key, 'misses')
+                    pending = self._loading[key] = threading.Event()
+                    break
+            pending.wait()
+
+        try:
+            value = loader()
+            with self._lock:
+                self._count(key, 'loads')
+                if value is not None and self._loading.get(key) is pending:
+                    self._entries[key] = (time.monotonic() + self.ttl, value)
+            return value
+        finally:
+            with self._lock:
+                if self._loading.get(key) is pending:
+                    del self._loading[key]
+            pending.set()
+
+    def invalidate(self, *keys):
+        """Drop the given keys (all keys if none are given)"""
+        with self._lock:
+            for key in keys or list(self._entries):
+                self._entries.pop(key, None)
+                self._rendered.pop(key, None)
+                # A load already in flight may have read the old data - don't let it be cached
+                self._loading.pop(key, None)
+                self._count(key, 'invalidations')
+
+    def invalidate_prefix(self, prefix):
+        """Drop every key starting with prefix"""
+        with self._lock:
+            keys = [key for key in set(self._entries) | set(self._loading) if key.startswith(prefix)]
+        if keys:
+            self.invalidate(*keys)
+
+    def rendered(self, key, value, render):
+        """
+        ``render()`` memoized for as long as ``value`` is the object cached under
+        key, so repeat requests for an unchanged entry skip serialization.
+        """
+        with self._lock:
+            memo = self._rendered.get(key)
+            if memo and memo[0] is value:
+                return memo[1]
+        result = render()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] is value:
+                self._rendered[key] = (value, result)
+        return result
+
+    def stats(self):
+        """Per-key hit/miss counts and the age of each cached entry"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'ttl_seconds': self.ttl,
+                'keys': {
+                    key: {
+                        **counts,
+                        'cached': key in self._entries and self._entries[key][0] > now,
+                        'expires_in_seconds': round(max(self._entries[key][0] - now, 0), 3) if key in self._entries else None,
+                    }
+                    for key, counts in self._stats.items()
+                }
+            }
+
+
+catalog_cache = CatalogCache(CATALOG_CACHE_TTL)
+
+
+def init_local_catalog(data_dir=None):
+    """
+    Open the local simulations/tasks/catalog id stores under ``data_dir``
+    (default CATALOG_DATA_DIR) and serve the fallback routes from them.
+    Called on first use; tests call it with a temporary directory.
+    """
+    global _local_catalog
+    data_dir = Path(data_dir or CATALOG_DATA_DIR)
+    catalog = LocalCatalog(
+        open_store('simulations', data_dir / 'simulations.json', default=list),
+        open_store('tasks', data_dir / 'tasks.json', default=list),
+        open_store('catalog_ids', data_dir / 'catalog_ids.json', default=dict)
+    )
+    # Cached fallback responses ('local:' keys) are dropped whenever the local catalog changes
+    catalog.on_change(lambda: catalog_cache.invalidate_prefix('local:'))
+    previous, _local_catalog = _local_catalog, catalog
+    catalog_cache.invalidate_prefix('local:')
+    if previous is not None:
+        previous.close()
+    return catalog
+
+
+def get_local_catalog():
+    """The local fallback catalog, opened on first use"""
+    if _local_catalog is None:
+        with _local_catalog_lock:
+            if _local_catalog is None:
+                init_local_catalog()
+    return _local_catalog
+
+
+@internship_bp.before_request
+def refresh_local_catalog():
+    """Pick up simulations/tasks other worker processes saved locally"""
+    get_local_catalog().refresh()
+
+
+def fetch_simulations(supabase):
+    """All simulations from Supabase, served from the catalog cache; None if Supabase has none"""
+    def load():
+        response = supabase.table('simulations').select('*').execute()
+        return response.data or None
+    return catalog_cache.get_or_load('simulations', load)
+
+
+def fetch_simulation_tasks(supabase, simulation_id):
+    """A simulation's tasks from Supabase ordered by sequence, served from the catalog cache"""
+    def load():
+        response = supabase.table('tasks').select('*').eq('simulation_id', simulation_id).order('sequence').execute()
+        return response.data or None
+    return catalog_cache.get_or_load(f'tasks:{simulation_id}', load)
+
+
+# Browsers may reuse a catalog response only after revalidating it with If-None-Match
+CATALOG_CACHE_CONTROL = os.getenv('CATALOG_CACHE_CONTROL', 'private, no-cache')
+
+
+def render_json(payload):
+    """Serialize like jsonify and return (body, strong content-hash ETag)"""
+    body = (current_app.json.dumps(payload) + '\n').encode('utf-8')
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+def conditional_json(payload, cache_key=None, source=None):
+    """
+    JSON response with an ETag and Cache-Control; 304 Not Modified when the
+    request's If-None-Match already names this content. Pass the catalog
+    cache key and the cached ``source`` value to reuse its serialization.
+    """
+    if cache_key is not None:
+        body, etag = catalog_cache.rendered(cache_key, source, lambda: render_json(payload))
+    else:
+        body, etag = render_json(payload)
+
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, status=200, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CATALOG_CACHE_CONTROL
+    return response
+
+
+def invalidate_catalog(simulation_id=None):
+    """Forget cached catalog reads after a write to simulations (and one simulation's tasks)"""
+    keys = ['simulations']
+    if simulation_id is not None:
+        keys.append(f'tasks:{simulation_id}')
+    catalog_cache.invalidate(*keys)
+
 
 @internship_bp.route('', methods=['POST'])
 def create_internship():
@@ -80,54 +300,11 @@ def create_internship():
         
         data = request.json
         
-        # ===== VALIDATE REQUIRED FIELDS =====
-        required_fields = ['title', 'category', 'difficulty', 'duration', 'description', 'overview']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-        
-        # ===== PROCESS SIMULATION FIELDS =====
-        # HTML fields that need sanitization and validation
-        html_fields = {
-            'description': data.get('description', ''),
-            'overview': data.get('overview', ''),
-            'features': data.get('features', ''),
-            'skills': data.get('skills', ''),
-        }
-        
-        # Sanitize and validate each HTML field
-        simulation_data = {
-            'title': data.get('title', '').strip(),
-            'category': data.get('category', '').strip(),
-            'difficulty': data.get('difficulty', '').strip(),
-            'duration': data.get('duration', '').strip(),
-            'image': data.get('image', '').strip(),
-            'rating': None,  # Always null for new simulations
-            # Note: Don't send 'id' - let Supabase auto-generate it
-        }
-        
-        # Process each HTML field
-        for field_name, html_content in html_fields.items():
-            if not html_content:
-                return jsonify({'error': f'{field_name} is required'}), 400
-            
-            # Sanitize HTML
-            sanitized_html = HtmlSanitizer.sanitize(html_content)
-            if not sanitized_html.strip():
-                return jsonify({'error': f'{field_name} content is empty after sanitization'}), 400
-            
-            # Extract plain text for validation only
-            plain_text = HtmlSanitizer.extract_plain_text(sanitized_html)
-            
-            # Validate plain-text length (5-500 chars)
-            validation = HtmlSanitizer.validate_plain_text_length(sanitized_html, min_length=5, max_length=500)
-            if not validation['valid']:
-                return jsonify({
-                    'error': f'{field_name}: {validation["message"]} (Plain text has {validation["char_count"]} chars)'
-                }), 400
-            
-            # Store only HTML (Supabase table doesn't have _plain columns)
-            simulation_data[field_name] = sanitized_html
+        # ===== VALIDATE AND SANITIZE (simulation and tasks, before anything is written) =====
+        try:
+            simulation_data, tasks_data = prepare_internship(data)
+        except InternshipValidationError as e:
+            return jsonify({'error': str(e)}), 400
         
         logger.info(f"Creating simulation: {simulation_data['title']}")
         
@@ -139,6 +316,7 @@ def create_internship():
         
         logger.info(f"Attempting to insert simulation with columns: {list(simulation_data.keys())}")
         
+        simulation_saved_locally = False
         try:
             sim_response = supabase_admin.table('simulations').insert(simulation_data).execute()
             logger.info(f"✓ Successfully inserted simulation ID {sim_response.data[0]['id']}")
@@ -147,24 +325,11 @@ def create_internship():
             logger.warning(f"Error details: {supabase_error}")
             logger.info("Falling back to local JSON storage...")
             
-            # Fallback: Save to JSON file
-            simulations_file = Path('simulations.json')
-            
+            # Fallback: Save to the local simulations store
             try:
-                # Load existing simulations
-                if simulations_file.exists():
-                    with open(simulations_file, 'r', encoding='utf-8') as f:
-                        existing_sims = json_module.load(f)
-                else:
-                    existing_sims = []
-                
-                # Add new simulation with generated ID
-                simulation_data['id'] = len(existing_sims) + 1
-                existing_sims.append(simulation_data)
-                
-                # Save to file
-                with open(simulations_file, 'w', encoding='utf-8') as f:
-                    json_module.dump(existing_sims, f, indent=2)
+                # Add new simulation with a freshly allocated ID
+                get_local_catalog().add_simulations([simulation_data])
+                simulation_saved_locally = True
                 
                 logger.info(f"Saved simulation to JSON with ID: {simulation_data['id']}")
                 
@@ -184,124 +349,50 @@ def create_internship():
         
         simulation_id = sim_response.data[0]['id']
         logger.info(f"Simulation created with ID: {simulation_id}")
+        invalidate_catalog(simulation_id)
         
-        # ===== PROCESS TASKS (OPTIONAL) =====
-        tasks_data = []
-        tasks_input = data.get('tasks', [])
+        # ===== ATTACH TASKS (OPTIONAL) =====
+        for task_data in tasks_data:
+            task_data['simulation_id'] = simulation_id
         
-        if tasks_input and isinstance(tasks_input, list):
-            for idx, task in enumerate(tasks_input):
-                # Validate required task fields
-                task_required = ['title', 'full_title', 'duration', 'difficulty', 'description', 
-                                'what_youll_learn', 'what_youll_do']
-                for field in task_required:
-                    if not task.get(field):
-                        return jsonify({
-                            'error': f'Task {idx + 1}: Missing required field: {field}'
-                        }), 400
-                
-                task_data = {
-                    'simulation_id': simulation_id,
-                    'sequence': idx + 1,
-                    'title': f'Task {idx + 1}',
-                    'full_title': task.get('full_title', '').strip(),
-                    'duration': task.get('duration', '').strip(),
-                    'difficulty': task.get('difficulty', '').strip(),
-                    'material_url': task.get('material_url', '').strip(),
-                }
-                
-                # Process rich HTML fields in task
-                task_html_fields = {
-                    'description': task.get('description', ''),
-                    'what_youll_learn': task.get('what_youll_learn', ''),
-                    'what_youll_do': task.get('what_youll_do', ''),
-                }
-                
-                for field_name, html_content in task_html_fields.items():
-                    if not html_content:
-                        return jsonify({
-                            'error': f'Task {idx + 1}: {field_name} is required'
-                        }), 400
-                    
-                    # Sanitize
-                    sanitized_html = HtmlSanitizer.sanitize(html_content)
-                    if not sanitized_html.strip():
-                        return jsonify({
-                            'error': f'Task {idx + 1}: {field_name} content is empty after sanitization'
-                        }), 400
-                    
-                    # Extract plain text for validation only
-                    plain_text = HtmlSanitizer.extract_plain_text(sanitized_html)
-                    
-                    # Validate (5-500 chars)
-                    validation = HtmlSanitizer.validate_plain_text_length(sanitized_html, min_length=5, max_length=500)
-                    if not validation['valid']:
-                        return jsonify({
-                            'error': f'Task {idx + 1}, {field_name}: {validation["message"]}'
-                        }), 400
-                    
-                    # Store only HTML
-                    task_data[field_name] = sanitized_html
-                
-                # Process quiz data if present
-                quiz = task.get('quiz')
-                if quiz and isinstance(quiz, dict) and quiz.get('enabled'):
-                    task_data['quiz'] = json_module.dumps(quiz)
-                else:
-                    task_data['quiz'] = None
-                
-                tasks_data.append(task_data)
-            
-            # ===== INSERT TASKS INTO SUPABASE =====
-            if tasks_data:
-                supabase_admin = current_app.config.get('supabase_admin')
-                if not supabase_admin:
-                    supabase_admin = current_app.config.get('supabase')
-                
+        # ===== INSERT TASKS INTO SUPABASE =====
+        if tasks_data:
+            outbox = current_app.config.get('supabase_outbox')
+            if outbox is not None and not simulation_saved_locally:
+                # Acknowledge now; the outbox bulk-inserts the tasks in the background and retries until they land
+                for task in tasks_data:
+                    outbox.enqueue('tasks', task, key=f"task:{simulation_id}:{task['sequence']}")
+                logger.info(f"Queued {len(tasks_data)} tasks for simulation {simulation_id}")
+            else:
                 try:
                     tasks_response = supabase.table('tasks').insert(tasks_data).execute()
                 except Exception as supabase_error:
                     logger.warning(f"Supabase tasks insert failed: {str(supabase_error)}")
                     logger.info("Falling back to local JSON storage for tasks...")
-                    
-                    # Fallback: Save tasks to JSON file
-                    tasks_file = Path('tasks.json')
-                    
+                
+                    # Fallback: Save tasks to the local tasks store
                     try:
-                        # Load existing tasks
-                        if tasks_file.exists():
-                            with open(tasks_file, 'r', encoding='utf-8') as f:
-                                existing_tasks = json_module.load(f)
-                        else:
-                            existing_tasks = []
-                        
-                        # Add task IDs
-                        for task in tasks_data:
-                            task['id'] = len(existing_tasks) + 1
-                            existing_tasks.append(task)
-                        
-                        # Save to file
-                        with open(tasks_file, 'w', encoding='utf-8') as f:
-                            json_module.dump(existing_tasks, f, indent=2)
-                        
+                        get_local_catalog().add_tasks(tasks_data)
+                    
                         logger.info(f"Saved {len(tasks_data)} tasks to JSON")
-                        
+                    
                         # Create a mock response
                         class MockResponse:
                             def __init__(self, data):
                                 self.data = data
-                        
+                    
                         tasks_response = MockResponse(tasks_data)
                     except Exception as json_error:
                         logger.error(f"JSON tasks fallback failed: {str(json_error)}")
                         # Don't fail - we already created the simulation
                         tasks_response = MockResponse([])
-                        
+                    
+                invalidate_catalog(simulation_id)
                 if not tasks_response.data or len(tasks_response.data) == 0:
                     logger.warning("No tasks were created, but simulation was successful")
                 else:
                     logger.info(f"Created {len(tasks_data)} tasks for simulation {simulation_id}")
-        
+    
         return jsonify({
             'id': simulation_id,
             'message': 'Internship created successfully',
@@ -314,6 +405,228 @@ def create_internship():
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
+# Bulk import limits: items per request, validation workers, rows per Supabase insert
+BULK_IMPORT_MAX_ITEMS = int(os.getenv('BULK_IMPORT_MAX_ITEMS', '500'))
+BULK_IMPORT_WORKERS = int(os.getenv('BULK_IMPORT_WORKERS', '4'))
+BULK_INSERT_CHUNK_SIZE = int(os.getenv('BULK_INSERT_CHUNK_SIZE', '200'))
+
+NDJSON_MIMETYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines'}
+
+_validation_pool = None
+_validation_pool_lock = threading.Lock()
+
+
+def validation_pool():
+    """Shared worker pool that validates and sanitizes bulk-import items"""
+    global _validation_pool
+    with _validation_pool_lock:
+        if _validation_pool is None:
+            _validation_pool = ThreadPoolExecutor(max_workers=BULK_IMPORT_WORKERS, thread_name_prefix='internship-import')
+        return _validation_pool
+
+
+class BulkImportError(ValueError):
+    """The import request as a whole is unusable (bad body, too many items)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def iter_bulk_items():
+    """
+    Yield (item, parse_error) for the request body: a JSON array, an object
+    with a ``simulations`` array, or NDJSON (one simulation per line, read
+    from the stream as it arrives).
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        for line_number, line in enumerate(request.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json_module.loads(line), None
+            except ValueError as e:
+                yield None, f'Line {line_number}: invalid JSON ({e})'
+        return
+
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get('simulations')
+    if not isinstance(body, list):
+        raise BulkImportError('Expected a JSON array of simulations, {"simulations": [...]}, or NDJSON')
+    for item in body:
+        yield item, None
+
+
+def insert_chunk(client, table, chunk):
+    """
+    Insert one chunk of rows. Returns one (inserted_row, error, unavailable)
+    tuple per row. A chunk Supabase rejects is retried row by row so a bad
+    row only fails itself; a chunk that cannot reach Supabase marks its rows
+    ``unavailable`` so the caller can fall back.
+    """
+    try:
+        response = client.table(table).insert(chunk).execute()
+        inserted = response.data or []
+        if len(inserted) != len(chunk):
+            raise RuntimeError(f'{table} insert returned {len(inserted)} rows for {len(chunk)}')
+        return [(row, None, False) for row in inserted]
+    except APIError as e:
+        if len(chunk) == 1:
+            return [(None, str(e), False)]
+        return [result for row in chunk for result in insert_chunk(client, table, [row])]
+    except Exception as e:
+        logger.warning(f"Bulk insert of {len(chunk)} {table} rows failed: {e}")
+        return [(None, str(e), True) for _ in chunk]
+
+
+def bulk_insert(client, table, rows, chunk_size=BULK_INSERT_CHUNK_SIZE):
+    """insert_chunk() over all rows, with the chunks sent concurrently; results in row order"""
+    chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+    # No deadline: a timed-out insert may still land, and falling back would then duplicate it
+    outcomes = fan_out(
+        {index: partial(insert_chunk, client, table, chunk) for index, chunk in enumerate(chunks)},
+        deadline=float('inf')
+    )
+    results = []
+    for index, chunk in enumerate(chunks):
+        outcome = outcomes[index]
+        if outcome.ok:
+            results.extend(outcome.value)
+        else:
+            results.extend((None, str(outcome.error), True) for _ in chunk)
+    return results
+
+
+@internship_bp.route('/bulk', methods=['POST'])
+def bulk_import_internships():
+    """
+    Create many internship simulations (with their tasks) in one request.
+    
+    Request body: a JSON array of simulation objects in the POST
+    /admin/internships format, ``{"simulations": [...]}``, or NDJSON
+    (Content-Type: application/x-ndjson) with one simulation per line.
+    
+    Items are validated and sanitized in a worker pool, then all valid
+    simulations and all their tasks are written with chunked bulk inserts.
+    One item failing does not fail the others.
+    
+    Response (201 all created / 207 some created / 400 none created):
+    {
+        "created": 2, "invalid": 1, "failed": 0,
+        "results": [
+            {"index": 0, "status": "created", "id": 123, "title": "...", "task_count": 5,
+             "storage": "supabase", "tasks": "inserted"},
+            {"index": 1, "status": "invalid", "error": "Missing required field: overview"},
+            ...
+        ]
+    }
+    """
+    try:
+        supabase_admin = current_app.config.get('supabase_admin') or current_app.config.get('supabase')
+        if not supabase_admin:
+            logger.error("Supabase client not available")
+            return jsonify({'error': 'Database connection unavailable. Please check your internet connection.'}), 503
+        
+        # ===== VALIDATE AND SANITIZE IN THE WORKER POOL =====
+        # Items are submitted while the body is still being read
+        pool = validation_pool()
+        pending = []
+        try:
+            for item, parse_error in iter_bulk_items():
+                if len(pending) >= BULK_IMPORT_MAX_ITEMS:
+                    raise BulkImportError(f'Too many simulations: at most {BULK_IMPORT_MAX_ITEMS} per import', status=413)
+                pending.append(parse_error if parse_error else pool.submit(prepare_internship_result, item))
+        except BulkImportError as e:
+            for future in pending:
+                if not isinstance(future, str):
+                    future.cancel()
+            return jsonify({'error': str(e)}), e.status
+        
+        if not pending:
+            return jsonify({'error': 'No simulations to import'}), 400
+        
+        results = []
+        valid = []  # (result, simulation_row, task_rows)
+        for index, future in enumerate(pending):
+            if isinstance(future, str):
+                results.append({'index': index, 'status': 'invalid', 'error': future})
+                continue
+            simulation_data, tasks_data, error = future.result()
+            if error:
+                results.append({'index': index, 'status': 'invalid', 'error': error})
+                continue
+            result = {'index': index, 'status': 'created', 'title': simulation_data['title'], 'task_count': len(tasks_data)}
+            results.append(result)
+            valid.append((result, simulation_data, tasks_data))
+        
+        logger.info(f"Bulk import: {len(valid)} of {len(pending)} simulations passed validation")
+        
+        # ===== BULK INSERT SIMULATIONS =====
+        inserted = bulk_insert(supabase_admin, 'simulations', [simulation for _, simulation, _ in valid])
+        unavailable = []
+        supabase_tasks = []  # (result, task_rows) for simulations that reached Supabase
+        for (result, simulation_data, tasks_data), (row, error, is_unavailable) in zip(valid, inserted):
+            if row is not None:
+                result.update({'id': row['id'], 'storage': 'supabase'})
+                for task in tasks_data:
+                    task['simulation_id'] = row['id']
+                supabase_tasks.append((result, tasks_data))
+            elif is_unavailable:
+                unavailable.append((result, simulation_data, tasks_data))
+            else:
+                result.update({'status': 'failed', 'error': error})
+        
+        # Supabase unreachable: keep those simulations and their tasks in the local stores
+        if unavailable:
+            logger.info(f"Saving {len(unavailable)} simulations to local storage...")
+            get_local_catalog().add_simulations([simulation for _, simulation, _ in unavailable])
+            for result, simulation_data, tasks_data in unavailable:
+                for task in tasks_data:
+                    task['simulation_id'] = simulation_data['id']
+                get_local_catalog().add_tasks(tasks_data)
+                result.update({'id': simulation_data['id'], 'storage': 'local', 'tasks': 'local'})
+        
+        # ===== BULK INSERT TASKS (all simulations together) =====
+        task_rows = [task for _, tasks_data in supabase_tasks for task in tasks_data]
+        task_outcomes = iter(bulk_insert(supabase_admin, 'tasks', task_rows))
+        outbox = current_app.config.get('supabase_outbox')
+        for result, tasks_data in supabase_tasks:
+            if not tasks_data:
+                result['tasks'] = 'inserted'
+                continue
+            outcomes = [next(task_outcomes) for _ in tasks_data]
+            retry = [task for task, (row, _, is_unavailable) in zip(tasks_data, outcomes) if row is None and is_unavailable]
+            rejected = [error for row, error, is_unavailable in outcomes if row is None and not is_unavailable]
+            if retry and outbox is not None:
+                # The outbox retries them until Supabase is back
+                for task in retry:
+                    outbox.enqueue('tasks', task, key=f"task:{task['simulation_id']}:{task['sequence']}")
+                result['tasks'] = 'queued'
+            elif retry:
+                get_local_catalog().add_tasks(retry)
+                result['tasks'] = 'local'
+            else:
+                result['tasks'] = 'inserted'
+            if rejected:
+                result.update({'tasks': 'partial', 'task_errors': rejected})
+        
+        invalidate_catalog()
+        for result in results:
+            if result.get('id') is not None:
+                catalog_cache.invalidate(f"tasks:{result['id']}")
+        
+        counts = {status: sum(1 for r in results if r['status'] == status) for status in ('created', 'invalid', 'failed')}
+        logger.info(f"Bulk import finished: {counts}")
+        status_code = 201 if counts['created'] == len(results) else 207 if counts['created'] else 400
+        return jsonify({**counts, 'results': results}), status_code
+    
+    except Exception as e:
+        logger.error(f"Unexpected error in bulk_import_internships: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
 @internship_bp.route('', methods=['GET'])
 def get_internships():
     """Fetch all simulations - from Supabase or fallback to JSON"""
@@ -323,36 +636,34 @@ def get_internships():
         # Try Supabase first
         if supabase:
             try:
-                response = supabase.table('simulations').select('*').execute()
-                if response.data:
-                    logger.info(f"Fetched {len(response.data)} simulations from Supabase")
-                    return jsonify({
+                simulations = fetch_simulations(supabase)
+                if simulations:
+                    logger.info(f"Fetched {len(simulations)} simulations from Supabase")
+                    return conditional_json({
                         'success': True,
-                        'data': response.data,
-                        'count': len(response.data)
-                    }), 200
+                        'data': simulations,
+                        'count': len(simulations)
+                    }, cache_key='simulations', source=simulations)
             except Exception as supabase_error:
                 logger.warning(f"Supabase fetch failed: {str(supabase_error)}, trying JSON fallback...")
         
-        # Fallback to JSON
-        simulations_file = Path('simulations.json')
+        # Fallback to the local catalog
+        data = catalog_cache.get_or_load('local:simulations', get_local_catalog().simulations)
         
-        if simulations_file.exists():
-            with open(simulations_file, 'r', encoding='utf-8') as f:
-                data = json_module.load(f)
+        if data:
             logger.info(f"Fetched {len(data)} simulations from JSON fallback")
-            return jsonify({
+            return conditional_json({
                 'success': True,
                 'data': data,
                 'count': len(data),
                 'source': 'json'
-            }), 200
+            })
         else:
-            return jsonify({
+            return conditional_json({
                 'success': True,
                 'data': [],
                 'count': 0
-            }), 200
+            })
             
     except Exception as e:
         logger.error(f"Error fetching simulations: {str(e)}", exc_info=True)
@@ -368,40 +679,36 @@ def get_tasks_for_simulation(simulation_id):
         # Try Supabase first
         if supabase:
             try:
-                response = supabase.table('tasks').select('*').eq('simulation_id', simulation_id).order('sequence').execute()
-                if response.data:
-                    logger.info(f"Fetched {len(response.data)} tasks from Supabase for simulation {simulation_id}")
-                    return jsonify({
+                tasks = fetch_simulation_tasks(supabase, simulation_id)
+                if tasks:
+                    logger.info(f"Fetched {len(tasks)} tasks from Supabase for simulation {simulation_id}")
+                    return conditional_json({
                         'success': True,
-                        'data': response.data,
-                        'count': len(response.data)
-                    }), 200
+                        'data': tasks,
+                        'count': len(tasks)
+                    }, cache_key=f'tasks:{simulation_id}', source=tasks)
             except Exception as supabase_error:
                 logger.warning(f"Supabase tasks fetch failed: {str(supabase_error)}, trying JSON fallback...")
         
-        # Fallback to JSON
-        tasks_file = Path('tasks.json')
+        # Fallback to the local catalog (indexed by simulation, sorted by sequence)
+        simulation_tasks = catalog_cache.get_or_load(
+            f'local:tasks:{simulation_id}', lambda: get_local_catalog().tasks_for(simulation_id)
+        )
         
-        if tasks_file.exists():
-            with open(tasks_file, 'r', encoding='utf-8') as f:
-                all_tasks = json_module.load(f)
-            # Filter tasks for this simulation
-            simulation_tasks = [t for t in all_tasks if str(t.get('simulation_id')) == str(simulation_id)]
-            # Sort by sequence
-            simulation_tasks.sort(key=lambda x: x.get('sequence', 0))
+        if simulation_tasks:
             logger.info(f"Fetched {len(simulation_tasks)} tasks from JSON fallback for simulation {simulation_id}")
-            return jsonify({
+            return conditional_json({
                 'success': True,
                 'data': simulation_tasks,
                 'count': len(simulation_tasks),
                 'source': 'json'
-            }), 200
+            })
         else:
-            return jsonify({
+            return conditional_json({
                 'success': True,
                 'data': [],
                 'count': 0
-            }), 200
+            })
             
     except Exception as e:
         logger.error(f"Error fetching tasks: {str(e)}", exc_info=True)
@@ -454,6 +761,7 @@ def update_internship(internship_id):
         supabase = current_app.config['supabase']
         response = supabase.table('simulations').update(update_data).eq('id', internship_id).execute()
         
+        invalidate_catalog(internship_id)
         if not response.data:
             return jsonify({'error': 'Simulation not found'}), 404
         
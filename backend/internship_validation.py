@@ -0,0 +1,123 @@
+"""
+Internship Payload Validation
+
+Validation and sanitization of simulation (and task) payloads, shared by the
+single-create and bulk-import routes. The functions are pure and keep no
+shared state, so the bulk importer runs them concurrently on its thread pool
+(``validation_pool`` in internship_api).
+"""
+
+import json
+
+from sanitizer import HtmlSanitizer
+
+SIMULATION_REQUIRED_FIELDS = ['title', 'category', 'difficulty', 'duration', 'description', 'overview']
+SIMULATION_HTML_FIELDS = ['description', 'overview', 'features', 'skills']
+TASK_REQUIRED_FIELDS = ['title', 'full_title', 'duration', 'difficulty', 'description',
+                        'what_youll_learn', 'what_youll_do']
+TASK_HTML_FIELDS = ['description', 'what_youll_learn', 'what_youll_do']
+
+
+class InternshipValidationError(ValueError):
+    """Payload rejected; the message is safe to return to the client"""
+
+
+def _clean_html(html_content, label, error_prefix=''):
+    """Sanitize one rich-text field and check its plain-text length (5-500 chars)"""
+    if not html_content:
+        raise InternshipValidationError(f'{error_prefix}{label} is required')
+
+    sanitized_html = HtmlSanitizer.sanitize(html_content)
+    if not sanitized_html.strip():
+        raise InternshipValidationError(f'{error_prefix}{label} content is empty after sanitization')
+    return sanitized_html
+
+
+def prepare_simulation(data):
+    """Validated simulation row (without id) for a create request body"""
+    if not isinstance(data, dict):
+        raise InternshipValidationError('Simulation must be a JSON object')
+
+    for field in SIMULATION_REQUIRED_FIELDS:
+        if not data.get(field):
+            raise InternshipValidationError(f'Missing required field: {field}')
+
+    simulation_data = {
+        'title': data.get('title', '').strip(),
+        'category': data.get('category', '').strip(),
+        'difficulty': data.get('difficulty', '').strip(),
+        'duration': data.get('duration', '').strip(),
+        'image': data.get('image', '').strip(),
+        'rating': None,  # Always null for new simulations
+        # Note: Don't send 'id' - let Supabase auto-generate it
+    }
+
+    for field_name in SIMULATION_HTML_FIELDS:
+        sanitized_html = _clean_html(data.get(field_name, ''), field_name)
+        validation = HtmlSanitizer.validate_plain_text_length(sanitized_html, min_length=5, max_length=500)
+        if not validation['valid']:
+            raise InternshipValidationError(
+                f'{field_name}: {validation["message"]} (Plain text has {validation["char_count"]} chars)'
+            )
+        # Store only HTML (Supabase table doesn't have _plain columns)
+        simulation_data[field_name] = sanitized_html
+
+    return simulation_data
+
+
+def prepare_tasks(tasks_input):
+    """Validated task rows (without simulation_id) for the ``tasks`` list of a create request"""
+    if not tasks_input or not isinstance(tasks_input, list):
+        return []
+
+    tasks_data = []
+    for idx, task in enumerate(tasks_input):
+        prefix = f'Task {idx + 1}: '
+        if not isinstance(task, dict):
+            raise InternshipValidationError(f'{prefix}must be a JSON object')
+
+        for field in TASK_REQUIRED_FIELDS:
+            if not task.get(field):
+                raise InternshipValidationError(f'{prefix}Missing required field: {field}')
+
+        task_data = {
+            'sequence': idx + 1,
+            'title': f'Task {idx + 1}',
+            'full_title': task.get('full_title', '').strip(),
+            'duration': task.get('duration', '').strip(),
+            'difficulty': task.get('difficulty', '').strip(),
+            'material_url': task.get('material_url', '').strip(),
+        }
+
+        for field_name in TASK_HTML_FIELDS:
+            sanitized_html = _clean_html(task.get(field_name, ''), field_name, prefix)
+            validation = HtmlSanitizer.validate_plain_text_length(sanitized_html, min_length=5, max_length=500)
+            if not validation['valid']:
+                raise InternshipValidationError(f'Task {idx + 1}, {field_name}: {validation["message"]}')
+            task_data[field_name] = sanitized_html
+
+        quiz = task.get('quiz')
+        if quiz and isinstance(quiz, dict) and quiz.get('enabled'):
+            task_data['quiz'] = json.dumps(quiz)
+        else:
+            task_data['quiz'] = None
+
+        tasks_data.append(task_data)
+    return tasks_data
+
+
+def prepare_internship(data):
+    """(simulation_row, task_rows) for a create request body; raises InternshipValidationError"""
+    simulation_data = prepare_simulation(data)
+    return simulation_data, prepare_tasks(data.get('tasks', []))
+
+
+def prepare_internship_result(data):
+    """prepare_internship() for worker pools: returns (simulation, tasks, None) or (None, None, error)"""
+    try:
+        simulation_data, tasks_data = prepare_internship(data)
+        return simulation_data, tasks_data, None
+    except InternshipValidationError as e:
+        return None, None, str(e)
+    except Exception as e:
+        return None, None, f'Invalid internship: {e}'
@@ -0,0 +1,76 @@
+"""
+One-shot migration of the local JSON stores into the SQLite backend.
+
+Run from the backend directory (where the JSON files live):
+    python migrate_to_sqlite.py [--db quantiverse.db] [--force]
+
+Each JSON store is loaded through JournaledStore, so changes still sitting in
+a journal are included. Sharded stores (user_activity/) are copied shard by
+shard into tables of the same name; the manifest stays where it is and is
+shared by both backends. Tables that already contain rows are skipped unless
+--force is given. Afterwards start the app with STORAGE_BACKEND=sqlite.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from storage import INDEXED_FIELDS, SQLITE_PATH, JournaledStore, SqliteStore
+
+# (store name, JSON file, document type) - mirrors the stores opened by app.py and internship_api.py
+JSON_STORES = [
+    ('quiz_attempts', 'quiz_attempts.json', dict),
+    ('enrollments', 'enrollments.json', list),
+    ('user_activity', 'user_activity.json', dict),
+    ('notifications', 'notifications.json', dict),
+    ('categories', 'categories.json', list),
+    ('simulations', 'simulations.json', list),
+    ('tasks', 'tasks.json', list),
+    ('catalog_ids', 'catalog_ids.json', dict),
+    ('activity_rollups', 'activity_rollups.json', dict),
+]
+
+# Stores split into <name>/<name>-NN.json shards by storage.ShardedStore
+SHARDED_STORES = ['user_activity']
+
+
+def store_files():
+    """(store name, JSON file, document type) for every store present on disk"""
+    files = [(name, Path(filename), default) for name, filename, default in JSON_STORES]
+    for name in SHARDED_STORES:
+        for path in sorted(Path(name).glob(f'{name}-*.json')):
+            files.append((path.stem.replace('-', '_'), path, dict))
+    return files
+
+
+def migrate(db_path=SQLITE_PATH, force=False):
+    """Copy every JSON store into db_path; returns {store name: rows written}"""
+    results = {}
+    for name, path, default in store_files():
+        filename = str(path)
+        if not path.exists():
+            print(f"- {name}: {filename} not found, skipping")
+            continue
+
+        source = JournaledStore(path, default=default, name=name)
+        target = SqliteStore(db_path, name, default=default, index_fields=INDEXED_FIELDS.get(name, ()))
+
+        if target.data and not force:
+            print(f"- {name}: table already has {len(target.data)} rows, skipping (use --force to overwrite)")
+            continue
+
+        target.replace(source.data)
+        results[name] = len(source.data)
+        print(f"✓ {name}: migrated {len(source.data)} records from {filename}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrate local JSON stores into SQLite')
+    parser.add_argument('--db', default=SQLITE_PATH, help='SQLite database file')
+    parser.add_argument('--force', action='store_true', help='overwrite tables that already have rows')
+    args = parser.parse_args()
+
+    migrate(args.db, args.force)
+    print(f"Done. Start the backend with STORAGE_BACKEND=sqlite STORAGE_SQLITE_PATH={args.db}")
+    sys.exit(0)
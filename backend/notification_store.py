@@ -0,0 +1,154 @@
+"""
+Notification Repository
+
+Keeps each user's notifications in memory as a capped, insertion-ordered
+feed keyed by notification id, so the notification routes never rebuild or
+rescan whole lists:
+
+    create        O(1) insert; the oldest entry is evicted past the cap
+    mark read     O(1) per id (plus a maintained per-user unread counter)
+    delete        O(1) by id
+
+Persistence is per user: a change rewrites only that user's list in the
+local notifications store, in the same newest-first format as before. The
+user's feed is re-read from the store under its exclusive lock before each
+change, so writes from other worker processes are never overwritten.
+Users changed by other worker processes are reloaded on ``refresh()``.
+"""
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class NotificationRepository:
+    """Per-user capped notification feeds over a dict-backed local store"""
+
+    def __init__(self, store, limit=100):
+        self.store = store
+        self.limit = limit
+        self._lock = threading.RLock()
+        self._feeds = {}
+        self._unread = {}
+        self._stale = set()
+        self._generation = None
+        store.on_change(self._stale.add)
+        self.rebuild()
+
+    # ----- loading -----
+
+    def _load_user(self, user_id):
+        """(Re)build one user's feed from the stored newest-first list"""
+        entries = self.store.data.get(user_id)
+        if entries is None:
+            self._feeds.pop(user_id, None)
+            self._unread.pop(user_id, None)
+            return
+        feed = OrderedDict()
+        for notification in reversed(entries[:self.limit]):
+            feed[notification.get('id')] = notification
+        self._feeds[user_id] = feed
+        self._unread[user_id] = sum(1 for n in feed.values() if not n.get('read', False))
+
+    def rebuild(self):
+        """Recompute every feed from the store"""
+        with self._lock:
+            self._feeds.clear()
+            self._unread.clear()
+            self._stale.clear()
+            for user_id in list(self.store.data):
+                self._load_user(user_id)
+            self._generation = self.store.generation
+
+    def refresh(self):
+        """Pick up notifications written by other processes; cheap when nothing changed"""
+        self.store.sync()
+        with self._lock:
+            if self._generation != self.store.generation:
+                self.rebuild()
+                return
+            while self._stale:
+                self._load_user(self._stale.pop())
+
+    def refresh_user(self, user_id):
+        """Reload one user's feed after its stored list was changed directly"""
+        with self._lock:
+            self._stale.discard(user_id)
+            self._load_user(user_id)
+
+    @contextmanager
+    def _editing(self, user_id):
+        """Hold the store's write lock with the user's feed re-read from the store"""
+        with self._lock, self.store.exclusive():
+            if self._generation != self.store.generation:
+                self.rebuild()
+            else:
+                self.refresh_user(user_id)
+            yield
+
+    def _persist(self, user_id):
+        self.store.set(user_id, self.list(user_id))
+
+    # ----- lookups -----
+
+    def list(self, user_id):
+        """A user's notifications, newest first"""
+        feed = self._feeds.get(user_id)
+        return list(reversed(feed.values())) if feed else []
+
+    def unread_count(self, user_id):
+        return self._unread.get(user_id, 0)
+
+    # ----- writes -----
+
+    def add(self, user_id, notification):
+        """Insert a notification as the user's newest, evicting the oldest past the cap"""
+        with self._editing(user_id):
+            feed = self._feeds.setdefault(user_id, OrderedDict())
+            feed[notification['id']] = notification
+            if not notification.get('read', False):
+                self._unread[user_id] = self._unread.get(user_id, 0) + 1
+            while len(feed) > self.limit:
+                _, evicted = feed.popitem(last=False)
+                if not evicted.get('read', False):
+                    self._unread[user_id] -= 1
+            self._persist(user_id)
+
+    def mark_read(self, user_id, notification_ids=(), mark_all=False):
+        """Mark the given ids (or every notification) read; returns how many changed"""
+        with self._editing(user_id):
+            feed = self._feeds.get(user_id)
+            if not feed:
+                return 0
+            if mark_all:
+                targets = feed.values() if self._unread.get(user_id) else ()
+            else:
+                targets = [feed[i] for i in notification_ids if i in feed]
+            changed = 0
+            for notification in targets:
+                if not notification.get('read', False):
+                    notification['read'] = True
+                    changed += 1
+            if changed:
+                self._unread[user_id] -= changed
+                self._persist(user_id)
+            return changed
+
+    def delete(self, user_id, notification_id):
+        """Remove one notification; returns True if it existed"""
+        with self._editing(user_id):
+            feed = self._feeds.get(user_id)
+            notification = feed.pop(notification_id, None) if feed else None
+            if notification is None:
+                return False
+            if not notification.get('read', False):
+                self._unread[user_id] -= 1
+            self._persist(user_id)
+            return True
+
+    def clear(self, user_id):
+        """Remove all of a user's notifications"""
+        with self._editing(user_id):
+            self._feeds[user_id] = OrderedDict()
+            self._unread[user_id] = 0
+            self._persist(user_id)
@@ -0,0 +1,341 @@
+"""
+Supabase Outbox
+
+Request handlers used to write to Supabase inline and drop the write if
+Supabase hiccuped. With the outbox they record the row in a local store
+(durable, shared by all worker processes) and return immediately. A
+background worker then delivers pending rows in bulk inserts.
+
+    outbox.enqueue('quiz_attempts', row, key='quiz_attempt:<user>:<task>:<n>')
+
+Delivery rules:
+- Rows are sent oldest first, batched per table, up to ``batch_size`` rows per insert.
+- A batch that fails to reach Supabase (connection error, timeout, open
+  circuit) is retried with exponential backoff.
+- A batch Supabase rejects is retried row by row, so one bad row cannot
+  block the others.
+- A row Supabase has rejected ``max_attempts`` times is parked as ``dead``.
+  It stays in the store for inspection and is not retried. Outages never
+  kill a row; it keeps retrying at the maximum backoff.
+
+Idempotency: every entry has a key. Enqueueing a key that is already pending,
+or was delivered within the retention window, does nothing. Worker processes
+claim entries with a lease under the store's cross-process lock, so an entry
+is delivered by one worker only. A request that times out after Supabase
+committed it can still be re-sent. If the tables have a unique column for
+the key, set OUTBOX_IDEMPOTENCY_COLUMN: rows then carry the key and are
+upserted with ignore-duplicates, which makes such a re-send harmless.
+
+Scheduling: claiming does not scan the store. Pending entries wait in a heap
+ordered by the time they next become claimable (backoff or lease expiry);
+due ones move to per-table heaps ordered by ``seq``. Local changes reschedule
+their entry, other processes' changes arrive through the store's change
+listener, and a wholesale reload rebuilds the heaps.
+"""
+
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+try:
+    from postgrest.exceptions import APIError
+except ImportError:  # supabase not installed
+    APIError = ()
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_INTERVAL = float(os.getenv('OUTBOX_INTERVAL', '2'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '10'))
+OUTBOX_MAX_BACKOFF = float(os.getenv('OUTBOX_MAX_BACKOFF', '300'))
+OUTBOX_RETENTION = float(os.getenv('OUTBOX_RETENTION', '86400'))
+OUTBOX_IDEMPOTENCY_COLUMN = os.getenv('OUTBOX_IDEMPOTENCY_COLUMN') or None
+
+# How long a worker owns the entries it claimed before another worker may retry them
+LEASE_SECONDS = 60
+
+PENDING = 'pending'
+DELIVERED = 'delivered'
+DEAD = 'dead'
+
+
+class Outbox:
+    """Durable queue of Supabase inserts delivered in the background"""
+
+    def __init__(self, store, client, batch_size=OUTBOX_BATCH_SIZE, interval=OUTBOX_INTERVAL,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS, idempotency_column=OUTBOX_IDEMPOTENCY_COLUMN, start=True):
+        self.store = store
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.idempotency_column = idempotency_column
+        self._wakeup = threading.Event()
+        self._listeners = defaultdict(list)
+        # (claimable_at, seq, key) for pending entries not yet due; stale items are skipped when popped
+        self._waiting = []
+        self._waiting_at = {}
+        # table -> heap of (seq, key) for entries that are due
+        self._ready = {}
+        self._ready_keys = set()
+        self._indexed_generation = None
+        store.on_change(self._remote_change)
+        self._stats = {
+            'enqueued': 0,
+            'duplicates': 0,
+            'delivered': 0,
+            'batches': 0,
+            'retries': 0,
+            'dead_lettered': 0,
+            'last_error': None,
+            'last_delivery_at': None,
+        }
+        if start and client is not None:
+            threading.Thread(target=self._run, name='supabase-outbox', daemon=True).start()
+
+    # ----- producers -----
+
+    def enqueue(self, table, row, key=None):
+        """Record a row to insert into table; returns its idempotency key"""
+        key = key or str(uuid.uuid4())
+        now = time.time()
+        entry = {
+            'key': key,
+            'table': table,
+            'row': row,
+            'seq': time.time_ns(),
+            'status': PENDING,
+            'attempts': 0,
+            'rejections': 0,
+            'next_attempt_at': now,
+            'lease_until': 0,
+            'created_at': now,
+            'last_error': None,
+        }
+        with self.store.exclusive():
+            if key in self.store.data:
+                self._stats['duplicates'] += 1
+                return key
+            self.store.set(key, entry)
+            self._schedule(entry)
+        self._stats['enqueued'] += 1
+        self._wakeup.set()
+        return key
+
+    def on_delivered(self, table, listener):
+        """Call listener(rows) after rows for table reached Supabase"""
+        self._listeners[table].append(listener)
+
+    # ----- delivery -----
+
+    def _backoff(self, attempts):
+        delay = min(OUTBOX_MAX_BACKOFF, self.interval * (2 ** min(attempts, 16)))
+        return delay * random.uniform(0.5, 1.0)
+
+    # ----- scheduling -----
+
+    @staticmethod
+    def _claimable_at(entry):
+        return max(entry['next_attempt_at'], entry['lease_until'])
+
+    def _schedule(self, entry):
+        """Queue a pending entry for the time it next becomes claimable"""
+        key = entry['key']
+        if entry['status'] != PENDING or key in self._ready_keys:
+            return
+        at = self._claimable_at(entry)
+        if self._waiting_at.get(key) != at:
+            self._waiting_at[key] = at
+            heapq.heappush(self._waiting, (at, entry['seq'], key))
+
+    def _remote_change(self, key):
+        entry = self.store.data.get(key)
+        if entry is not None:
+            self._schedule(entry)
+
+    def _reindex(self):
+        """Rebuild the heaps from the store after it was reloaded wholesale"""
+        self._waiting, self._waiting_at = [], {}
+        self._ready, self._ready_keys = {}, set()
+        for entry in list(self.store.data.values()):
+            self._schedule(entry)
+        self._indexed_generation = self.store.generation
+
+    def _promote(self, now):
+        """Move entries whose time has come from the waiting heap to their table's ready heap"""
+        while self._waiting and self._waiting[0][0] <= now:
+            at, seq, key = heapq.heappop(self._waiting)
+            if self._waiting_at.get(key) != at:
+                continue  # rescheduled since
+            del self._waiting_at[key]
+            entry = self.store.data.get(key)
+            if entry is None or entry['status'] != PENDING:
+                continue
+            if self._claimable_at(entry) > now:
+                self._schedule(entry)
+                continue
+            heapq.heappush(self._ready.setdefault(entry['table'], []), (entry['seq'], key))
+            self._ready_keys.add(key)
+
+    def _claim(self):
+        """Lease the oldest due entries of one table for this process"""
+        now = time.time()
+        with self.store.exclusive():
+            if self._indexed_generation != self.store.generation:
+                self._reindex()
+            self._promote(now)
+            while self._ready:
+                table = min(self._ready, key=lambda t: self._ready[t][0])
+                ready = self._ready[table]
+                batch = []
+                while ready and len(batch) < self.batch_size:
+                    _, key = heapq.heappop(ready)
+                    self._ready_keys.discard(key)
+                    entry = self.store.data.get(key)
+                    if entry is None:
+                        continue
+                    if entry['status'] == PENDING and self._claimable_at(entry) <= now:
+                        batch.append(entry)
+                    else:
+                        self._schedule(entry)
+                if not ready:
+                    del self._ready[table]
+                if batch:
+                    for entry in batch:
+                        entry['lease_until'] = now + LEASE_SECONDS
+                        self.store.set(entry['key'], entry)
+                        self._schedule(entry)
+                    return batch
+            return []
+
+    def _send(self, table, entries):
+        rows = [dict(e['row']) for e in entries]
+        query = self.client.table(table)
+        if self.idempotency_column:
+            for row, entry in zip(rows, entries):
+                row[self.idempotency_column] = entry['key']
+            query.upsert(rows, on_conflict=self.idempotency_column, ignore_duplicates=True).execute()
+        else:
+            query.insert(rows).execute()
+
+    def _settle(self, entries, error=None, rejected=False):
+        """Record the outcome of a delivery attempt for entries"""
+        now = time.time()
+        with self.store.exclusive():
+            for entry in entries:
+                entry['lease_until'] = 0
+                if error is None:
+                    entry.update({'status': DELIVERED, 'delivered_at': now, 'row': None, 'last_error': None})
+                    self._stats['delivered'] += 1
+                else:
+                    entry['attempts'] += 1
+                    entry['last_error'] = str(error)
+                    if rejected:
+                        entry['rejections'] = entry.get('rejections', 0) + 1
+                    if entry.get('rejections', 0) >= self.max_attempts:
+                        entry['status'] = DEAD
+                        self._stats['dead_lettered'] += 1
+                        logger.error(f"Outbox entry {entry['key']} for {entry['table']} is dead: {error}")
+                    else:
+                        entry['next_attempt_at'] = now + self._backoff(entry['attempts'])
+                        self._stats['retries'] += 1
+                self.store.set(entry['key'], entry)
+                self._schedule(entry)
+        if error is not None:
+            self._stats['last_error'] = f"{type(error).__name__}: {error}"
+
+    def _delivered(self, table, entries):
+        rows = [e['row'] for e in entries]
+        self._settle(entries)
+        self._stats['last_delivery_at'] = time.time()
+        for listener in self._listeners.get(table, []):
+            try:
+                listener(rows)
+            except Exception as e:
+                logger.error(f"Outbox listener for {table} failed: {e}")
+
+    def deliver_once(self):
+        """Deliver one batch; returns the number of rows delivered"""
+        if self.client is None:
+            return 0
+        batch = self._claim()
+        if not batch:
+            return 0
+        table = batch[0]['table']
+        self._stats['batches'] += 1
+        try:
+            self._send(table, batch)
+        except APIError as e:
+            if len(batch) == 1:
+                self._settle(batch, e, rejected=True)
+                return 0
+            # Rejected: find the bad row(s) by retrying one at a time
+            delivered = 0
+            for entry in batch:
+                try:
+                    self._send(table, [entry])
+                except APIError as row_error:
+                    self._settle([entry], row_error, rejected=True)
+                except Exception as row_error:
+                    self._settle([entry], row_error)
+                else:
+                    self._delivered(table, [entry])
+                    delivered += 1
+            return delivered
+        except Exception as e:
+            logger.warning(f"Outbox delivery of {len(batch)} {table} rows failed, will retry: {e}")
+            self._settle(batch, e)
+            return 0
+        self._delivered(table, batch)
+        return len(batch)
+
+    def drain(self):
+        """Deliver batches until nothing is due; returns rows delivered"""
+        total = 0
+        while True:
+            delivered = self.deliver_once()
+            if not delivered:
+                return total
+            total += delivered
+
+    def purge(self):
+        """Forget delivered entries older than the retention window"""
+        cutoff = time.time() - OUTBOX_RETENTION
+        expired = [k for k, e in list(self.store.data.items())
+                   if e['status'] == DELIVERED and e.get('delivered_at', 0) < cutoff]
+        for key in expired:
+            self.store.delete(key)
+        return len(expired)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.drain()
+                self.purge()
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}")
+
+    def metrics(self):
+        """Queue depth, oldest pending age and delivery counters"""
+        now = time.time()
+        counts = defaultdict(int)
+        oldest = None
+        for entry in list(self.store.data.values()):
+            counts[entry['status']] += 1
+            if entry['status'] == PENDING and (oldest is None or entry['created_at'] < oldest):
+                oldest = entry['created_at']
+        return {
+            'pending': counts[PENDING],
+            'dead': counts[DEAD],
+            'delivered_retained': counts[DELIVERED],
+            'oldest_pending_seconds': round(now - oldest, 3) if oldest is not None else 0.0,
+            'idempotency_column': self.idempotency_column,
+            **self._stats,
+        }
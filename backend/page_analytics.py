@@ -0,0 +1,98 @@
+"""
+Page Analytics Counters
+
+Per-user, per-path counters kept in the user's activity record and updated
+as events arrive, so the admin user view no longer re-walks every page visit
+and every session's page list on each request:
+
+    activity['page_stats'] = [
+        {'page_path': '/tasks', 'total_seconds': 340, 'visit_count': 12},
+        ...
+    ]
+
+The list is kept ordered by total_seconds (largest first, ties in first-seen
+order), so ``top_pages(activity, n)`` is a slice. An update finds the path
+(a user has few distinct paths) and moves the entry up past the entries it
+now outranks.
+
+    record_page_time      a page duration arrived (page-duration, session-end beacon)
+    record_session_pages  a session ended: each page it visited counts once
+
+As before the counters existed, pages of the session still in progress are
+not counted until it ends, and a visit without a ``page_path`` counts under
+'Unknown'.
+
+Records written before the counters existed get them on their next change
+(the write paths call ``page_stats()``, which counts the stored visits once)
+or when the activity compactor backfills them. Until then ``top_pages()``
+derives the counters on the fly without storing them, so reads never modify
+the record.
+"""
+
+UNKNOWN_PAGE = 'Unknown'
+
+
+def build_page_stats(activity):
+    """Counters derived from the stored page visits and ended sessions' page lists"""
+    stats = []
+    by_path = {}
+
+    def entry(path):
+        if path not in by_path:
+            by_path[path] = {'page_path': path, 'total_seconds': 0, 'visit_count': 0}
+            stats.append(by_path[path])
+        return by_path[path]
+
+    for visit in activity.get('page_visits') or []:
+        counter = entry(visit.get('page_path', UNKNOWN_PAGE))
+        counter['total_seconds'] += visit.get('duration_seconds') or 0
+        counter['visit_count'] += 1
+    for session in activity.get('sessions') or []:
+        for page in session.get('pages_visited') or []:
+            entry(page.get('page_path', UNKNOWN_PAGE))['visit_count'] += 1
+
+    stats.sort(key=lambda counter: counter['total_seconds'], reverse=True)
+    return stats
+
+
+def page_stats(activity):
+    """The record's counters, built from its stored visits the first time"""
+    stats = activity.get('page_stats')
+    if stats is None:
+        stats = activity['page_stats'] = build_page_stats(activity)
+    return stats
+
+
+def _record(activity, path, seconds, visits):
+    stats = page_stats(activity)
+    index = next((i for i, counter in enumerate(stats) if counter['page_path'] == path), None)
+    if index is None:
+        stats.append({'page_path': path, 'total_seconds': 0, 'visit_count': 0})
+        index = len(stats) - 1
+    counter = stats[index]
+    counter['total_seconds'] += seconds
+    counter['visit_count'] += visits
+    # Move up past the entries it now outranks (durations only ever grow)
+    while index > 0 and stats[index - 1]['total_seconds'] < counter['total_seconds']:
+        stats[index] = stats[index - 1]
+        index -= 1
+    stats[index] = counter
+
+
+def record_page_time(activity, path, seconds):
+    """Count one visit of ``path`` that lasted ``seconds``"""
+    _record(activity, path, max(seconds or 0, 0), 1)
+
+
+def record_session_pages(activity, session):
+    """Count the pages of a session that just ended (call before it joins activity['sessions'])"""
+    for page in session.get('pages_visited') or []:
+        _record(activity, page.get('page_path', UNKNOWN_PAGE), 0, 1)
+
+
+def top_pages(activity, n):
+    """The ``n`` pages with the most time, largest first (read-only)"""
+    stats = activity.get('page_stats')
+    if stats is None:
+        stats = build_page_stats(activity)
+    return [dict(counter) for counter in stats[:n]]
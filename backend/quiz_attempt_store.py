@@ -0,0 +1,107 @@
+"""
+Quiz Attempt Repository
+
+Wraps the local quiz_attempts store (one record per ``{user_id}_{task_id}``
+key) with a secondary index so the quiz routes stop scanning every record:
+
+    by (user_id, task_id)        -> the store key itself (attempts, submit)
+    by (user_id, simulation_id)  -> quiz status for a simulation
+
+Records changed by other worker processes are re-indexed on ``refresh()``;
+a wholesale reload of the store rebuilds the index. Read-modify-write
+sequences (``get`` -> change -> ``save``) run inside ``exclusive()`` so they
+start from the latest record and no other worker's change is lost.
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class QuizAttemptRepository:
+    """Indexed access to quiz attempt records stored in a dict-backed local store"""
+
+    def __init__(self, store):
+        self.store = store
+        self.attempts = store.data
+        self._lock = threading.RLock()
+        self._by_simulation = defaultdict(set)
+        self._simulation_of = {}
+        self._stale = set()
+        self._generation = None
+        store.on_change(self._stale.add)
+        self.rebuild()
+
+    # ----- indexing -----
+
+    @staticmethod
+    def key(user_id, task_id):
+        return f"{user_id}_{task_id}"
+
+    def _unindex(self, key):
+        pair = self._simulation_of.pop(key, None)
+        if pair is not None:
+            keys = self._by_simulation[pair]
+            keys.discard(key)
+            if not keys:
+                del self._by_simulation[pair]
+
+    def _index(self, key, record):
+        self._unindex(key)
+        pair = (record.get('user_id'), str(record.get('simulation_id')))
+        self._by_simulation[pair].add(key)
+        self._simulation_of[key] = pair
+
+    def rebuild(self):
+        """Recompute the index from every record"""
+        with self._lock:
+            self._by_simulation.clear()
+            self._simulation_of.clear()
+            self._stale.clear()
+            for key, record in list(self.attempts.items()):
+                self._index(key, record)
+            self._generation = self.store.generation
+
+    def refresh(self):
+        """Pick up records written by other processes; cheap when nothing changed"""
+        self.store.sync()
+        with self._lock:
+            if self._generation != self.store.generation:
+                self.rebuild()
+                return
+            while self._stale:
+                key = self._stale.pop()
+                if key in self.attempts:
+                    self._index(key, self.attempts[key])
+                else:
+                    self._unindex(key)
+
+    # ----- lookups -----
+
+    def get(self, user_id, task_id):
+        """Return the attempt record of user_id on task_id, or None"""
+        return self.attempts.get(self.key(user_id, task_id))
+
+    def for_simulation(self, user_id, simulation_id):
+        """All attempt records of a user within one simulation"""
+        keys = self._by_simulation.get((user_id, str(simulation_id)), ())
+        return [self.attempts[k] for k in list(keys) if k in self.attempts]
+
+    def __len__(self):
+        return len(self.attempts)
+
+    # ----- writes -----
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the store's write lock, caught up with other processes, around get -> change -> save"""
+        with self._lock, self.store.exclusive():
+            yield
+
+    def save(self, record):
+        """Persist a new or updated record and index it; returns its key"""
+        with self._lock:
+            key = self.key(record['user_id'], record['task_id'])
+            self.store.set(key, record)
+            self._index(key, record)
+            return key
@@ -0,0 +1,1204 @@
+"""
+Local Storage Engines
+
+Every local store (quiz attempts, enrollments, activity, notifications,
+categories, and the simulations/tasks fallbacks) keeps its materialized state
+in memory and persists individual changes instead of re-serializing the
+whole document. Two backends are available, selected with STORAGE_BACKEND:
+
+    json    (default) JournaledStore - JSON snapshot + append-only journal
+    sqlite  SqliteStore - one table per store in a WAL-mode SQLite database
+
+JSON on-disk layout for a store backed by ``enrollments.json``:
+    enrollments.json            snapshot (same format as before)
+    enrollments.json.journal    one JSON operation per line since the snapshot
+    enrollments.json.lock       cross-process lock file
+
+Journal operations are keyed (dict key or list index) and replayed in order.
+A journal starts with an ``epoch`` line holding the CRC32 of the snapshot it
+was written against. A compaction replaces the snapshot before removing the
+journal, so a crash in between leaves a journal whose epoch no longer matches
+the snapshot; recovery skips it (it is already folded in) and the next write
+truncates it. Journal operations are therefore applied exactly once, which
+matters for list deletes by index. A line torn by a crash mid-append has no
+trailing newline; it is ignored and cut off by the next write, which holds
+the lock, so later operations never end up glued to it.
+
+Multiple processes (gunicorn workers) can share a store. Every write takes a
+cross-process lock (flock on the JSON lock file, BEGIN IMMEDIATE in SQLite)
+and first catches up with changes made by other processes, so writes to
+different keys are never lost and list appends never collide. ``sync()``
+pulls other processes' changes between writes; it is a couple of stat calls
+(or one PRAGMA) when nothing changed. Concurrent writes to the same key are
+last-writer-wins, except that write-behind flushes rebase pending changes
+marked with a ``rebase`` function onto the other process's value.
+
+Use ``open_store()`` rather than instantiating a backend directly.
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 'json' (journaled files) or 'sqlite'
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()
+
+# Database file used by the sqlite backend
+SQLITE_PATH = os.getenv('STORAGE_SQLITE_PATH', 'quantiverse.db')
+
+# Compact once this many operations have been journaled since the last snapshot
+DEFAULT_COMPACT_THRESHOLD = int(os.getenv('STORAGE_COMPACT_THRESHOLD', '1000'))
+
+# How often the background compactor wakes up to check thresholds (seconds)
+COMPACT_CHECK_INTERVAL = float(os.getenv('STORAGE_COMPACT_INTERVAL', '30'))
+
+# fsync every journal append (durable across power loss, slower)
+FSYNC_JOURNAL = os.getenv('STORAGE_FSYNC', '').lower() in ('1', 'true', 'yes')
+
+# Rows of the sqlite change log kept per store for other processes to catch up from
+CHANGE_LOG_KEEP = int(os.getenv('STORAGE_CHANGE_LOG_KEEP', '10000'))
+
+# Record fields promoted to indexed columns in the sqlite backend
+INDEXED_FIELDS = {
+    'enrollments': ('user_id', 'internship_id'),
+    'quiz_attempts': ('user_id', 'simulation_id'),
+    'tasks': ('simulation_id',),
+}
+
+_stores = []
+_stores_lock = threading.Lock()
+
+
+def atomic_write_text(path, text, encoding='utf-8'):
+    """Write text to path via a temp file + rename so readers never see a partial file"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent or '.'), prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def json_default(obj):
+    """json.dumps hook: bounded deques (e.g. activity history) are stored as lists"""
+    if isinstance(obj, deque):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def apply_op(data, op):
+    """Apply one keyed operation ({'op': 'set'|'del'|'replace', ...}) to a dict or list in place"""
+    kind = op.get('op')
+    if kind == 'set':
+        key, value = op['k'], op['v']
+        if isinstance(data, list):
+            if key < len(data):
+                data[key] = value
+            elif key == len(data):
+                data.append(value)
+            else:
+                logger.warning(f"Ignoring out-of-range index {key}")
+        else:
+            data[key] = value
+    elif kind == 'del':
+        if isinstance(data, list):
+            if op['k'] < len(data):
+                del data[op['k']]
+        else:
+            data.pop(op['k'], None)
+    elif kind == 'replace':
+        if isinstance(data, list):
+            data[:] = op['v']
+        else:
+            data.clear()
+            data.update(op['v'])
+
+
+class BaseStore:
+    """
+    In-memory JSON document (dict or list) whose changes are persisted one key at a time.
+
+    Usage:
+        store = open_store('quiz_attempts', 'quiz_attempts.json', default=dict)
+        store.data[key] = record      # mutate the materialized state
+        store.set(key, record)        # persist the change
+
+    Dict stores are addressed by key, list stores by index; ``append`` is a
+    ``set`` at ``len(data)``. The ``data`` object keeps its identity for the
+    lifetime of the store, so module-level aliases stay valid.
+
+    Write-behind mode (``flush_interval > 0``): ``mark_dirty(key)`` only
+    records that a key changed. A flusher thread persists the latest value of
+    every dirty key at most once per ``flush_interval`` seconds, or sooner once
+    ``flush_max_events`` changes are pending, so a burst of updates to the same
+    key costs one write. Pending keys are flushed on shutdown.
+
+    Another process may write a key while it is dirty here. Its value is not
+    applied at once (that would drop our pending change); instead the flush,
+    which runs under the cross-process lock, rebases: it takes the other
+    process's value and re-applies our changes to it. A change can be
+    re-applied if it was marked with ``mark_dirty(key, rebase=fn)``, where
+    ``fn(value)`` makes the same change to a record in place. If any pending
+    change of the key has no ``rebase`` function, our value wins (last writer
+    wins) and the conflict is counted in ``metrics()``.
+
+    Subclasses load ``self.data`` and implement ``_acquire``/``_release``
+    (cross-process write lock + catch-up), ``_write(*ops)`` and ``sync()``.
+    """
+
+    backend = None
+
+    def __init__(self, name, default=dict, flush_interval=0, flush_max_events=0):
+        self.name = name
+        self.default = default
+        self._lock = threading.RLock()
+        self._exclusive_depth = 0
+
+        # Write-behind state: key -> monotonic time it first became dirty
+        self.flush_interval = flush_interval
+        self.flush_max_events = flush_max_events
+        self._dirty = {}
+        # Dirty key -> functions re-applying its pending changes (None once one is missing)
+        self._rebase = {}
+        # Dirty key -> latest operation another process wrote for it, applied at the next flush
+        self._remote = {}
+        self._pending_events = 0
+        self._flush_wakeup = threading.Event()
+        self._stats = {
+            'flush_count': 0,
+            'flushed_keys': 0,
+            'coalesced_events': 0,
+            'last_flush_at': None,
+            'last_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'max_staleness_seconds': 0.0,
+            'synced_changes': 0,
+            'full_reloads': 0,
+            'rebased_keys': 0,
+            'overwritten_conflicts': 0,
+            'skipped_journal_entries': 0,
+        }
+
+        # Bumped whenever data is reloaded wholesale, so derived indexes know to rebuild
+        self.generation = 0
+        self._listeners = []
+
+    def _start(self):
+        """Register for shutdown handling and start the flusher; called at the end of __init__"""
+        with _stores_lock:
+            _stores.append(self)
+        _ensure_compactor()
+        if self.write_behind:
+            threading.Thread(
+                target=self._flush_loop, name=f'storage-flush-{self.name}', daemon=True
+            ).start()
+
+    # ----- cross-process coordination -----
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the thread lock and the cross-process write lock, caught up with other processes"""
+        with self._lock:
+            if self._exclusive_depth:
+                self._exclusive_depth += 1
+                try:
+                    yield
+                finally:
+                    self._exclusive_depth -= 1
+                return
+
+            self._acquire()
+            self._exclusive_depth = 1
+            ok = False
+            try:
+                yield
+                ok = True
+            finally:
+                self._exclusive_depth = 0
+                self._release(ok)
+
+    def exclusive(self):
+        """
+        Context manager holding the store's write lock across processes, caught
+        up with other processes' changes, for read-modify-write sequences:
+
+            with store.exclusive():
+                if key not in store.data:
+                    store.set(key, value)
+        """
+        return self._exclusive()
+
+    def _acquire(self):
+        pass
+
+    def _release(self, ok):
+        pass
+
+    def _write(self, *ops):
+        raise NotImplementedError
+
+    def sync(self):
+        """Pull changes made by other processes; returns True if data changed"""
+        return False
+
+    def _apply_remote(self, op):
+        """Apply an operation written by another process; for a dirty key, keep it for the next flush"""
+        kind = op.get('op')
+        if kind in ('set', 'del') and op['k'] in self._dirty:
+            self._remote[op['k']] = op
+            return
+        apply_op(self.data, op)
+        if kind == 'replace' or (kind == 'del' and isinstance(self.data, list)):
+            self.generation += 1
+        else:
+            for listener in self._listeners:
+                listener(op['k'])
+
+    def on_change(self, listener):
+        """Call listener(key) for each key changed by another process (wholesale reloads bump generation instead)"""
+        self._listeners.append(listener)
+
+    def _replace_keeping_dirty(self, fresh):
+        """Swap in freshly loaded data, keeping locally dirty values"""
+        pending = {}
+        if isinstance(self.data, dict):
+            pending = {k: self.data[k] for k in self._dirty if k in self.data}
+            for key in pending:
+                if key in fresh:
+                    self._remote[key] = {'op': 'set', 'k': key, 'v': fresh[key]}
+        apply_op(self.data, {'op': 'replace', 'v': fresh})
+        if pending:
+            self.data.update(pending)
+        self.generation += 1
+        self._stats['full_reloads'] += 1
+
+    # ----- mutations -----
+
+    def set(self, key, value):
+        """Store value under key (dict) or at index (list; index == len appends)"""
+        with self._exclusive():
+            op = {'op': 'set', 'k': key, 'v': value}
+            self._write(op)
+            if isinstance(self.data, list) and key < len(self.data) and self.data[key] is value:
+                return
+            apply_op(self.data, op)
+
+    def append(self, value):
+        """Append value to a list store and return its index"""
+        with self._exclusive():
+            index = len(self.data)
+            self.set(index, value)
+            return index
+
+    def delete(self, key):
+        """Remove key (dict) or index (list) from the store"""
+        with self._exclusive():
+            op = {'op': 'del', 'k': key}
+            self._write(op)
+            apply_op(self.data, op)
+
+    def replace(self, data):
+        """Replace the whole document (use sparingly - persists the full state)"""
+        with self._exclusive():
+            self._write({'op': 'replace', 'v': data})
+            if data is not self.data:
+                apply_op(self.data, {'op': 'replace', 'v': data})
+
+    # ----- write-behind -----
+
+    @property
+    def write_behind(self):
+        return self.flush_interval > 0
+
+    def mark_dirty(self, key, rebase=None):
+        """
+        Record that key changed; persisted now, or on the next flush in write-behind mode.
+
+        ``rebase(value)`` re-applies the change to another process's newer value
+        of the key in place, should one arrive before the flush.
+        """
+        if not self.write_behind:
+            with self._lock:
+                if isinstance(self.data, list) or key in self.data:
+                    self.set(key, self.data[key])
+                else:
+                    self.delete(key)
+            return
+
+        with self._lock:
+            if key in self._dirty:
+                self._stats['coalesced_events'] += 1
+                if self._rebase[key] is not None:
+                    self._rebase[key] = None if rebase is None else self._rebase[key] + [rebase]
+            else:
+                self._dirty[key] = time.monotonic()
+                self._rebase[key] = None if rebase is None else [rebase]
+            self._pending_events += 1
+            pending = self._pending_events
+        if self.flush_max_events and pending >= self.flush_max_events:
+            self._flush_wakeup.set()
+
+    def flush(self):
+        """Persist the current value of every dirty key in one write"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            started = time.monotonic()
+            oldest = min(self._dirty.values())
+            with self._exclusive():
+                self._rebase_pending()
+                ops = []
+                for key in self._dirty:
+                    if isinstance(self.data, list) or key in self.data:
+                        ops.append({'op': 'set', 'k': key, 'v': self.data[key]})
+                    else:
+                        ops.append({'op': 'del', 'k': key})
+                self._write(*ops)
+                self._dirty.clear()
+                self._rebase.clear()
+                self._pending_events = 0
+
+            elapsed_ms = (time.monotonic() - started) * 1000
+            stats = self._stats
+            stats['flush_count'] += 1
+            stats['flushed_keys'] += len(ops)
+            stats['last_flush_at'] = time.time()
+            stats['last_flush_ms'] = round(elapsed_ms, 3)
+            stats['total_flush_ms'] = round(stats['total_flush_ms'] + elapsed_ms, 3)
+            stats['max_flush_ms'] = max(stats['max_flush_ms'], round(elapsed_ms, 3))
+            stats['max_staleness_seconds'] = max(
+                stats['max_staleness_seconds'], round(time.monotonic() - oldest, 3)
+            )
+            return len(ops)
+
+    def _rebase_pending(self):
+        """Re-apply pending changes on top of values other processes wrote for dirty keys"""
+        remote, self._remote = self._remote, {}
+        for key, op in remote.items():
+            changes = self._rebase.get(key)
+            if op['op'] != 'set' or changes is None:
+                self._stats['overwritten_conflicts'] += 1
+                logger.warning(f"{self.name}: overwriting a concurrent change to {key!r}")
+                continue
+            value = op['v']
+            for change in changes:
+                change(value)
+            self.data[key] = value
+            self._stats['rebased_keys'] += 1
+            for listener in self._listeners:
+                listener(key)
+
+    def _flush_loop(self):
+        while True:
+            self._flush_wakeup.wait(self.flush_interval)
+            self._flush_wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush of {self.name} failed: {e}")
+
+    def metrics(self):
+        """Staleness, flush-cost and cross-process sync figures for this store"""
+        with self._lock:
+            oldest = min(self._dirty.values()) if self._dirty else None
+            return {
+                'backend': self.backend,
+                'pid': os.getpid(),
+                'write_behind': self.write_behind,
+                'flush_interval_seconds': self.flush_interval,
+                'flush_max_events': self.flush_max_events,
+                'dirty_keys': len(self._dirty),
+                'pending_events': self._pending_events,
+                'staleness_seconds': round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+                **self._stats,
+            }
+
+    # ----- lifecycle -----
+
+    def needs_compaction(self):
+        return False
+
+    def compact(self):
+        return False
+
+    def close(self):
+        """Flush pending writes, persist a final checkpoint and stop background maintenance"""
+        with _stores_lock:
+            if self in _stores:
+                _stores.remove(self)
+        self.flush()
+        self.compact()
+
+
+class JournaledStore(BaseStore):
+    """Store persisted as a JSON snapshot plus an append-only journal of operations"""
+
+    backend = 'json'
+
+    def __init__(self, path, default=dict, compact_threshold=None, indent=2, ensure_ascii=True,
+                 flush_interval=0, flush_max_events=0, name=None):
+        self.path = Path(path)
+        super().__init__(name or self.path.stem, default, flush_interval, flush_max_events)
+        self.journal_path = self.path.with_name(self.path.name + '.journal')
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        self.compact_threshold = compact_threshold or DEFAULT_COMPACT_THRESHOLD
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+
+        self._lock_file = open(self.lock_path, 'a+')
+        self._journal = None
+        self._journal_ino = None
+        self._offset = 0
+        self._snapshot_sig = None
+        self._journal_entries = 0
+        # CRC32 of the snapshot bytes the journal builds on, and whether the journal on disk predates it
+        self._snapshot_crc = None
+        self._journal_stale = False
+        # Byte length of the journal's complete lines when recovery found a torn tail
+        self._journal_end = None
+
+        with self._lock:
+            self._flock(fcntl.LOCK_SH if fcntl else None)
+            try:
+                self.data = self._recover()
+                self._open_journal()
+            finally:
+                self._flock(fcntl.LOCK_UN if fcntl else None)
+        self._start()
+
+    # ----- locking -----
+
+    def _flock(self, operation):
+        if fcntl and operation is not None:
+            fcntl.flock(self._lock_file.fileno(), operation)
+
+    def _acquire(self):
+        self._flock(fcntl.LOCK_EX if fcntl else None)
+        try:
+            self._catch_up()
+        except Exception:
+            self._flock(fcntl.LOCK_UN if fcntl else None)
+            raise
+
+    def _release(self, ok):
+        self._flock(fcntl.LOCK_UN if fcntl else None)
+
+    # ----- recovery -----
+
+    def _recover(self):
+        """Load the snapshot and replay the journal left behind by the last run"""
+        data = self.default()
+        self._snapshot_crc = None
+        self._journal_stale = False
+        if self.path.exists():
+            try:
+                raw = self.path.read_bytes()
+                self._snapshot_crc = zlib.crc32(raw)
+                data = json.loads(raw.decode('utf-8'))
+            except Exception as e:
+                logger.error(f"Error loading snapshot {self.path}: {e}")
+                data = self.default()
+
+        replayed = 0
+        self._journal_end = None
+        if self.journal_path.exists():
+            raw = self.journal_path.read_bytes()
+            complete = raw.rfind(b'\n') + 1
+            if complete < len(raw):
+                # Torn write at the tail of the journal - it was never acknowledged; the next write cuts it off
+                logger.warning(f"Ignoring truncated journal entry at the end of {self.journal_path}")
+                self._journal_end = complete
+            for line in raw[:complete].splitlines():
+                op = self._parse(line)
+                if op is None:
+                    continue
+                if op.get('op') == 'epoch':
+                    if op.get('snapshot') != self._snapshot_crc:
+                        # Left behind by a compaction that crashed after replacing the snapshot
+                        logger.warning(f"Ignoring journal {self.journal_path} already folded into the snapshot")
+                        self._journal_stale = True
+                        self._journal_end = None
+                        break
+                    continue
+                apply_op(data, op)
+                replayed += 1
+
+        if replayed:
+            logger.info(f"Recovered {replayed} journaled operations for {self.path}")
+        self._journal_entries = replayed
+        return data
+
+    def _parse(self, line):
+        """Decode one journal line; None for blank or unreadable lines, which are skipped"""
+        if not line.strip():
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            logger.error(f"Skipping unreadable journal entry in {self.journal_path}: {line[:80]!r}")
+            self._stats['skipped_journal_entries'] += 1
+            return None
+
+    def _open_journal(self):
+        """(Re)open the append handle and remember which files our state corresponds to"""
+        if self._journal and not self._journal.closed:
+            self._journal.close()
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        st = os.fstat(self._journal.fileno())
+        self._journal_ino = st.st_ino
+        self._offset = st.st_size if self._journal_end is None else self._journal_end
+        self._journal_end = None
+        self._snapshot_sig = self._stat_sig(self.path)
+
+    @staticmethod
+    def _stat_sig(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            return None
+
+    # ----- change detection -----
+
+    def _unchanged(self):
+        """True if nobody else touched the snapshot or journal since we last looked"""
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return False
+        return (
+            st.st_ino == self._journal_ino
+            and st.st_size == self._offset
+            and self._stat_sig(self.path) == self._snapshot_sig
+        )
+
+    def _catch_up(self):
+        """Apply journal entries appended by other processes, or reload after their compaction"""
+        if self._unchanged():
+            return False
+
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            st = None
+
+        if (st is None or st.st_ino != self._journal_ino or st.st_size < self._offset
+                or self._stat_sig(self.path) != self._snapshot_sig):
+            # Snapshot rewritten or journal rotated: start over from disk
+            fresh = self._recover()
+            self._replace_keeping_dirty(fresh)
+            self._open_journal()
+            logger.info(f"Reloaded {self.path} after an external change")
+            return True
+
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(st.st_size - self._offset)
+        complete = chunk.rfind(b'\n') + 1
+        applied = 0
+        for line in chunk[:complete].splitlines():
+            op = self._parse(line)
+            if op is not None and op.get('op') != 'epoch':
+                self._apply_remote(op)
+                applied += 1
+        self._offset += complete
+        self._journal_entries += applied
+        self._stats['synced_changes'] += applied
+        return applied > 0
+
+    def sync(self):
+        """Pull changes made by other processes; two stat calls when nothing changed"""
+        if self._unchanged():
+            return False
+        with self._lock:
+            if self._exclusive_depth:
+                return self._catch_up()
+            self._flock(fcntl.LOCK_SH if fcntl else None)
+            try:
+                return self._catch_up()
+            finally:
+                self._flock(fcntl.LOCK_UN if fcntl else None)
+
+    # ----- persistence -----
+
+    def _dumps(self, obj, **kwargs):
+        return json.dumps(obj, ensure_ascii=self.ensure_ascii, default=json_default, **kwargs)
+
+    def _write(self, *ops):
+        lines = ''.join(self._dumps(op, separators=(',', ':')) + '\n' for op in ops)
+        if self._journal_stale:
+            os.ftruncate(self._journal.fileno(), 0)
+            self._journal_stale = False
+            self._offset = 0
+        elif os.fstat(self._journal.fileno()).st_size != self._offset:
+            # Caught up under the lock, so anything past our offset is a torn write from a crashed process
+            logger.warning(f"Cutting off a torn write at the end of {self.journal_path}")
+            os.ftruncate(self._journal.fileno(), self._offset)
+        if self._offset == 0:
+            lines = self._dumps({'op': 'epoch', 'snapshot': self._snapshot_crc}, separators=(',', ':')) + '\n' + lines
+        self._journal.write(lines)
+        self._journal.flush()
+        if FSYNC_JOURNAL:
+            os.fsync(self._journal.fileno())
+        self._offset = os.fstat(self._journal.fileno()).st_size
+        before = self._journal_entries
+        self._journal_entries += len(ops)
+        if before < self.compact_threshold <= self._journal_entries:
+            request_compaction()
+
+    def metrics(self):
+        metrics = super().metrics()
+        metrics.update({'path': str(self.path), 'journal_entries': self._journal_entries})
+        return metrics
+
+    # ----- compaction -----
+
+    def needs_compaction(self):
+        return self._journal_entries >= self.compact_threshold
+
+    def compact(self):
+        """
+        Fold the journal into a fresh snapshot.
+
+        Runs under the exclusive lock, so no process appends meanwhile. A crash
+        after the snapshot is replaced but before the journal is removed leaves
+        a journal whose epoch no longer matches the snapshot, so it is skipped.
+        """
+        with self._exclusive():
+            if self._journal_entries == 0 and not self._journal_stale:
+                return False
+            payload = self._dumps(self.data, indent=self.indent)
+            atomic_write_text(self.path, payload)
+            self._snapshot_crc = zlib.crc32(payload.encode('utf-8'))
+            self._journal_stale = False
+            self._journal.close()
+            os.unlink(self.journal_path)
+            self._open_journal()
+            self._journal_entries = 0
+            logger.info(f"Compacted {self.path}")
+            return True
+
+    def close(self):
+        """Flush pending writes, write a final snapshot and release the journal handle"""
+        try:
+            super().close()
+        finally:
+            with self._lock:
+                if self._journal and not self._journal.closed:
+                    self._journal.close()
+
+
+class SqliteStore(BaseStore):
+    """
+    Store persisted as one row per key in a WAL-mode SQLite table.
+
+    Table layout: ``key`` (TEXT for dict stores, INTEGER position for list
+    stores), ``value`` (JSON) and one indexed column per entry in
+    ``index_fields``, copied from the record so the data can be queried
+    without loading it. Each write touches only the rows that changed and
+    logs the touched keys in ``_changes`` so other processes can re-read just
+    those rows.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, db_path, name, default=dict, index_fields=(), flush_interval=0, flush_max_events=0):
+        if not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', name):
+            raise ValueError(f"Invalid store name: {name}")
+        super().__init__(name, default, flush_interval, flush_max_events)
+        self.db_path = str(db_path)
+        self.index_fields = tuple(index_fields)
+
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema()
+
+        with self._lock:
+            self.data = self._load()
+            self._last_seq = self._conn.execute(
+                'SELECT COALESCE(MAX(seq), 0) FROM _changes WHERE store = ?', (self.name,)
+            ).fetchone()[0]
+            self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        self._start()
+
+    def _create_schema(self):
+        key_type = 'INTEGER' if self.default is list else 'TEXT'
+        columns = ''.join(f', {field} TEXT' for field in self.index_fields)
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.name} (key {key_type} PRIMARY KEY, value TEXT NOT NULL{columns})'
+        )
+        for field in self.index_fields:
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{self.name}_{field} ON {self.name}({field})')
+        # key NULL means "reload everything" (replace, list delete)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS _changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, store TEXT NOT NULL, key TEXT)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_changes_store_seq ON _changes(store, seq)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS _change_log_pruned (store TEXT PRIMARY KEY, through_seq INTEGER NOT NULL)'
+        )
+
+    def _load(self):
+        rows = self._conn.execute(f'SELECT key, value FROM {self.name} ORDER BY key').fetchall()
+        if self.default is list:
+            return [json.loads(value) for _, value in rows]
+        return {key: json.loads(value) for key, value in rows}
+
+    def _row(self, key, value):
+        extracted = [
+            None if not isinstance(value, dict) or value.get(field) is None else str(value.get(field))
+            for field in self.index_fields
+        ]
+        return (key, json.dumps(value, ensure_ascii=False, default=json_default), *extracted)
+
+    def _upsert_sql(self):
+        columns = ['key', 'value', *self.index_fields]
+        updates = ', '.join(f'{c} = excluded.{c}' for c in columns[1:])
+        placeholders = ', '.join('?' for _ in columns)
+        return (f'INSERT INTO {self.name} ({", ".join(columns)}) VALUES ({placeholders}) '
+                f'ON CONFLICT(key) DO UPDATE SET {updates}')
+
+    # ----- locking -----
+
+    def _acquire(self):
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._catch_up()
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+
+    def _release(self, ok):
+        self._conn.execute('COMMIT' if ok else 'ROLLBACK')
+        if not ok:
+            # Our in-memory state may now be ahead of the database
+            self._replace_keeping_dirty(self._load())
+
+    # ----- change detection -----
+
+    def _catch_up(self):
+        """Re-read the rows other processes changed since our last look"""
+        changes = self._conn.execute(
+            'SELECT seq, key FROM _changes WHERE store = ? AND seq > ? ORDER BY seq', (self.name, self._last_seq)
+        ).fetchall()
+        pruned = self._conn.execute(
+            'SELECT through_seq FROM _change_log_pruned WHERE store = ?', (self.name,)
+        ).fetchone()
+        if not changes and not (pruned and pruned[0] > self._last_seq):
+            return False
+
+        if (pruned and pruned[0] > self._last_seq) or any(key is None for _, key in changes):
+            self._replace_keeping_dirty(self._load())
+        else:
+            keys = list(dict.fromkeys(key for _, key in changes))
+            if self.default is list:
+                keys = sorted(int(k) for k in keys)
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ', '.join('?' for _ in chunk)
+                rows = dict(self._conn.execute(
+                    f'SELECT key, value FROM {self.name} WHERE key IN ({placeholders})', chunk
+                ).fetchall())
+                for key in chunk:
+                    if key in rows:
+                        self._apply_remote({'op': 'set', 'k': key, 'v': json.loads(rows[key])})
+                    else:
+                        self._apply_remote({'op': 'del', 'k': key})
+            self._stats['synced_changes'] += len(keys)
+
+        if changes:
+            self._last_seq = changes[-1][0]
+        return True
+
+    def sync(self):
+        """Pull changes made by other processes; one PRAGMA when nothing changed"""
+        with self._lock:
+            if self._exclusive_depth:
+                return self._catch_up()
+            version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if version == self._data_version:
+                return False
+            self._data_version = version
+            return self._catch_up()
+
+    # ----- persistence -----
+
+    def _write(self, *ops):
+        cursor = self._conn.cursor()
+        changed_keys = []
+        for op in ops:
+            kind = op['op']
+            if kind == 'set':
+                cursor.execute(self._upsert_sql(), self._row(op['k'], op['v']))
+                changed_keys.append(str(op['k']))
+            elif kind == 'del' and self.default is list:
+                # Positions shift after a list delete; rewrite the tail of the list
+                remaining = list(self.data)
+                del remaining[op['k']]
+                cursor.execute(f'DELETE FROM {self.name} WHERE key >= ?', (op['k'],))
+                cursor.executemany(self._upsert_sql(), [
+                    self._row(i, v) for i, v in enumerate(remaining) if i >= op['k']
+                ])
+                changed_keys.append(None)
+            elif kind == 'del':
+                cursor.execute(f'DELETE FROM {self.name} WHERE key = ?', (op['k'],))
+                changed_keys.append(str(op['k']))
+            elif kind == 'replace':
+                items = enumerate(op['v']) if self.default is list else op['v'].items()
+                cursor.execute(f'DELETE FROM {self.name}')
+                cursor.executemany(self._upsert_sql(), [self._row(k, v) for k, v in items])
+                changed_keys.append(None)
+        cursor.executemany(
+            'INSERT INTO _changes (store, key) VALUES (?, ?)', [(self.name, k) for k in changed_keys]
+        )
+        self._last_seq = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+
+    def query(self, field, value):
+        """Records whose indexed ``field`` equals value, answered by the SQLite index"""
+        if field not in self.index_fields:
+            raise ValueError(f"{field} is not an indexed field of {self.name}")
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT value FROM {self.name} WHERE {field} = ? ORDER BY key', (str(value),)
+            ).fetchall()
+        return [json.loads(v) for (v,) in rows]
+
+    def metrics(self):
+        metrics = super().metrics()
+        metrics.update({'path': self.db_path, 'table': self.name, 'rows': len(self.data)})
+        return metrics
+
+    def needs_compaction(self):
+        return True
+
+    def compact(self):
+        """Trim this store's change log and checkpoint the WAL into the main database file"""
+        with self._exclusive():
+            cutoff = self._last_seq - CHANGE_LOG_KEEP
+            if cutoff > 0:
+                deleted = self._conn.execute(
+                    'DELETE FROM _changes WHERE store = ? AND seq <= ?', (self.name, cutoff)
+                ).rowcount
+                if deleted:
+                    self._conn.execute(
+                        'INSERT INTO _change_log_pruned (store, through_seq) VALUES (?, ?) '
+                        'ON CONFLICT(store) DO UPDATE SET through_seq = excluded.through_seq',
+                        (self.name, cutoff)
+                    )
+        with self._lock:
+            self._conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        return True
+
+
+def open_store(name, path, default=dict, **options):
+    """
+    Open the local store ``name`` with the backend selected by STORAGE_BACKEND.
+
+    ``path`` is the JSON snapshot used by the json backend; JSON formatting
+    options (indent, ensure_ascii, compact_threshold) are ignored by sqlite.
+    """
+    if STORAGE_BACKEND == 'sqlite':
+        return SqliteStore(
+            SQLITE_PATH,
+            name,
+            default=default,
+            index_fields=INDEXED_FIELDS.get(name, ()),
+            flush_interval=options.get('flush_interval', 0),
+            flush_max_events=options.get('flush_max_events', 0)
+        )
+    return JournaledStore(path, default=default, name=name, **options)
+
+
+class ShardedStore(MutableMapping):
+    """
+    Dict store split across ``shard_count`` sub-stores by a stable hash of the key.
+
+    Each shard is an ordinary store (``<name>/<name>-NN.json`` or table
+    ``<name>_NN``) opened the first time one of its keys is touched, so a
+    change to one key journals, flushes and compacts only that key's shard.
+    The store itself is the mapping: iteration walks the shards one at a time.
+
+    The shard count is fixed when the store is first created and recorded in
+    ``<name>/manifest.json``; the environment only chooses it for new stores.
+    On first start the unsharded store at ``path`` (if any) is split into shards
+    by one worker, under a lock on ``<name>/manifest.lock``; workers starting
+    at the same time wait for it and then read the manifest it wrote.
+    """
+
+    def __init__(self, name, path, shard_count=16, **options):
+        self.name = name
+        self.path = Path(path)
+        self.shard_dir = self.path.with_name(self.name)
+        self.options = options
+        self._lock = threading.RLock()
+        self._shards = None
+        self._listeners = []
+        self._load_listeners = []
+        self.shard_count = self._load_manifest(shard_count)
+        if self._shards is None:
+            self._shards = [None] * self.shard_count
+
+    # ----- layout -----
+
+    def _load_manifest(self, shard_count):
+        manifest_path = self.shard_dir / 'manifest.json'
+        if manifest_path.exists():
+            return self._read_manifest(manifest_path)
+
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        # Workers starting together must not all split the old file: the first one does, the rest wait for it
+        with open(self.shard_dir / 'manifest.lock', 'a+') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            if manifest_path.exists():
+                return self._read_manifest(manifest_path)
+            self.shard_count = shard_count
+            self._shards = [None] * shard_count
+            self._import_unsharded()
+            atomic_write_text(manifest_path, json.dumps({'shards': shard_count}))
+            return shard_count
+
+    @staticmethod
+    def _read_manifest(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)['shards']
+
+    def _import_unsharded(self):
+        """Split the old single-document store into shards (first start after upgrading)"""
+        if not self.path.exists() and STORAGE_BACKEND != 'sqlite':
+            return
+        legacy = open_store(self.name, self.path, default=dict)
+        try:
+            if not legacy.data:
+                return
+            grouped = [{} for _ in range(self.shard_count)]
+            for key, value in legacy.data.items():
+                grouped[self.shard_index(key)][key] = value
+            for index, data in enumerate(grouped):
+                if data:
+                    self.shard(index).replace(data)
+            logger.info(f"Split {len(legacy.data)} {self.name} records into {self.shard_count} shards")
+        finally:
+            legacy.close()
+
+    def shard_index(self, key):
+        return zlib.crc32(str(key).encode('utf-8')) % self.shard_count
+
+    def shard(self, index):
+        """Open (on first use) and return shard ``index``"""
+        store = self._shards[index]
+        if store is None:
+            opened = ()
+            with self._lock:
+                store = self._shards[index]
+                if store is None:
+                    shard_name = f'{self.name}_{index:02d}'
+                    store = open_store(
+                        shard_name,
+                        self.shard_dir / f'{self.name}-{index:02d}.json',
+                        default=dict,
+                        **self.options
+                    )
+                    for listener in self._listeners:
+                        store.on_change(listener)
+                    self._shards[index] = store
+                    opened = list(self._load_listeners)
+            for listener in opened:
+                listener(store)
+        return store
+
+    def shard_for(self, key):
+        return self.shard(self.shard_index(key))
+
+    def loaded_shards(self):
+        return [s for s in self._shards if s is not None]
+
+    @property
+    def generation(self):
+        """Changes whenever any loaded shard is reloaded wholesale"""
+        return sum(shard.generation for shard in self.loaded_shards())
+
+    def on_change(self, listener):
+        """Call listener(key) for each key another process changed, in any shard"""
+        with self._lock:
+            self._listeners.append(listener)
+            for shard in self.loaded_shards():
+                shard.on_change(listener)
+
+    def on_load(self, listener):
+        """Call listener(shard) for each shard opened from now on and once for every shard already open"""
+        with self._lock:
+            self._load_listeners.append(listener)
+            loaded = self.loaded_shards()
+        for shard in loaded:
+            listener(shard)
+
+    # ----- mapping interface (in-memory; persist with mark_dirty/set) -----
+
+    @property
+    def data(self):
+        return self
+
+    def __getitem__(self, key):
+        return self.shard_for(key).data[key]
+
+    def __setitem__(self, key, value):
+        self.shard_for(key).data[key] = value
+
+    def __delitem__(self, key):
+        del self.shard_for(key).data[key]
+
+    def __contains__(self, key):
+        return key in self.shard_for(key).data
+
+    def __iter__(self):
+        for index in range(self.shard_count):
+            yield from list(self.shard(index).data)
+
+    def __len__(self):
+        return sum(len(self.shard(index).data) for index in range(self.shard_count))
+
+    def items(self):
+        """Stream (key, value) pairs shard by shard"""
+        for index in range(self.shard_count):
+            yield from list(self.shard(index).data.items())
+
+    # ----- persistence -----
+
+    @property
+    def write_behind(self):
+        return self.options.get('flush_interval', 0) > 0
+
+    def exclusive(self, key):
+        """Write lock of the shard holding key, for read-modify-write of that key (see BaseStore.exclusive)"""
+        return self.shard_for(key).exclusive()
+
+    def mark_dirty(self, key, rebase=None):
+        self.shard_for(key).mark_dirty(key, rebase)
+
+    def set(self, key, value):
+        self.shard_for(key).set(key, value)
+
+    def delete(self, key):
+        self.shard_for(key).delete(key)
+
+    def replace(self, data):
+        """Replace the whole document, rewriting every shard"""
+        grouped = [{} for _ in range(self.shard_count)]
+        for key, value in list(data.items()):
+            grouped[self.shard_index(key)][key] = value
+        for index, shard_data in enumerate(grouped):
+            self.shard(index).replace(shard_data)
+
+    def flush(self):
+        return sum(shard.flush() for shard in self.loaded_shards())
+
+    def sync(self):
+        return any([shard.sync() for shard in self.loaded_shards()])
+
+    def metrics(self):
+        """Totals across loaded shards plus each loaded shard's own figures"""
+        shards = {shard.name: shard.metrics() for shard in self.loaded_shards()}
+        totals = {
+            key: sum(m[key] for m in shards.values())
+            for key in ('dirty_keys', 'pending_events', 'flush_count', 'flushed_keys', 'coalesced_events',
+                        'rebased_keys', 'overwritten_conflicts')
+        }
+        return {
+            'backend': STORAGE_BACKEND,
+            'sharded': True,
+            'shard_count': self.shard_count,
+            'loaded_shards': len(shards),
+            'write_behind': self.write_behind,
+            'staleness_seconds': max((m['staleness_seconds'] for m in shards.values()), default=0.0),
+            **totals,
+            'shards': shards,
+        }
+
+    def close(self):
+        for shard in self.loaded_shards():
+            shard.close()
+
+
+def sync_all():
+    """Pull other processes' changes into every open store (call once per request)"""
+    with _stores_lock:
+        stores = list(_stores)
+    for store in stores:
+        try:
+            store.sync()
+        except Exception as e:
+            logger.error(f"Failed to sync store {store.name}: {e}")
+
+
+# ----- background compaction -----
+
+_compactor = None
+_compactor_wakeup = threading.Event()
+
+
+def _compact_loop():
+    while True:
+        _compactor_wakeup.wait(COMPACT_CHECK_INTERVAL)
+        _compactor_wakeup.clear()
+        with _stores_lock:
+            stores = list(_stores)
+        for store in stores:
+            if store.needs_compaction():
+                try:
+                    store.compact()
+                except Exception as e:
+                    logger.error(f"Background compaction of {store.name} failed: {e}")
+
+
+def _ensure_compactor():
+    global _compactor
+    with _stores_lock:
+        if _compactor is None or not _compactor.is_alive():
+            _compactor = threading.Thread(target=_compact_loop, name='storage-compactor', daemon=True)
+            _compactor.start()
+
+
+def request_compaction():
+    """Wake the background compactor now instead of waiting for the next interval"""
+    _compactor_wakeup.set()
+
+
+@atexit.register
+def close_all():
+    """Flush and checkpoint every open store on interpreter shutdown"""
+    with _stores_lock:
+        stores = list(_stores)
+    for store in stores:
+        try:
+            store.close()
+        except Exception as e:
+            logger.error(f"Failed to close store {store.name}: {e}")
@@ -0,0 +1,62 @@
+"""
+Batched Supabase Reads
+
+Helpers that replace one-query-per-item loops (N+1) with a few chunked
+``in_()`` queries. Chunks keep the request URL well under PostgREST limits,
+and each chunk is paged with ``range()`` in case it holds more rows than the
+server returns per response.
+"""
+
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Values per in_() filter (36-char UUIDs -> ~4 KB of query string)
+IN_CHUNK_SIZE = 100
+
+# Rows per response; PostgREST's default max-rows is 1000
+PAGE_SIZE = 1000
+
+
+def chunked(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def fetch_in(client, table, columns, column, values, filters=None, chunk_size=IN_CHUNK_SIZE, page_size=PAGE_SIZE):
+    """
+    Select ``columns`` from ``table`` where ``column`` is in ``values`` (plus
+    optional equality ``filters``), in as few round-trips as chunking allows.
+
+    Returns (rows, failed_values). A chunk whose query fails is logged and its
+    values are reported in failed_values so the caller can fall back for them.
+    """
+    values = list(dict.fromkeys(v for v in values if v is not None))
+    rows = []
+    failed = []
+    for chunk in chunked(values, chunk_size):
+        try:
+            offset = 0
+            while True:
+                query = client.table(table).select(columns)
+                for key, value in (filters or {}).items():
+                    query = query.eq(key, value)
+                response = query.in_(column, chunk).order(column).range(offset, offset + page_size - 1).execute()
+                page = response.data or []
+                rows.extend(page)
+                if len(page) < page_size:
+                    break
+                offset += page_size
+        except Exception as e:
+            logger.warning(f"Batched {table} query failed for {len(chunk)} values: {e}")
+            failed.extend(chunk)
+    return rows, failed
+
+
+def group_by(rows, key):
+    """{row[key]: [rows...]} preserving row order"""
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row.get(key)].append(row)
+    return grouped
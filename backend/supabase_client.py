@@ -0,0 +1,265 @@
+"""
+Supabase Client Factory
+
+``create_supabase_client()`` builds supabase-py clients whose PostgREST
+sessions all share one pooled HTTP transport. Keep-alive connections are
+reused across the anon and admin clients (and across the sessions
+supabase-py re-creates after auth events), and the pool size, keep-alive
+and timeouts come from the environment:
+
+    SUPABASE_HTTP_MAX_CONNECTIONS    connections in the pool (default 20)
+    SUPABASE_HTTP_MAX_KEEPALIVE      idle keep-alive connections kept (default 10)
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY   seconds an idle connection is kept (default 30)
+    SUPABASE_HTTP_CONNECT_TIMEOUT    seconds to connect (default 5)
+    SUPABASE_HTTP_TIMEOUT            seconds to wait for a response (default 10)
+    SUPABASE_HTTP_POOL_TIMEOUT       seconds to wait for a free connection (default 5)
+    SUPABASE_HTTP2                   use HTTP/2 (default 1)
+
+``InstrumentedClient`` wraps a client so every executed table or rpc query
+records its latency in a per-table, per-operation histogram, along with
+error counts:
+
+    supabase = InstrumentedClient(create_supabase_client(url, key), supabase_metrics)
+    supabase.table('tasks').select('*').execute()   # recorded as tasks/select
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import httpx
+
+try:
+    from postgrest import SyncPostgrestClient
+    from postgrest.exceptions import APIError
+    from postgrest.utils import SyncClient as PostgrestSession
+    from supabase import Client
+except ImportError:  # supabase not installed
+    Client = SyncPostgrestClient = PostgrestSession = None
+    APIError = ()
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_HTTP_MAX_CONNECTIONS = int(os.getenv('SUPABASE_HTTP_MAX_CONNECTIONS', '20'))
+SUPABASE_HTTP_MAX_KEEPALIVE = int(os.getenv('SUPABASE_HTTP_MAX_KEEPALIVE', '10'))
+SUPABASE_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_HTTP_KEEPALIVE_EXPIRY', '30'))
+SUPABASE_HTTP_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_HTTP_CONNECT_TIMEOUT', '5'))
+SUPABASE_HTTP_TIMEOUT = float(os.getenv('SUPABASE_HTTP_TIMEOUT', '10'))
+SUPABASE_HTTP_POOL_TIMEOUT = float(os.getenv('SUPABASE_HTTP_POOL_TIMEOUT', '5'))
+SUPABASE_HTTP2 = os.getenv('SUPABASE_HTTP2', '1').lower() in ('1', 'true', 'yes')
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Query builder methods that decide which operation a query performs
+OPERATIONS = ('select', 'insert', 'upsert', 'update', 'delete')
+
+
+class SharedTransport(httpx.HTTPTransport):
+    """Connection pool shared by every client; closing one client must not close it"""
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def shared_transport():
+    """The process-wide pooled transport, created on first use"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = SharedTransport(
+                http2=SUPABASE_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=SUPABASE_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=SUPABASE_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+            atexit.register(_transport.shutdown)
+        return _transport
+
+
+def http_timeout():
+    return httpx.Timeout(
+        SUPABASE_HTTP_TIMEOUT,
+        connect=SUPABASE_HTTP_CONNECT_TIMEOUT,
+        pool=SUPABASE_HTTP_POOL_TIMEOUT,
+    )
+
+
+def pool_config():
+    """Effective transport settings, for metrics"""
+    return {
+        'max_connections': SUPABASE_HTTP_MAX_CONNECTIONS,
+        'max_keepalive_connections': SUPABASE_HTTP_MAX_KEEPALIVE,
+        'keepalive_expiry_seconds': SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+        'connect_timeout_seconds': SUPABASE_HTTP_CONNECT_TIMEOUT,
+        'timeout_seconds': SUPABASE_HTTP_TIMEOUT,
+        'pool_timeout_seconds': SUPABASE_HTTP_POOL_TIMEOUT,
+        'http2': SUPABASE_HTTP2,
+    }
+
+
+if Client is not None:
+    class PooledPostgrestClient(SyncPostgrestClient):
+        """PostgREST client whose session uses the shared transport and timeouts"""
+
+        def create_session(self, base_url, headers, timeout, verify=True):
+            return PostgrestSession(
+                base_url=base_url,
+                headers=headers,
+                timeout=http_timeout(),
+                transport=shared_transport(),
+                follow_redirects=True,
+            )
+
+    class PooledClient(Client):
+        """supabase-py client that builds PooledPostgrestClient sessions"""
+
+        @staticmethod
+        def _init_postgrest_client(rest_url, headers, schema, timeout=None, verify=True):
+            return PooledPostgrestClient(rest_url, headers=headers, schema=schema, verify=verify)
+
+
+def create_supabase_client(url, key):
+    """create_client() replacement using the shared connection pool"""
+    if Client is None:
+        raise RuntimeError('supabase is not installed')
+    return PooledClient(url, key)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with call and error counters"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.api_errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_error = None
+
+    def record(self, elapsed_ms, error=None):
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if error is not None:
+            if isinstance(error, APIError):
+                self.api_errors += 1
+            else:
+                self.errors += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (max_ms for the open bucket)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= target:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 2)
+        return round(self.max_ms, 2)
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'api_errors': self.api_errors,
+            'last_error': self.last_error,
+            'avg_ms': round(self.total_ms / self.count, 2) if self.count else None,
+            'max_ms': round(self.max_ms, 2),
+            'p50_ms': self.quantile(0.50),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': {
+                **{f'le_{bound}ms': count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                f'gt_{LATENCY_BUCKETS_MS[-1]}ms': self.buckets[-1],
+            },
+        }
+
+
+class SupabaseMetrics:
+    """Latency histograms keyed by (table, operation)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, table, operation, elapsed_ms, error=None):
+        with self._lock:
+            histogram = self._histograms.get((table, operation))
+            if histogram is None:
+                histogram = self._histograms[(table, operation)] = LatencyHistogram()
+            histogram.record(elapsed_ms, error)
+
+    def snapshot(self):
+        """{table: {operation: histogram}}"""
+        with self._lock:
+            tables = {}
+            for (table, operation), histogram in sorted(self._histograms.items()):
+                tables.setdefault(table, {})[operation] = histogram.snapshot()
+            return tables
+
+
+class _InstrumentedQuery:
+    """Proxies a postgrest query builder; execute() is timed and recorded"""
+
+    def __init__(self, query, metrics, table, operation):
+        self._query = query
+        self._metrics = metrics
+        self._table = table
+        self._operation = operation
+
+    def execute(self):
+        started = time.perf_counter()
+        try:
+            result = self._query.execute()
+        except Exception as e:
+            self._metrics.record(self._table, self._operation, (time.perf_counter() - started) * 1000, e)
+            raise
+        self._metrics.record(self._table, self._operation, (time.perf_counter() - started) * 1000)
+        return result
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+        operation = name if name in OPERATIONS else self._operation
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, 'execute'):
+                return _InstrumentedQuery(result, self._metrics, self._table, operation)
+            return result
+        return chained
+
+
+class InstrumentedClient:
+    """Supabase client whose table()/rpc() queries are recorded in SupabaseMetrics"""
+
+    def __init__(self, client, metrics):
+        self._client = client
+        self.metrics = metrics
+
+    def table(self, name):
+        return _InstrumentedQuery(self._client.table(name), self.metrics, name, 'query')
+
+    def rpc(self, fn, params=None):
+        return _InstrumentedQuery(self._client.rpc(fn, params or {}), self.metrics, f'rpc:{fn}', 'rpc')
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
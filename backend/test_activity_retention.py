@@ -0,0 +1,89 @@
+import time
+
+from activity_retention import ActivityCompactor, compact_activity, daily_rollups, session_count
+from activity_summary_store import ActivitySummaryRepository
+from page_analytics import top_pages
+from storage import ShardedStore
+
+
+def record(sessions, visits):
+    return {
+        'user_name': 'Ann', 'total_session_time': sum(60 for _ in range(sessions)), 'total_active_time': 0,
+        'sessions': [
+            {'started_at': f'2026-03-{1 + i % 3:02d}T10:00:00', 'duration_seconds': 60, 'active_time_seconds': 30,
+             'pages_visited': [{'page_path': '/tasks'}]}
+            for i in range(sessions)
+        ],
+        'page_visits': [
+            {'page_path': f'/p{i % 2}', 'duration_seconds': 10, 'started_at': '2026-03-01T10:00:00'}
+            for i in range(visits)
+        ],
+        'submissions': [],
+    }
+
+
+def test_compaction_keeps_the_newest_entries_and_exact_totals():
+    activity = record(sessions=10, visits=7)
+    before = top_pages(activity, 10)
+    newest_session = activity['sessions'][-1]
+
+    assert compact_activity(activity, keep_sessions=4, keep_page_visits=3) == 6 + 4
+    assert len(activity['sessions']) == 4 and activity['sessions'][-1] is newest_session
+    assert len(activity['page_visits']) == 3
+    assert session_count(activity) == 10
+    assert top_pages(activity, 10) == before
+
+    days = {row['day']: row for row in daily_rollups(activity)}
+    assert sum(row['sessions'] for row in days.values()) == 6
+    assert sum(row['time_seconds'] for row in days.values()) == 360
+    assert days['2026-03-01']['pages']['/p0'] == {'visits': 2, 'seconds': 20}
+    assert compact_activity(activity, keep_sessions=4, keep_page_visits=3) == 0
+
+
+def test_compactor_persists_compacted_records(tmp_path):
+    path = tmp_path / 'user_activity.json'
+    store = ShardedStore('user_activity', path, shard_count=2)
+    store.set('u1', record(sessions=5, visits=1))
+    store.set('u2', record(sessions=1, visits=1))
+    summaries = ActivitySummaryRepository(store)
+
+    compactor = ActivityCompactor(store, keep_sessions=2, keep_page_visits=5)
+    # u2 has nothing to roll up but gets its page counters backfilled
+    assert sorted(compactor.run_once()) == ['u1', 'u2']
+    assert compactor.run_once() == []
+    store.flush()
+
+    reopened = ShardedStore('user_activity', path, shard_count=2)
+    assert len(reopened.data['u1']['sessions']) == 2
+    assert session_count(reopened.data['u1']) == 5
+    rows, _ = summaries.page('user_name')
+    assert sorted(r['total_sessions'] for r in rows) == [1, 5]
+    assert compactor.stats()['entries_rolled_up'] == 3
+
+
+def test_compactor_leaves_unloaded_shards_on_disk(tmp_path):
+    path = tmp_path / 'user_activity.json'
+    ShardedStore('user_activity', path, shard_count=4).set('u1', record(sessions=5, visits=1))
+
+    store = ShardedStore('user_activity', path, shard_count=4)
+    compactor = ActivityCompactor(store, keep_sessions=2, keep_page_visits=5)
+    assert compactor.run_once() == []
+    assert store.loaded_shards() == []
+
+    assert len(store['u1']['sessions']) == 5
+    assert compactor.run_once() == ['u1']
+    assert store.loaded_shards() == [store.shard_for('u1')]
+
+
+def test_compactor_compacts_shards_as_they_load(tmp_path):
+    path = tmp_path / 'user_activity.json'
+    ShardedStore('user_activity', path, shard_count=4).set('u1', record(sessions=5, visits=1))
+
+    store = ShardedStore('user_activity', path, shard_count=4)
+    compactor = ActivityCompactor(store, keep_sessions=2, keep_page_visits=5, interval=3600).start()
+    store.shard_for('u1')  # first request touching u1, long after startup
+
+    deadline = time.monotonic() + 5
+    while compactor.stats()['records_compacted'] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(store['u1']['sessions']) == 2
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+
+from activity_rollups import ActivityRollups
+from storage import open_store
+
+
+def at(day, hour):
+    return datetime(2026, 3, day, hour, 30, tzinfo=timezone.utc)
+
+
+def test_rollups_merge_across_processes_and_build_series(tmp_path):
+    path = tmp_path / 'activity_rollups.json'
+    worker_a = ActivityRollups(open_store('activity_rollups', path, default=dict))
+    worker_b = ActivityRollups(open_store('activity_rollups', path, default=dict))
+
+    worker_a.record('u1', at=at(1, 9), sessions_started=1)
+    worker_a.record('u1', at=at(1, 10), sessions_ended=1, session_seconds=100, active_seconds=60)
+    worker_b.record('u2', at=at(1, 10), page_views=1)
+    worker_b.record('u2', at=at(3, 8), sessions_ended=1, session_seconds=50)
+    assert worker_a.flush() == 3 and worker_b.flush() == 4
+
+    start, end = datetime(2026, 3, 1, tzinfo=timezone.utc), datetime(2026, 3, 3, tzinfo=timezone.utc)
+    result = worker_a.series('day', start, end)
+    assert result['buckets'] == ['2026-03-01', '2026-03-02', '2026-03-03']
+    assert result['series']['active_users'] == [2, 0, 1]
+    assert result['series']['events'] == [3, 0, 1]
+    assert result['series']['avg_session_seconds'] == [100.0, 0.0, 50.0]
+    assert result['totals']['sessions_ended'] == 2 and result['totals']['unique_users'] == 2
+    assert result['totals']['avg_session_seconds'] == 75.0
+    assert result['peak'] == {'bucket': '2026-03-01', 'active_users': 2}
+
+    hourly = worker_b.series('hour', at(1, 9), at(1, 11))
+    assert hourly['buckets'] == ['2026-03-01T09', '2026-03-01T10', '2026-03-01T11']
+    assert hourly['series']['active_users'] == [1, 2, 0]
+    assert hourly['series']['page_views'] == [0, 1, 0]
+
+
+def test_bucket_rows_keep_a_fixed_size_user_sketch(tmp_path):
+    rollups = ActivityRollups(open_store('activity_rollups', tmp_path / 'activity_rollups.json', default=dict))
+    rollups.record('u1', at=at(1, 9))
+    rollups.record('u2', at=at(1, 9))
+    rollups.flush()
+    row = rollups.store.data['day:2026-03-01']
+    assert row['active_users'] == 2
+    size = len(row['users_hll'])
+
+    for i in range(2000):
+        rollups.record(f'user-{i}', at=at(1, 10))
+    rollups.flush()
+    row = rollups.store.data['day:2026-03-01']
+    assert len(row['users_hll']) == size
+    assert abs(row['active_users'] - 2002) < 2002 * 0.1
+
+    result = rollups.series('day', datetime(2026, 3, 1, tzinfo=timezone.utc), datetime(2026, 3, 2, tzinfo=timezone.utc))
+    assert result['series']['active_users'] == [row['active_users'], 0]
+    assert result['totals']['unique_users'] == row['active_users']
+
+
+def test_hourly_buckets_past_the_retention_window_are_pruned(tmp_path):
+    rollups = ActivityRollups(open_store('activity_rollups', tmp_path / 'activity_rollups.json', default=dict),
+                              hourly_retention_days=2)
+    for day in (1, 2, 3, 4):
+        rollups.record('u1', at=at(day, 9))
+    rollups.flush()
+
+    assert rollups.prune(now=at(4, 10)) == 2
+    assert sorted(rollups.store.data) == [
+        'day:2026-03-01', 'day:2026-03-02', 'day:2026-03-03', 'day:2026-03-04',
+        'hour:2026-03-03T09', 'hour:2026-03-04T09',
+    ]
@@ -0,0 +1,98 @@
+import time
+
+from activity_summary_store import ActivitySummaryRepository
+from storage import ShardedStore
+
+
+def activity(last_seen, sessions=0, total=0, submissions=0, heartbeat=None, name='User'):
+    current = None
+    if heartbeat is not None:
+        current = {'duration_seconds': 30, 'active_time_seconds': 20, 'is_active': True,
+                   'last_heartbeat': heartbeat, 'current_page': '/tasks'}
+    return {'user_name': name, 'user_email': f'{name.lower()}@example.com', 'first_seen': last_seen,
+            'last_seen': last_seen, 'total_session_time': total, 'total_active_time': 0,
+            'sessions': [{}] * sessions, 'submissions': [{}] * submissions, 'current_session': current}
+
+
+def test_summaries_follow_updates_and_report_online_users(tmp_path):
+    store = ShardedStore('user_activity', tmp_path / 'user_activity.json', shard_count=4)
+    now = time.time()
+    recent = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now - 10))
+    store.set('u1', activity('2026-01-01T10:00:00', sessions=2, total=100, heartbeat=recent, name='Ann'))
+    store.set('u2', activity('2026-01-02T10:00:00', sessions=1, total=50, heartbeat='2020-01-01T00:00:00', name='Bob'))
+    summaries = ActivitySummaryRepository(store)
+
+    assert summaries.stats(now) == {'total_users': 2, 'active_users': 1, 'total_time_all_users': 210}
+
+    store.data['u2']['submissions'].append({})
+    store.data['u2']['total_session_time'] = 80
+    summaries.update('u2')
+    rows, total = summaries.page('submissions_count', now=now)
+    assert total == 2
+    assert [(r['user_id'], r['submissions_count'], r['is_currently_active']) for r in rows] == [
+        ('u2', 1, False), ('u1', 0, True)]
+    assert summaries.stats(now)['total_time_all_users'] == 240
+
+
+def test_server_side_paging_sorting_and_filters(tmp_path):
+    store = ShardedStore('user_activity', tmp_path / 'user_activity.json', shard_count=4)
+    for i in range(25):
+        store.set(f'u{i:02d}', activity(f'2026-01-01T10:{i:02d}:00', sessions=i % 5, name=f'N{i:02d}'))
+    summaries = ActivitySummaryRepository(store)
+
+    everything, total = summaries.page('last_seen')
+    page, _ = summaries.page('last_seen', offset=10, limit=10)
+    assert total == 25 and page == everything[10:20]
+    assert page[0]['user_id'] == 'u14'
+
+    oldest, _ = summaries.page('last_seen', descending=False, limit=3)
+    assert [r['user_id'] for r in oldest] == ['u00', 'u01', 'u02']
+
+    found, total = summaries.page(search='n1', limit=50)
+    assert total == 10
+    offline, total = summaries.page(status='online')
+    assert (offline, total) == ([], 0)
+
+
+def test_refresh_picks_up_other_processes(tmp_path):
+    path = tmp_path / 'user_activity.json'
+    store = ShardedStore('user_activity', path, shard_count=4)
+    summaries = ActivitySummaryRepository(store)
+    assert summaries.stats()['total_users'] == 0
+
+    other = ShardedStore('user_activity', path, shard_count=4)
+    other.set('remote', activity('2026-01-01T10:00:00', total=5))
+    store.sync()
+    summaries.refresh()
+    assert summaries.stats()['total_users'] == 1
+    store.close()
+    other.close()
+
+
+def test_recent_submissions_merge_pages_and_filters(tmp_path):
+    store = ShardedStore('user_activity', tmp_path / 'user_activity.json', shard_count=4)
+    expected = []
+    for u in range(6):
+        record = activity('2026-01-01T10:00:00', name=f'N{u}')
+        # newest first, as submit_quiz inserts them; u0 and u1 share timestamps
+        record['submissions'] = [
+            {'type': 'quiz', 'simulation_id': i % 2, 'timestamp': f'2026-01-01T{10 + i:02d}:{0 if u < 2 else u:02d}:00'}
+            for i in reversed(range(u * 3))
+        ]
+        store.set(f'u{u}', record)
+        expected += [(s['timestamp'], f'u{u}') for s in record['submissions']]
+    summaries = ActivitySummaryRepository(store)
+    assert summaries.total_submissions() == len(expected)
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor = summaries.recent_submissions(limit=4, cursor=cursor)
+        seen += [(r['timestamp'], r['user_id']) for r in rows]
+        assert rows and rows[0]['user_name'].startswith('N')
+        if cursor is None:
+            break
+    assert sorted(seen, reverse=True) == seen and sorted(seen) == sorted(expected)
+
+    rows, _ = summaries.recent_submissions(limit=100, simulation_id='1', cursor='2026-01-01T12:00:00')
+    assert rows and all(r['simulation_id'] == 1 and r['timestamp'] < '2026-01-01T12:00:00' for r in rows)
+    assert summaries.recent_submissions(submission_type='task')[0] == []
@@ -0,0 +1,93 @@
+import importlib
+import json
+
+import pytest
+from flask import Flask
+from postgrest.exceptions import APIError
+
+TEXT = '<p>Long enough text</p>'
+
+
+class FakeInsert:
+    def __init__(self, client, table, rows):
+        self.client, self.table, self.rows = client, table, rows
+
+    def execute(self):
+        self.client.requests.append((self.table, len(self.rows)))
+        if any(row.get('title') == 'rejected' for row in self.rows):
+            raise APIError({'message': 'violates check constraint'})
+        stored = self.client.tables.setdefault(self.table, [])
+        inserted = []
+        for row in self.rows:
+            inserted.append({**row, 'id': len(stored) + 1})
+            stored.append(inserted[-1])
+        return type('Response', (), {'data': inserted})()
+
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client, self.name = client, name
+
+    def insert(self, rows):
+        return FakeInsert(self.client, self.name, rows)
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        self.requests = []
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def simulation(title, tasks=2):
+    task = {'title': 't', 'full_title': 'Task', 'duration': '1h', 'difficulty': 'easy',
+            'description': TEXT, 'what_youll_learn': TEXT, 'what_youll_do': TEXT}
+    return {'title': title, 'category': 'Finance', 'difficulty': 'easy', 'duration': '2h',
+            'description': TEXT, 'overview': TEXT, 'features': TEXT, 'skills': TEXT,
+            'tasks': [task] * tasks}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    internship_api = importlib.import_module('internship_api')
+    # Local fallback stores in tmp_path; the module's own catalog is restored afterwards
+    monkeypatch.setattr(internship_api, '_local_catalog', None)
+    catalog = internship_api.init_local_catalog(tmp_path)
+    app = Flask(__name__)
+    app.config['supabase'] = app.config['supabase_admin'] = FakeSupabase()
+    app.register_blueprint(internship_api.internship_bp)
+    yield app
+    catalog.close()
+
+
+def test_bulk_import_reports_per_item_results_with_chunked_inserts(client):
+    items = [simulation('A'), {'title': 'missing fields'}, simulation('rejected'), simulation('B', tasks=3)]
+    response = client.test_client().post('/admin/internships/bulk', json=items)
+    body = response.get_json()
+
+    assert response.status_code == 207
+    assert (body['created'], body['invalid'], body['failed']) == (2, 1, 1)
+    statuses = [r['status'] for r in body['results']]
+    assert statuses == ['created', 'invalid', 'failed', 'created']
+    assert body['results'][1]['error'].startswith('Missing required field')
+    assert body['results'][3]['task_count'] == 3 and body['results'][3]['tasks'] == 'inserted'
+
+    supabase = client.config['supabase']
+    tasks = supabase.tables['tasks']
+    assert len(tasks) == 5
+    assert {t['simulation_id'] for t in tasks} == {r['id'] for r in body['results'] if r['status'] == 'created'}
+    # one rejected chunk retried row by row, then a single insert for every task
+    assert supabase.requests == [('simulations', 3), ('simulations', 1), ('simulations', 1),
+                                 ('simulations', 1), ('tasks', 5)]
+
+
+def test_bulk_import_accepts_ndjson(client):
+    lines = [json.dumps(simulation('A', tasks=0)), '', '{not json', json.dumps(simulation('B', tasks=1))]
+    response = client.test_client().post('/admin/internships/bulk', data='\n'.join(lines),
+                                         content_type='application/x-ndjson')
+    body = response.get_json()
+    assert response.status_code == 207
+    assert [r['status'] for r in body['results']] == ['created', 'invalid', 'created']
+    assert body['results'][1]['error'].startswith('Line 3: invalid JSON')
@@ -0,0 +1,84 @@
+import importlib
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def CatalogCache():
+    return importlib.import_module('internship_api').CatalogCache
+
+
+def test_read_through_with_ttl_and_invalidation(CatalogCache):
+    cache = CatalogCache(ttl=60)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return ['sim']
+
+    assert cache.get_or_load('simulations', loader) == ['sim']
+    assert cache.get_or_load('simulations', loader) == ['sim']
+    assert len(loads) == 1
+
+    cache.invalidate('simulations')
+    cache.get_or_load('simulations', loader)
+    assert len(loads) == 2
+
+    stats = cache.stats()['keys']['simulations']
+    assert (stats['hits'], stats['misses'], stats['invalidations']) == (1, 2, 1)
+
+    expired = CatalogCache(ttl=0)
+    expired.get_or_load('k', loader)
+    expired.get_or_load('k', loader)
+    assert len(loads) == 4
+
+
+def test_none_is_not_cached_and_concurrent_misses_load_once(CatalogCache):
+    cache = CatalogCache(ttl=60)
+    assert cache.get_or_load('tasks:1', lambda: None) is None
+    assert cache.stats()['keys']['tasks:1']['cached'] is False
+
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return [1]
+
+    threads = [threading.Thread(target=cache.get_or_load, args=('tasks:2', slow)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+
+
+def test_catalog_routes_answer_304_for_matching_etag(tmp_path, monkeypatch):
+    from flask import Flask
+    internship_api = importlib.import_module('internship_api')
+    # Local fallback stores in tmp_path; the module's own catalog is restored afterwards
+    monkeypatch.setattr(internship_api, '_local_catalog', None)
+    catalog = internship_api.init_local_catalog(tmp_path)
+
+    app = Flask(__name__)
+    app.config['supabase'] = None
+    app.register_blueprint(internship_api.internship_bp)
+    client = app.test_client()
+
+    first = client.get('/admin/internships')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    etag = first.headers['ETag']
+
+    again = client.get('/admin/internships', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+    catalog.simulations_store.append({'id': 1, 'title': 'New'})
+    changed = client.get('/admin/internships', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert (tmp_path / 'simulations.json.journal').exists()
+    catalog.close()
@@ -0,0 +1,52 @@
+from catalog_store import LocalCatalog
+from storage import open_store
+
+
+def open_catalog(tmp_path):
+    return LocalCatalog(
+        open_store('simulations', tmp_path / 'simulations.json', default=list),
+        open_store('tasks', tmp_path / 'tasks.json', default=list),
+        open_store('catalog_ids', tmp_path / 'catalog_ids.json', default=dict),
+    )
+
+
+def test_tasks_indexed_by_simulation_in_sequence_order(tmp_path):
+    catalog = open_catalog(tmp_path)
+    [simulation] = catalog.add_simulations([{'title': 'A'}])
+    catalog.add_tasks([{'simulation_id': simulation['id'], 'sequence': 2},
+                       {'simulation_id': 99, 'sequence': 1},
+                       {'simulation_id': simulation['id'], 'sequence': 1}])
+
+    assert catalog.get_simulation(str(simulation['id']))['title'] == 'A'
+    assert [t['sequence'] for t in catalog.tasks_for(simulation['id'])] == [1, 2]
+    assert catalog.tasks_for('missing') == []
+
+
+def test_ids_are_never_reused_after_deletion(tmp_path):
+    catalog = open_catalog(tmp_path)
+    catalog.simulations_store.append({'id': 7, 'title': 'legacy'})
+    catalog.refresh()
+
+    first, second = catalog.add_simulations([{'title': 'B'}, {'title': 'C'}])
+    assert (first['id'], second['id']) == (8, 9)
+
+    catalog.simulations_store.delete(len(catalog.simulations_store.data) - 1)
+    catalog.refresh()
+    assert catalog.get_simulation(9) is None
+    assert catalog.add_simulations([{'title': 'D'}])[0]['id'] == 10
+
+
+def test_refresh_sees_rows_written_by_another_instance(tmp_path):
+    catalog = open_catalog(tmp_path)
+    other = open_catalog(tmp_path)
+    changes = []
+    catalog.on_change(lambda: changes.append(1))
+
+    [simulation] = other.add_simulations([{'title': 'remote'}])
+    other.add_tasks([{'simulation_id': simulation['id'], 'sequence': 1}])
+    catalog.refresh()
+
+    assert catalog.get_simulation(simulation['id'])['title'] == 'remote'
+    assert len(catalog.tasks_for(simulation['id'])) == 1
+    assert changes
+    assert catalog.add_simulations([{'title': 'local'}])[0]['id'] == simulation['id'] + 1
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, GuardedClient
+
+
+class FlakyQuery:
+    def __init__(self, client):
+        self.client = client
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def execute(self):
+        self.client.calls += 1
+        if self.client.down:
+            raise ConnectionError('connection refused')
+        return 'rows'
+
+
+class FlakyClient:
+    def __init__(self):
+        self.down = True
+        self.calls = 0
+
+    def table(self, name):
+        return FlakyQuery(self)
+
+
+def test_opens_after_consecutive_failures_then_probes_half_open():
+    raw = FlakyClient()
+    breaker = CircuitBreaker('supabase', failure_threshold=3, reset_timeout=0.05)
+    client = GuardedClient(raw, breaker)
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            client.table('tasks').select('*').eq('id', 1).execute()
+    assert breaker.state == 'open'
+
+    # Open: rejected without touching the client
+    with pytest.raises(CircuitOpenError):
+        client.table('tasks').select('*').execute()
+    assert raw.calls == 3
+
+    time.sleep(0.06)
+    assert breaker.state == 'half_open'
+    with pytest.raises(ConnectionError):
+        client.table('tasks').select('*').execute()  # failed probe re-opens
+    assert breaker.state == 'open'
+
+    time.sleep(0.06)
+    raw.down = False
+    assert client.table('tasks').select('*').execute() == 'rows'
+    assert breaker.snapshot()['state'] == 'closed'
+    assert breaker.snapshot()['rejected'] == 1
+
+
+def test_unguarded_client_reaches_supabase_while_open():
+    raw = FlakyClient()
+    breaker = CircuitBreaker('supabase', failure_threshold=1, reset_timeout=60)
+    client = GuardedClient(raw, breaker)
+    with pytest.raises(ConnectionError):
+        client.table('tasks').select('*').execute()
+    assert breaker.state == 'open'
+
+    raw.down = False
+    assert client.unguarded.table('tasks').select('*').execute() == 'rows'
+    assert breaker.state == 'open'
@@ -0,0 +1,62 @@
+from storage import JournaledStore
+from enrollment_store import EnrollmentRepository
+
+
+def test_indexes_follow_inserts_and_task_updates(tmp_path):
+    store = JournaledStore(tmp_path / 'enrollments.json', default=list)
+    repo = EnrollmentRepository(store)
+    repo.add({'user_id': 'u1', 'internship_id': '7', 'tasks': [{'task_id': 't1', 'completed': False}]})
+    repo.add({'user_id': 'u2', 'internship_id': '7', 'tasks': []})
+    repo.add({'user_id': 'u1', 'internship_id': '8', 'tasks': []})
+
+    assert repo.is_enrolled('u1', 7)
+    assert not repo.is_enrolled('u2', '8')
+    assert [e['user_id'] for e in repo.for_internship('7')] == ['u1', 'u2']
+    assert [e['internship_id'] for e in repo.for_user('u1')] == ['7', '8']
+
+    assert repo.complete_task('u1', '7', 't1')
+    assert not repo.complete_task('u1', '7', 'missing')
+
+    reopened = EnrollmentRepository(JournaledStore(tmp_path / 'enrollments.json', default=list))
+    assert reopened.get('u1', '7')['tasks'][0]['completed'] is True
+
+
+def test_refresh_picks_up_external_file_changes(tmp_path):
+    path = tmp_path / 'enrollments.json'
+    repo = EnrollmentRepository(JournaledStore(path, default=list))
+    repo.add({'user_id': 'u1', 'internship_id': '7'})
+    repo.store.compact()
+
+    # Someone edits the snapshot by hand while the server is running
+    path.write_text('[{"user_id": "u1", "internship_id": "7"}, {"user_id": "u1", "internship_id": "9"}]')
+
+    repo.refresh()
+    assert [e['internship_id'] for e in repo.for_user('u1')] == ['7', '9']
+
+
+def test_refresh_indexes_enrollments_added_by_another_worker(tmp_path):
+    path = tmp_path / 'enrollments.json'
+    mine = EnrollmentRepository(JournaledStore(path, default=list))
+    other = EnrollmentRepository(JournaledStore(path, default=list))
+    mine.add({'user_id': 'u1', 'internship_id': '7'})
+    other.add({'user_id': 'u2', 'internship_id': '7'})
+
+    mine.refresh()
+    assert [e['user_id'] for e in mine.for_internship('7')] == ['u1', 'u2']
+    assert mine.add({'user_id': 'u3', 'internship_id': '7'}) == 2
+    assert other.add({'user_id': 'u4', 'internship_id': '8'}) == 3
+    assert other.is_enrolled('u3', '7')
+
+
+def test_task_completions_from_two_workers_are_both_kept(tmp_path):
+    path = tmp_path / 'enrollments.json'
+    mine = EnrollmentRepository(JournaledStore(path, default=list))
+    mine.add({'user_id': 'u1', 'internship_id': '7', 'tasks': [
+        {'task_id': 't1', 'completed': False}, {'task_id': 't2', 'completed': False}]})
+    other = EnrollmentRepository(JournaledStore(path, default=list))
+
+    assert other.complete_task('u1', '7', 't2')
+    assert mine.complete_task('u1', '7', 't1')
+
+    reopened = EnrollmentRepository(JournaledStore(path, default=list))
+    assert [t['completed'] for t in reopened.get('u1', '7')['tasks']] == [True, True]
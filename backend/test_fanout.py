@@ -0,0 +1,30 @@
+import time
+
+from flask import Flask, g
+
+from fanout import FanOutTimeout, fan_out, start_request_deadline
+
+
+def test_calls_overlap_and_fail_independently():
+    def slow(value):
+        time.sleep(0.1)
+        return value
+
+    def broken():
+        raise ConnectionError('refused')
+
+    started = time.monotonic()
+    results = fan_out({'a': lambda: slow(1), 'b': lambda: slow(2), 'c': lambda: slow(3), 'broken': broken})
+    assert time.monotonic() - started < 0.25
+    assert [results[name].value for name in 'abc'] == [1, 2, 3]
+    assert not results['broken'].ok and isinstance(results['broken'].error, ConnectionError)
+
+
+def test_request_deadline_and_context_are_shared_with_calls():
+    app = Flask(__name__)
+    with app.test_request_context():
+        start_request_deadline(0.1)
+        g.user = 'u1'
+        results = fan_out({'fast': lambda: g.user, 'slow': lambda: time.sleep(1)})
+    assert results['fast'].value == 'u1'
+    assert isinstance(results['slow'].error, FanOutTimeout)
@@ -0,0 +1,28 @@
+from health_probe import HealthProbe, percentile
+
+
+def test_percentiles_use_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+
+def test_probe_caches_result_and_counts_failures():
+    outcomes = [None, ConnectionError('down')]
+
+    def check():
+        outcome = outcomes.pop(0)
+        if outcome:
+            raise outcome
+
+    probe = HealthProbe('supabase', check, interval=60)
+    assert probe.snapshot()['stale'] is True
+    assert probe.probe_now() is True
+    assert probe.ok
+    assert probe.probe_now() is False
+
+    snapshot = probe.snapshot()
+    assert snapshot['ok'] is False and snapshot['error'] == 'ConnectionError: down'
+    assert (snapshot['probes'], snapshot['failures']) == (2, 1)
+    assert snapshot['latency_ms']['samples'] == 2 and not snapshot['stale']
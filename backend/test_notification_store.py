@@ -0,0 +1,57 @@
+import uuid
+
+from storage import JournaledStore
+from notification_store import NotificationRepository
+
+
+def _notification(**fields):
+    return {'id': str(uuid.uuid4()), 'title': 't', 'read': False, **fields}
+
+
+def test_capped_feed_with_unread_counter(tmp_path):
+    path = tmp_path / 'notifications.json'
+    repo = NotificationRepository(JournaledStore(path, default=dict), limit=3)
+    created = [_notification(n=i) for i in range(5)]
+    for notification in created:
+        repo.add('u1', notification)
+
+    assert [n['n'] for n in repo.list('u1')] == [4, 3, 2]
+    assert repo.unread_count('u1') == 3
+
+    assert repo.mark_read('u1', [created[3]['id'], created[0]['id']]) == 1
+    assert repo.delete('u1', created[4]['id'])
+    assert not repo.delete('u1', created[4]['id'])
+    assert repo.unread_count('u1') == 1
+
+    reopened = NotificationRepository(JournaledStore(path, default=dict), limit=3)
+    assert [n['n'] for n in reopened.list('u1')] == [3, 2]
+    assert reopened.unread_count('u1') == 1
+    assert reopened.mark_read('u1', mark_all=True) == 1
+    reopened.clear('u1')
+    assert reopened.list('u1') == [] and reopened.unread_count('u1') == 0
+
+
+def test_refresh_reloads_users_changed_by_another_worker(tmp_path):
+    path = tmp_path / 'notifications.json'
+    mine = NotificationRepository(JournaledStore(path, default=dict))
+    other = NotificationRepository(JournaledStore(path, default=dict))
+    other.add('u1', _notification())
+
+    mine.refresh()
+    assert mine.unread_count('u1') == 1
+
+
+def test_concurrent_adds_from_two_workers_are_all_kept(tmp_path):
+    path = tmp_path / 'notifications.json'
+    mine = NotificationRepository(JournaledStore(path, default=dict))
+    other = NotificationRepository(JournaledStore(path, default=dict))
+    mine.add('u1', _notification(id='1'))
+    other.add('u1', _notification(id='2'))
+    mine.add('u1', _notification(id='3'))
+
+    assert [n['id'] for n in mine.list('u1')] == ['3', '2', '1']
+    assert other.mark_read('u1', ['3']) == 1
+    assert mine.delete('u1', '2')
+    assert [(n['id'], n['read']) for n in other.list('u1')] == [('3', True), ('2', False), ('1', False)]
+    other.refresh()
+    assert [(n['id'], n['read']) for n in other.list('u1')] == [('3', True), ('1', False)]
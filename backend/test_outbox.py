@@ -0,0 +1,105 @@
+import time
+
+from postgrest.exceptions import APIError
+
+from storage import JournaledStore
+from outbox import Outbox
+
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.rows = None
+
+    def insert(self, rows):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        self.client.requests.append((self.name, len(self.rows)))
+        if self.client.down:
+            raise ConnectionError('connection refused')
+        if any(row.get('bad') for row in self.rows):
+            raise APIError({'message': 'violates check constraint', 'code': '23514'})
+        self.client.tables.setdefault(self.name, []).extend(self.rows)
+        return self
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.down = False
+        self.requests = []
+        self.tables = {}
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def _outbox(tmp_path, client, **options):
+    store = JournaledStore(tmp_path / 'supabase_outbox.json', default=dict)
+    return Outbox(store, client, start=False, interval=0, **options)
+
+
+def test_batches_per_table_and_ignores_duplicate_keys(tmp_path):
+    client = FakeSupabase()
+    outbox = _outbox(tmp_path, client, batch_size=2)
+    for n in range(3):
+        outbox.enqueue('quiz_attempts', {'n': n}, key=f'attempt:{n}')
+    outbox.enqueue('quiz_attempts', {'n': 0}, key='attempt:0')
+    outbox.enqueue('tasks', {'sequence': 1})
+
+    assert outbox.drain() == 4
+    assert client.requests == [('quiz_attempts', 2), ('quiz_attempts', 1), ('tasks', 1)]
+    assert [r['n'] for r in client.tables['quiz_attempts']] == [0, 1, 2]
+    assert outbox.metrics()['duplicates'] == 1
+
+    outbox.enqueue('quiz_attempts', {'n': 0}, key='attempt:0')  # already delivered
+    assert outbox.drain() == 0
+
+
+def test_outage_is_retried_and_bad_rows_are_isolated(tmp_path):
+    client = FakeSupabase()
+    outbox = _outbox(tmp_path, client, max_attempts=2)
+    outbox.enqueue('tasks', {'sequence': 1})
+    outbox.enqueue('tasks', {'sequence': 2, 'bad': True})
+
+    client.down = True
+    assert outbox.drain() == 0
+    assert outbox.metrics()['pending'] == 2
+
+    client.down = False
+    for entry in outbox.store.data.values():
+        entry['next_attempt_at'] = 0  # skip the backoff
+    assert outbox.drain() == 1
+    assert client.tables['tasks'] == [{'sequence': 1}]
+
+    for entry in outbox.store.data.values():
+        entry['next_attempt_at'] = 0
+    outbox.drain()
+    assert outbox.metrics()['dead'] == 1
+
+    # Entries survive a restart
+    reopened = _outbox(tmp_path, client)
+    assert reopened.metrics()['dead'] == 1 and reopened.metrics()['pending'] == 0
+
+
+def test_claims_follow_due_time_and_other_workers_changes(tmp_path):
+    client = FakeSupabase()
+    a = _outbox(tmp_path, client)
+    b = _outbox(tmp_path, client)
+    a.enqueue('tasks', {'sequence': 1}, key='t1')
+    a.enqueue('tasks', {'sequence': 2}, key='t2')
+    a.enqueue('quiz_attempts', {'n': 1}, key='q1')
+
+    # A row backing off is skipped until it is due again
+    with a.store.exclusive():
+        a.store.data['t1']['next_attempt_at'] = time.time() + 3600
+        a.store.set('t1', a.store.data['t1'])
+        a._schedule(a.store.data['t1'])
+    assert [e['key'] for e in a._claim()] == ['t2']
+
+    # The other worker sees the lease and delivers what is left
+    assert b.drain() == 1
+    assert client.tables == {'quiz_attempts': [{'n': 1}]}
+    assert a.drain() == 0
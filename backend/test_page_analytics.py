@@ -0,0 +1,43 @@
+from page_analytics import build_page_stats, page_stats, record_page_time, record_session_pages, top_pages
+
+
+def test_counters_stay_ordered_and_match_a_full_rebuild():
+    activity = {'page_visits': [], 'sessions': [], 'current_session': {'pages_visited': []}}
+    events = [('/a', 5), ('/b', None), ('/c', 30), ('/a', 10), ('/b', 40), ('/d', 0), ('/a', 1)]
+    for path, seconds in events:
+        if seconds is None:
+            activity['current_session']['pages_visited'].append({'page_path': path})
+        else:
+            record_page_time(activity, path, seconds)
+            activity['page_visits'].append({'page_path': path, 'duration_seconds': seconds})
+
+    # Pages of the session in progress are counted once it ends
+    assert top_pages(activity, 1) == [{'page_path': '/b', 'total_seconds': 40, 'visit_count': 1}]
+    session, activity['current_session'] = activity['current_session'], None
+    record_session_pages(activity, session)
+    activity['sessions'].append(session)
+
+    assert top_pages(activity, 2) == [
+        {'page_path': '/b', 'total_seconds': 40, 'visit_count': 2},
+        {'page_path': '/c', 'total_seconds': 30, 'visit_count': 1},
+    ]
+    assert page_stats(activity) == build_page_stats(activity)
+
+
+def test_legacy_records_are_read_without_changes_and_converted_on_write():
+    activity = {
+        'page_visits': [{'page_path': '/x', 'duration_seconds': 7}],
+        'sessions': [{'pages_visited': [{'page_path': '/x'}, {}]}],
+        'current_session': {'pages_visited': [{'page_path': '/x'}]},
+    }
+    assert top_pages(activity, 5) == [
+        {'page_path': '/x', 'total_seconds': 7, 'visit_count': 2},
+        {'page_path': 'Unknown', 'total_seconds': 0, 'visit_count': 1},
+    ]
+    assert 'page_stats' not in activity
+
+    record_page_time(activity, '/y', 9)
+    assert activity['page_stats'][:2] == [
+        {'page_path': '/y', 'total_seconds': 9, 'visit_count': 1},
+        {'page_path': '/x', 'total_seconds': 7, 'visit_count': 2},
+    ]
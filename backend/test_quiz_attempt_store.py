@@ -0,0 +1,50 @@
+from storage import JournaledStore
+from quiz_attempt_store import QuizAttemptRepository
+
+
+def _record(user_id, task_id, simulation_id, passed=False):
+    return {'user_id': user_id, 'task_id': task_id, 'simulation_id': simulation_id,
+            'attempts': [{'attempt_number': 1, 'passed': passed}], 'best_score': 0, 'passed': passed}
+
+
+def test_lookups_by_task_and_simulation(tmp_path):
+    repo = QuizAttemptRepository(JournaledStore(tmp_path / 'quiz_attempts.json', default=dict))
+    repo.save(_record('u1', 1, 'sim-a'))
+    repo.save(_record('u1', 2, 'sim-a', passed=True))
+    repo.save(_record('u1', 3, 'sim-b'))
+    repo.save(_record('u2', 1, 'sim-a'))
+
+    assert repo.get('u1', 2)['passed'] is True
+    assert repo.get('u1', 9) is None
+    assert sorted(r['task_id'] for r in repo.for_simulation('u1', 'sim-a')) == [1, 2]
+    assert [r['user_id'] for r in repo.for_simulation('u2', 'sim-a')] == ['u2']
+
+    reopened = QuizAttemptRepository(JournaledStore(tmp_path / 'quiz_attempts.json', default=dict))
+    assert len(reopened.for_simulation('u1', 'sim-a')) == 2
+
+
+def test_refresh_indexes_records_from_another_worker(tmp_path):
+    path = tmp_path / 'quiz_attempts.json'
+    mine = QuizAttemptRepository(JournaledStore(path, default=dict))
+    other = QuizAttemptRepository(JournaledStore(path, default=dict))
+    other.save(_record('u1', 4, 7))
+
+    assert mine.for_simulation('u1', '7') == []
+    mine.refresh()
+    assert [r['task_id'] for r in mine.for_simulation('u1', '7')] == [4]
+
+
+def test_submissions_from_two_workers_keep_every_attempt(tmp_path):
+    path = tmp_path / 'quiz_attempts.json'
+    mine = QuizAttemptRepository(JournaledStore(path, default=dict))
+    other = QuizAttemptRepository(JournaledStore(path, default=dict))
+    mine.save(_record('u1', 4, 7))
+
+    for repo, number in ((other, 2), (mine, 3)):
+        with repo.exclusive():
+            record = repo.get('u1', 4)
+            record['attempts'].append({'attempt_number': number, 'passed': False})
+            repo.save(record)
+
+    reopened = QuizAttemptRepository(JournaledStore(path, default=dict))
+    assert [a['attempt_number'] for a in reopened.get('u1', 4)['attempts']] == [1, 2, 3]
@@ -0,0 +1,305 @@
+import json
+import fcntl
+import multiprocessing
+import threading
+
+from storage import JournaledStore, ShardedStore, SqliteStore
+
+
+def journal_ops(store):
+    """Operations in the store's journal, without the epoch header"""
+    lines = store.journal_path.read_text().splitlines()
+    return [json.loads(line) for line in lines if json.loads(line)['op'] != 'epoch']
+
+
+def test_journal_replayed_on_startup(tmp_path):
+    """Changes that never reached the snapshot are recovered from the journal"""
+    path = tmp_path / 'quiz_attempts.json'
+    path.write_text(json.dumps({'a': 1}))
+
+    store = JournaledStore(path, default=dict)
+    store.set('b', 2)
+    store.delete('a')
+    store._journal.close()  # simulate a crash: no final compaction
+
+    recovered = JournaledStore(path, default=dict)
+    assert recovered.data == {'b': 2}
+    assert json.loads(path.read_text()) == {'a': 1}
+
+
+def test_compaction_writes_snapshot_and_truncates_journal(tmp_path):
+    path = tmp_path / 'enrollments.json'
+    store = JournaledStore(path, default=list)
+    store.append({'user_id': 'u1'})
+    store.append({'user_id': 'u2'})
+    store.set(0, {'user_id': 'u1', 'done': True})
+
+    assert store.compact()
+    assert json.loads(path.read_text()) == [{'user_id': 'u1', 'done': True}, {'user_id': 'u2'}]
+    assert store.journal_path.read_text() == ''
+
+
+def test_interrupted_compaction_is_idempotent(tmp_path):
+    """Replaying an old journal over a snapshot that already contains it changes nothing"""
+    path = tmp_path / 'categories.json'
+    store = JournaledStore(path, default=list)
+    store.append('Software')
+    store.append('Design')
+    store.compact()
+
+    # Crash after the snapshot was replaced but before the journal was removed
+    store.journal_path.write_text(
+        '{"op":"set","k":0,"v":"Software"}\n{"op":"set","k":1,"v":"Design"}\n'
+        '{"op":"set","k":2,"v":"Data"}\n{"op":"se'
+    )
+    store._journal.close()
+
+    recovered = JournaledStore(path, default=list)
+    assert recovered.data == ['Software', 'Design', 'Data']
+
+
+def test_journal_left_by_an_interrupted_compaction_is_not_replayed(tmp_path):
+    """List deletes by index are not idempotent: a folded journal must not be applied twice"""
+    path = tmp_path / 'enrollments.json'
+    store = JournaledStore(path, default=list)
+    for name in ('a', 'b', 'c'):
+        store.append(name)
+    store.delete(0)
+    stale_journal = store.journal_path.read_text()
+    store.compact()
+
+    # Crash after the snapshot was replaced but before the journal was removed
+    store.journal_path.write_text(stale_journal)
+    store._journal.close()
+
+    recovered = JournaledStore(path, default=list)
+    assert recovered.data == ['b', 'c']
+    recovered.append('d')
+    assert journal_ops(recovered) == [{'op': 'set', 'k': 2, 'v': 'd'}]
+    assert JournaledStore(path, default=list).data == ['b', 'c', 'd']
+
+
+def _tear_write(store):
+    """Simulate a worker killed halfway through appending to the journal"""
+    with open(store.journal_path, 'a') as f:
+        f.write('{"op":"set","k":"x","v":')
+
+
+def test_writes_after_a_torn_journal_line_survive_restarts(tmp_path):
+    path = tmp_path / 'quiz_attempts.json'
+    store = JournaledStore(path, default=dict)
+    store.set('a', 1)
+    _tear_write(store)
+    store._journal.close()
+
+    restarted = JournaledStore(path, default=dict)
+    assert restarted.data == {'a': 1}
+    restarted.set('d', 4)
+    restarted.set('e', 5)
+    restarted._journal.close()
+
+    assert JournaledStore(path, default=dict).data == {'a': 1, 'd': 4, 'e': 5}
+
+
+def test_running_workers_keep_writing_after_a_peer_tore_a_line(tmp_path):
+    path = tmp_path / 'quiz_attempts.json'
+    a = JournaledStore(path, default=dict)
+    b = JournaledStore(path, default=dict)
+    a.set('a', 1)
+    _tear_write(a)
+
+    b.set('b', 2)  # cuts off the torn bytes before appending
+    a.set('c', 3)
+    assert a.data == b.data | {'c': 3} == {'a': 1, 'b': 2, 'c': 3}
+
+    # An unreadable line in the middle of the journal is skipped, not fatal
+    with open(path.with_name(path.name + '.journal'), 'a') as f:
+        f.write('not json\n')
+    b.set('d', 4)
+    assert a.sync()
+    assert a.data == {'a': 1, 'b': 2, 'c': 3, 'd': 4}
+    assert a.metrics()['skipped_journal_entries'] == 1
+
+
+def test_write_behind_coalesces_until_flush(tmp_path):
+    path = tmp_path / 'user_activity.json'
+    store = JournaledStore(path, default=dict, flush_interval=3600)
+    store.data['u1'] = {'heartbeats': 0}
+    for _ in range(5):
+        store.data['u1']['heartbeats'] += 1
+        store.mark_dirty('u1')
+
+    assert store.journal_path.read_text() == ''
+    assert store.metrics()['dirty_keys'] == 1
+    assert store.metrics()['coalesced_events'] == 4
+
+    assert store.flush() == 1
+    assert len(journal_ops(store)) == 1
+    assert store.metrics()['dirty_keys'] == 0
+    assert store.metrics()['flush_count'] == 1
+
+
+def _add(field, item):
+    def change(record):
+        record.setdefault(field, []).append(item)
+    return change
+
+
+def test_write_behind_flush_rebases_onto_other_writers(tmp_path):
+    """Both stores write the same key before flushing; neither change is lost"""
+    path = tmp_path / 'user_activity.json'
+    a = JournaledStore(path, default=dict, flush_interval=3600)
+    b = JournaledStore(path, default=dict, flush_interval=3600)
+
+    for store, item in ((a, 'a1'), (b, 'b1'), (a, 'a2')):
+        change = _add('events', item)
+        change(store.data.setdefault('u1', {}))
+        store.mark_dirty('u1', rebase=change)
+    a.flush()
+    b.flush()
+
+    assert b.data == {'u1': {'events': ['a1', 'a2', 'b1']}}
+    assert b.metrics()['rebased_keys'] == 1
+    assert JournaledStore(path, default=dict).data == b.data
+
+    # Without a rebase function the flushing store's value wins
+    a.sync()
+    a.data['u1']['events'].append('a3')
+    a.mark_dirty('u1')
+    b.data['u1']['events'].append('b2')
+    b.mark_dirty('u1')
+    b.flush()
+    a.flush()
+    assert JournaledStore(path, default=dict).data == {'u1': {'events': ['a1', 'a2', 'b1', 'a3']}}
+    assert a.metrics()['overwritten_conflicts'] == 1
+
+
+def test_sqlite_store_persists_rows_and_answers_indexed_queries(tmp_path):
+    db = tmp_path / 'quantiverse.db'
+    store = SqliteStore(db, 'enrollments', default=list, index_fields=('user_id', 'internship_id'))
+    store.append({'user_id': 'u1', 'internship_id': 7})
+    store.append({'user_id': 'u2', 'internship_id': 7})
+    store.set(0, {'user_id': 'u1', 'internship_id': 7, 'done': True})
+
+    reopened = SqliteStore(db, 'enrollments', default=list, index_fields=('user_id', 'internship_id'))
+    assert reopened.data[0]['done'] is True
+    assert [e['user_id'] for e in reopened.query('internship_id', 7)] == ['u1', 'u2']
+    assert reopened._conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+
+def test_stores_see_each_others_writes(tmp_path):
+    """Two handles on the same files behave like two worker processes"""
+    path = tmp_path / 'user_activity.json'
+    a = JournaledStore(path, default=dict)
+    b = JournaledStore(path, default=dict)
+
+    a.set('u1', {'heartbeats': 1})
+    b.set('u2', {'heartbeats': 1})  # catches up with a's write before appending
+    assert b.data == {'u1': {'heartbeats': 1}, 'u2': {'heartbeats': 1}}
+
+    assert a.sync()
+    assert a.data == b.data
+
+    # A compaction by one process forces a full reload in the other
+    b.compact()
+    b.set('u3', {})
+    generation = a.generation
+    assert a.sync()
+    assert a.generation == generation + 1
+    assert a.data == b.data
+
+
+def test_read_modify_write_from_two_workers_keeps_both_changes(tmp_path):
+    """One worker starts a session while another records a page visit of the same user"""
+    path = tmp_path / 'user_activity.json'
+    a = JournaledStore(path, default=dict, flush_interval=100)
+    b = JournaledStore(path, default=dict, flush_interval=100)
+
+    def update(store, change):
+        with store.exclusive():
+            change(store.data.setdefault('u1', {'sessions': [], 'page_visits': []}))
+            store.mark_dirty('u1', rebase=change)
+
+    update(a, lambda record: record.update(current_session={'session_id': 's1'}))
+    update(b, lambda record: record['page_visits'].append({'p': '/x'}))
+    a.flush()
+    b.flush()
+
+    expected = {'u1': {'sessions': [], 'page_visits': [{'p': '/x'}], 'current_session': {'session_id': 's1'}}}
+    assert b.data == expected
+    assert JournaledStore(path, default=dict).data == expected
+
+
+def test_sqlite_stores_see_each_others_writes(tmp_path):
+    db = tmp_path / 'quantiverse.db'
+    a = SqliteStore(db, 'notifications', default=dict)
+    b = SqliteStore(db, 'notifications', default=dict)
+    a.set('u1', [{'id': 'n1'}])
+    b.set('u2', [])
+    assert a.sync()
+    assert a.data == b.data == {'u1': [{'id': 'n1'}], 'u2': []}
+    assert not a.sync()
+
+
+def _append_many(path, worker, count):
+    store = JournaledStore(path, default=list)
+    for i in range(count):
+        store.append({'worker': worker, 'i': i})
+    store.close()
+
+
+def test_concurrent_appends_from_processes_are_not_lost(tmp_path):
+    path = tmp_path / 'enrollments.json'
+    ctx = multiprocessing.get_context('fork')
+    workers = [ctx.Process(target=_append_many, args=(path, w, 50)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+
+    data = JournaledStore(path, default=list).data
+    assert len(data) == 200
+    assert {(e['worker'], e['i']) for e in data} == {(w, i) for w in range(4) for i in range(50)}
+
+
+def test_sharded_store_loads_lazily_and_writes_only_the_touched_shard(tmp_path):
+    legacy = tmp_path / 'user_activity.json'
+    legacy.write_text(json.dumps({f'u{i}': {'heartbeats': i} for i in range(20)}))
+    ShardedStore('user_activity', legacy, shard_count=4).close()  # first start splits the old file
+
+    store = ShardedStore('user_activity', legacy, shard_count=8, flush_interval=3600)
+    assert store.shard_count == 4  # fixed by the manifest
+    assert store.loaded_shards() == []
+    assert store['u7'] == {'heartbeats': 7}
+    assert store.loaded_shards() == [store.shard_for('u7')]
+
+    store['u7']['heartbeats'] += 1
+    store.mark_dirty('u7')
+    assert store['u3'] == {'heartbeats': 3}
+    assert store.flush() == 1
+    journals = {s.name: len(journal_ops(s)) for s in store.loaded_shards()}
+    assert journals[store.shard_for('u7').name] == 1
+    assert sum(journals.values()) == 1
+
+    reopened = ShardedStore('user_activity', legacy)
+    assert dict(reopened.items()) == {f'u{i}': {'heartbeats': i + (i == 7)} for i in range(20)}
+
+
+def test_workers_starting_together_split_the_unsharded_store_once(tmp_path):
+    legacy = tmp_path / 'user_activity.json'
+    legacy.write_text(json.dumps({'u1': {'heartbeats': 1}}))
+    shard_dir = tmp_path / 'user_activity'
+    shard_dir.mkdir()
+
+    opened = []
+    with open(shard_dir / 'manifest.lock', 'a+') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)  # another worker is splitting
+        worker = threading.Thread(target=lambda: opened.append(ShardedStore('user_activity', legacy, shard_count=4)))
+        worker.start()
+        worker.join(0.2)
+        assert worker.is_alive()
+        (shard_dir / 'manifest.json').write_text(json.dumps({'shards': 2}))
+    worker.join()
+
+    assert opened[0].shard_count == 2
+    assert list(shard_dir.glob('*-*.json')) == []  # the waiting worker did not split again
@@ -0,0 +1,25 @@
+from bench_candidates_progress import FakeSupabase, build_progress
+from supabase_batch import fetch_in, group_by
+
+
+def test_fetch_in_chunks_and_pages():
+    user_ids, rows = build_progress(50, '7', tasks_per_user=4)
+    client = FakeSupabase({'user_task_progress': rows}, latency=0)
+
+    fetched, failed = fetch_in(client, 'user_task_progress', '*', 'user_id', user_ids,
+                               filters={'simulation_id': '7'}, chunk_size=20, page_size=30)
+
+    assert failed == []
+    assert sorted(map(str, fetched), key=str) == sorted(map(str, rows), key=str)
+    # chunks of 20, 20 and 10 users hold 72, 72 and 36 rows -> 3 + 3 + 2 pages of 30
+    assert client.round_trips == 8
+    assert set(group_by(fetched, 'user_id')) == {u for i, u in enumerate(user_ids) if i % 10}
+
+
+def test_failed_chunks_are_reported_for_fallback():
+    class Broken(FakeSupabase):
+        def table(self, name):
+            raise ConnectionError('down')
+
+    fetched, failed = fetch_in(Broken({}, 0), 'user_task_progress', '*', 'user_id', ['a', 'b', 'a'])
+    assert fetched == [] and failed == ['a', 'b']
@@ -0,0 +1,77 @@
+import pytest
+from postgrest.exceptions import APIError
+
+from supabase_client import (InstrumentedClient, LatencyHistogram, SupabaseMetrics,
+                             create_supabase_client, shared_transport)
+
+KEY = 'aaa.bbb.ccc'
+
+
+def test_clients_share_one_pooled_transport():
+    anon = create_supabase_client('http://localhost:54321', KEY)
+    admin = create_supabase_client('http://localhost:54321', KEY)
+    assert anon.postgrest.session._transport is shared_transport()
+    assert admin.postgrest.session._transport is shared_transport()
+
+    # Closing one client's session leaves the shared pool usable for the others
+    anon.postgrest.aclose()
+    assert admin.postgrest.session._transport is shared_transport()
+
+
+class FakeQuery:
+    def __init__(self, fail=None):
+        self.fail = fail
+
+    def select(self, *args):
+        return self
+
+    def insert(self, rows):
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def execute(self):
+        if self.fail:
+            raise self.fail
+        return 'ok'
+
+
+class FakeClient:
+    def __init__(self):
+        self.next_failure = None
+
+    def table(self, name):
+        failure, self.next_failure = self.next_failure, None
+        return FakeQuery(failure)
+
+
+def test_queries_recorded_per_table_and_operation():
+    raw = FakeClient()
+    metrics = SupabaseMetrics()
+    client = InstrumentedClient(raw, metrics)
+
+    client.table('tasks').select('*').eq('simulation_id', 1).execute()
+    client.table('tasks').select('*').execute()
+    raw.next_failure = APIError({'message': 'bad filter'})
+    with pytest.raises(APIError):
+        client.table('tasks').insert([{}]).execute()
+    raw.next_failure = ConnectionError('refused')
+    with pytest.raises(ConnectionError):
+        client.table('simulations').select('id').execute()
+
+    snapshot = metrics.snapshot()
+    assert snapshot['tasks']['select']['count'] == 2
+    assert (snapshot['tasks']['insert']['api_errors'], snapshot['tasks']['insert']['errors']) == (1, 0)
+    assert snapshot['simulations']['select']['errors'] == 1
+    assert snapshot['simulations']['select']['last_error'] == 'ConnectionError: refused'
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    histogram = LatencyHistogram()
+    for elapsed in [1] * 90 + [40] * 9 + [20000]:
+        histogram.record(elapsed)
+    assert histogram.quantile(0.5) == 5
+    assert histogram.quantile(0.95) == 50
+    assert histogram.quantile(1.0) == 20000
+    assert histogram.snapshot()['buckets']['gt_10000ms'] == 1